@@ -1,6 +1,16 @@
 import threading
 import socket
-from app.common.file_manager import FileManager
+import struct
+import select
+import json
+import hashlib
+import fnmatch
+import time
+from app.common.compression import CODECS, Codec
+from app.common.delta import block_signatures, delta_block_size
+from app.common.file_manager import FileManager, FileWriter
+from app.common.framing import FrameReader, FrameType, encode_compressed_frame, encode_frame
+from app.common.integrity import BlockDigests, BlockStream
 from app.common.log_manager import LogManager
 from app.common.constants import \
     CHUNK_SIZE, \
@@ -8,50 +18,142 @@ from app.common.constants import \
     SERVER_PORT, \
     CLIENT_IP, \
     CLIENT_PORT, \
+    WINDOW_SIZE, \
+    WRITE_BUFFER_SIZE, \
+    FILE_BLOCK_RETRIES, \
+    BATCH_CONNECTIONS, \
+    SERVER_BUSY, \
     CRLF
 
+# Suffix of the file a delta download is rebuilt into, next to the local copy.
+DELTA_SUFFIX = ".delta"
+
+
 class Client:
-    def __init__(self):
+    def __init__(self,
+                 server_ip: str = SERVER_IP,
+                 server_port: int = SERVER_PORT,
+                 client_port: int = CLIENT_PORT,
+                 framed: bool = True,
+                 bulk: bool = True,
+                 resume: bool = False,
+                 streams: int = 1,
+                 delta: bool = False,
+                 compression: str | None = None,
+                 interactive: bool = True):
+        self.server_ip: str = server_ip
+        self.server_port: int = server_port
+        self.client_port: int = client_port
+        self.framed: bool = framed
+        self.bulk: bool = bulk
+        self.resume: bool = resume
+        self.delta: bool = delta
+        self.compression: str | None = compression
+        self.codec: Codec | None = None
+        self.streams: int = max(1, streams)
+        self.window: int = WINDOW_SIZE
         self.file_manager: FileManager | None = FileManager("client")
         self.log_manager: LogManager | None = LogManager(self.file_manager)
         self.socket: socket.socket | None = self.create_socket()
+        self.frame_reader: FrameReader = FrameReader(self.socket)
         self.lock: threading.Lock | None = threading.Lock()
         self.input_thread: threading.Thread | None = None
         self.chat_mode: bool = False
         self.chat_messages: list[str] = []
         self.running: bool = True
-        self.run()
+        if interactive:
+            self.run()
 
-    
-    def run(self) -> None:
+    def connect(self) -> None:
         try:
-            self.socket.connect((SERVER_IP, SERVER_PORT))
-            print(f"Connected to server at {SERVER_IP}:{SERVER_PORT}")
+            self.socket.connect((self.server_ip, self.server_port))
+            print(f"Connected to server at {self.server_ip}:{self.server_port}")
+            if self.framed:
+                self.handshake()
         except Exception as e:
             print(f"Exception occurred: {e}")
             exit(1)
+
+    def handshake(self, _socket: socket.socket | None = None, reader: FrameReader | None = None) -> None:
+        """Opens the framed protocol and negotiates the transfer window and, if asked for, compression."""
+        options = {"window": WINDOW_SIZE}
+        if self.compression:
+            options["compression"] = [self.compression]
+        (_socket or self.socket).sendall(encode_frame(FrameType.HELLO, json.dumps(options).encode("utf-8")))
+        reader = reader or self.frame_reader
+        # A server with no room for the connection answers with a bare 503, and
+        # one that only speaks the legacy protocol with a 400; neither is a frame.
+        status = reader.peek(3)
+        if status == SERVER_BUSY[:3]:
+            raise ConnectionError("Server busy, try again later.")
+        frame = None if status.isdigit() else reader.read_frame()
+        if frame is None or frame.type != FrameType.HELLO:
+            print("Server does not support the framed protocol.")
+            exit(1)
+        response = json.loads(frame.payload)
+        self.window = response["window"]
+        self.codec = CODECS.get(response.get("compression"))
+    
+    def run(self) -> None:
+        self.connect()
         while self.running:
-            option = input("What do you want to do?\n1 - Fetch file\n2 - Chat\n3 - Exit\n")
-            if option == "1":
-                result = self.handle_file()
-                while not result:
+            option = input("What do you want to do?\n1 - Fetch file\n2 - Chat\n3 - Exit\n4 - Server statistics\n"
+                           "5 - List files\n6 - Fetch several files\n")
+            # The server drops connections left idle for TCP_IDLE_TIMEOUT seconds,
+            # as this one is while the user reads the menu.
+            if not self.is_connected():
+                self.reconnect()
+            try:
+                if option == "1":
                     result = self.handle_file()
-            elif option == "2":
-                self.handle_chat()
-            elif option == "3":
-                self.handle_exit()
-                break
-            else:
-                print("Invalid option.")
-                pass
+                    while not result:
+                        result = self.handle_file()
+                elif option == "2":
+                    self.handle_chat()
+                elif option == "3":
+                    self.handle_exit()
+                    break
+                elif option == "4":
+                    print(json.dumps(self.fetch_stats(), indent=2))
+                elif option == "5":
+                    self.print_files(input("Enter a pattern (empty for all files): ") or "*")
+                elif option == "6":
+                    self.fetch_batch(input("Enter file names or patterns: ").split())
+                else:
+                    print("Invalid option.")
+                    pass
+            except ConnectionError as e:
+                print(f"Connection lost: {e}")
+                self.reconnect()
+
+    def is_connected(self) -> bool:
+        """Whether the server has not closed the connection, as far as can be told without sending anything."""
+        readable, _, _ = select.select([self.socket], [], [], 0)
+        if not readable:
+            return True
+        try:
+            return self.socket.recv(1, socket.MSG_PEEK) != b""
+        except OSError:
+            return False
+
+    def reconnect(self) -> None:
+        """Replaces the connection with a new one, keeping the client's settings."""
+        print("Reconnecting...")
+        self.socket.close()
+        self.socket = self.create_socket()
+        self.frame_reader = FrameReader(self.socket)
+        self.connect()
         
     def create_socket(self) -> socket.socket | None:
-        client_port = CLIENT_PORT
+        client_port = self.client_port
         while True:
             try:
                 print(f"Binding socket to {CLIENT_IP}:{client_port}...")
                 _socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 0)
+                # A transfer ends with a FIN or NAK frame the server does not answer;
+                # without TCP_NODELAY the next request waits for its delayed ACK.
+                _socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 _socket.bind((CLIENT_IP, client_port))
                 return _socket
             except OSError:
@@ -67,33 +169,49 @@ class Client:
                         exit(0)
                 continue
 
+    def open_connection(self) -> socket.socket:
+        """Opens an extra connection to the server, for downloads spread over several."""
+        _socket = socket.create_connection((self.server_ip, self.server_port))
+        _socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return _socket
+
     def handle_file(self) -> bool:
         file_name = input("Enter the file name: ")
+        return self.fetch_file(file_name)
+
+    def fetch_file(self, file_name: str, windowed: bool = True) -> bool:
+        # Deltas and ranges are only supported by the framed protocol.
+        if self.framed and self.delta:
+            return self.delta_file(file_name)
+        if self.framed and self.streams > 1:
+            return self.fetch_file_parallel(file_name)
+        if self.framed and self.resume:
+            return self.resume_file(file_name)
+        if self.framed:
+            return self.fetch_file_framed(file_name)
         request = f"FILE{file_name}"
         self.socket.send(request.encode("utf-8"))
         data = b""
         file_sha256 = ""
         file_size = 0
+        sha256_hash = hashlib.sha256()
+        writer = None
 
         while data != b"EOF":
             data = self.socket.recv(CHUNK_SIZE + 3)
             if data == b"":
-                pass
+                raise ConnectionError("Connection closed by server.")
             elif data == b"EOF":
-                transferred_file_sha256 = self.file_manager.calculate_sha256(file_name)
-                print(f"Transferred file SHA256: {transferred_file_sha256}")
-                print(f"Original file SHA256: {file_sha256}")
-                if transferred_file_sha256 != file_sha256:
-                    print("File transfer failed. SHA256 mismatch.")
+                writer.close()
+                if not self.verify_file(file_name, file_size, file_sha256, sha256_hash.hexdigest()):
                     return False
-                if self.file_manager.get_file_size(file_name) != file_size:
-                    print("File transfer failed. File size mismatch.")
-                    return False
-                print("File transfer complete")
                 self.socket.send(b"ACK")
             elif data[:3] == b"404":
                 print("File not found.")
                 break
+            elif data[:3] == SERVER_BUSY[:3]:
+                print("Server busy, try again later.")
+                exit(1)
             elif data[:3] == b"202":
                 data = data.decode("utf-8").split(CRLF)
                 if data[1] != file_name:
@@ -101,18 +219,424 @@ class Client:
                     pass
                 file_size = int(data[2])
                 file_sha256 = data[3]
+                server_window = self.parse_window(data[4:])
+                if windowed and server_window:
+                    window = min(server_window, WINDOW_SIZE)
+                    self.socket.send(f"WINDOW{window}".encode("utf-8"))
+                    return self.receive_file_frames(file_name, file_size, file_sha256, window)
                 self.socket.send(b"ACK")
-                self.file_manager.write_to_file("", file_name, True)
+                writer = self.file_manager.open_writer(file_name, file_size)
             elif data[:3] == b"200":
-                print(f"Received chunk of size {len(data[3:])}")
+                self.log_manager.add_debug("Received chunk of size %d", len(data) - 3)
                 file_content = data[3:]
-                self.file_manager.write_to_file(file_content, file_name, False)
+                writer.write(file_content)
+                sha256_hash.update(file_content)
                 self.socket.send(b"ACK")
 
         return True
 
-        
+    def parse_window(self, options: list[str]) -> int:
+        for option in options:
+            if option.startswith("WINDOW="):
+                return int(option[7:])
+        return 0
+
+    def fetch_file_framed(self, file_name: str) -> bool:
+        header = self.request_file(file_name, blocks=True)
+        if "status" in header:
+            print(header["message"])
+            return True
+        blocks = BlockDigests(header["size"], header["block_size"], header["blocks"])
+        writer = self.file_manager.open_writer(file_name, header["size"])
+        return self.receive_file(file_name, header, writer, hashlib.sha256(), blocks.stream())
+
+    def request_file(self, file_name: str, offset: int = 0, length: int | None = None, blocks: bool = False,
+                     _socket: socket.socket | None = None, reader: FrameReader | None = None) -> dict:
+        """Asks for `length` bytes of `file_name` from `offset`, or for the rest of it if None.
+
+        Returns the HEADER payload of the server, which with `blocks` includes
+        the digests of the file's blocks, or its ERROR payload, which carries a
+        "status". The request goes over `_socket` if given, otherwise over the
+        main connection.
+        """
+        request = {"name": file_name, "mode": "bulk" if self.bulk else "stream", "offset": offset}
+        if length is not None:
+            request["length"] = length
+        if blocks:
+            request["blocks"] = True
+        (_socket or self.socket).sendall(encode_frame(FrameType.FILE, json.dumps(request).encode("utf-8")))
+        return json.loads((reader or self.frame_reader).read_frame().payload)
+
+    def receive_body(self, header: dict, writer: FileWriter | None, hashers: tuple = (),
+                     _socket: socket.socket | None = None, reader: FrameReader | None = None) -> int:
+        """Writes the bytes announced by `header` as they arrive and returns the number of DATA frames read.
+
+        Every piece of data is also fed to each of `hashers`. In "bulk" mode
+        the body is sent unframed right after the HEADER frame; in "stream"
+        mode it is sent as DATA frames (see `Server.send_file_frames`) and a
+        cumulative ACK is sent every half window so the server never stalls
+        waiting for the client while chunks are still in flight. A body with an
+        "encoding" is decompressed before it is written and hashed.
+        """
+        _socket = _socket or self.socket
+        reader = reader or self.frame_reader
+        if header["mode"] == "bulk":
+            for data in reader.read_raw(header["length"]):
+                writer.write(data)
+                for hasher in hashers:
+                    hasher.update(data)
+            return 0
+        codec = CODECS[header["encoding"]] if header.get("encoding") else None
+        decompressor = codec.decompressor() if codec is not None else None
+        ack_every = max(1, self.window // 2)
+        received = 0
+        while (frame := reader.read_frame()).type != FrameType.EOF:
+            data = frame.payload if decompressor is None else decompressor.decompress(frame.payload)
+            writer.write(data)
+            for hasher in hashers:
+                hasher.update(data)
+            received += 1
+            if received % ack_every == 0:
+                _socket.sendall(encode_frame(FrameType.ACK, struct.pack("!I", received)))
+        if decompressor is not None and (data := codec.finish(decompressor)):
+            writer.write(data)
+            for hasher in hashers:
+                hasher.update(data)
+        return received
+
+    def receive_file(self, file_name: str, header: dict, writer: FileWriter, sha256_hash,
+                     block_stream: BlockStream | None = None) -> bool:
+        """Receives a file body into `writer`, verifies the whole file and confirms it with FIN or NAK.
+
+        `sha256_hash`, and `block_stream` if given, must already cover
+        whatever the file held before `writer.offset`. Blocks that do not
+        match their digest are requested again on their own.
+        """
+        hashers = (sha256_hash,) if block_stream is None else (sha256_hash, block_stream)
+        with writer:
+            received = self.receive_body(header, writer, hashers)
+        if block_stream is None or not block_stream.blocks.missing():
+            verified = self.verify_file(file_name, header["size"], header["sha256"], sha256_hash.hexdigest())
+            self.socket.sendall(encode_frame(FrameType.FIN if verified else FrameType.NAK, struct.pack("!I", received)))
+            return verified
+        self.socket.sendall(encode_frame(FrameType.NAK, struct.pack("!I", received)))
+        self.repair_file(file_name, header["sha256"], block_stream.blocks)
+        return self.verify_file(file_name, header["size"], header["sha256"], None, block_stream.blocks)
+
+    def repair_file(self, file_name: str, file_sha256: str, blocks: BlockDigests) -> bool:
+        """Downloads again, over the main connection, every block of `blocks` not verified yet.
+
+        Gives up after FILE_BLOCK_RETRIES rounds, or as soon as the file on the
+        server no longer has the SHA-256 the blocks were announced with.
+
+        Returns:
+            bool: True if every block now matches its digest.
+        """
+        for _ in range(FILE_BLOCK_RETRIES):
+            missing = blocks.missing()
+            if not missing:
+                break
+            print(f"Requesting {len(missing)} of {len(blocks.digests)} blocks again.")
+            for index in missing:
+                offset, length = blocks.block_range(index)
+                header = self.request_file(file_name, offset, length)
+                if "status" in header:
+                    print(header["message"])
+                    return False
+                with self.file_manager.open_writer(file_name, offset=offset, truncate=False) as writer:
+                    received = self.receive_body(header, writer, (blocks.stream(offset),))
+                confirmed = header["sha256"] == file_sha256 and index in blocks.verified
+                self.socket.sendall(encode_frame(FrameType.FIN if confirmed else FrameType.NAK, struct.pack("!I", received)))
+                if header["sha256"] != file_sha256:
+                    print("File changed on the server during the transfer.")
+                    return False
+        return not blocks.missing()
+
+    def resume_file(self, file_name: str) -> bool:
+        """Downloads only what is missing from a partial copy of `file_name`.
+
+        The size of the local file is the offset asked for, and its content is
+        hashed first so the whole file can still be checked against the SHA-256
+        announced by the server; local blocks that do not match are requested
+        again. A local copy that is longer than the file on the server, or that
+        cannot be repaired, is downloaded again.
+        """
+        offset = self.file_manager.get_file_size(file_name)
+        if offset == 0:
+            return self.fetch_file_framed(file_name)
+        header = self.request_file(file_name, offset, blocks=True)
+        if header.get("status") == 416:
+            print("Local file is larger than the one on the server; downloading it again.")
+            return self.fetch_file_framed(file_name)
+        if "status" in header:
+            print(header["message"])
+            return True
+        print(f"Resuming {file_name} at byte {offset} of {header['size']}.")
+        sha256_hash = hashlib.sha256()
+        block_stream = BlockDigests(header["size"], header["block_size"], header["blocks"]).stream()
+        with self.file_manager.open_file(file_name) as file:
+            for chunk in iter(lambda: file.read(WRITE_BUFFER_SIZE), b""):
+                sha256_hash.update(chunk)
+                block_stream.update(chunk)
+        writer = self.file_manager.open_writer(file_name, header["size"], offset=offset)
+        if self.receive_file(file_name, header, writer, sha256_hash, block_stream):
+            return True
+        print("Local file does not match the one on the server; downloading it again.")
+        return self.fetch_file_framed(file_name)
+
+    def delta_file(self, file_name: str) -> bool:
+        """Downloads only what changed in `file_name` since the local copy, rsync style.
+
+        The checksums of the local copy's blocks are sent to the server, which
+        answers with runs of those blocks to copy and the literal bytes in
+        between (see `Server.handle_delta_request`). The file is rebuilt next
+        to the local copy and only replaces it once it matches the SHA-256 of
+        the HEADER; otherwise the whole file is downloaded again. Without a
+        local copy, or if the server refuses the blocks because its file is
+        much larger than the local copy, the file is simply downloaded.
+        """
+        size = self.file_manager.get_file_size(file_name)
+        if size == 0:
+            return self.fetch_file_framed(file_name)
+        block_size = delta_block_size(size)
+        with self.file_manager.open_file(file_name) as file:
+            request = {"name": file_name, "block_size": block_size, "signatures": block_signatures(file, block_size)}
+        self.socket.sendall(encode_frame(FrameType.DELTA, json.dumps(request).encode("utf-8")))
+        header = json.loads(self.frame_reader.read_frame().payload)
+        if header.get("status") == 400:
+            return self.fetch_file_framed(file_name)
+        if "status" in header:
+            print(header["message"])
+            return True
+        print(f"Delta of {file_name}: {header['literal']} of {header['size']} bytes to transfer.")
+        rebuilt = file_name + DELTA_SUFFIX
+        sha256_hash = hashlib.sha256()
+        received = 0
+        with self.file_manager.open_file(file_name) as base, self.file_manager.open_writer(rebuilt, header["size"]) as writer:
+            while (frame := self.frame_reader.read_frame()).type != FrameType.EOF:
+                if frame.type == FrameType.DATA:
+                    writer.write(frame.payload)
+                    sha256_hash.update(frame.payload)
+                    received += 1
+                    continue
+                first, count = struct.unpack("!II", frame.payload)
+                base.seek(first * block_size)
+                remaining = count * block_size
+                while remaining > 0 and (data := base.read(min(remaining, WRITE_BUFFER_SIZE))):
+                    writer.write(data)
+                    sha256_hash.update(data)
+                    remaining -= len(data)
+        verified = self.verify_file(rebuilt, header["size"], header["sha256"], sha256_hash.hexdigest())
+        self.socket.sendall(encode_frame(FrameType.FIN if verified else FrameType.NAK, struct.pack("!I", received)))
+        if verified:
+            self.file_manager.replace_file(rebuilt, file_name)
+            return True
+        self.file_manager.remove_file(rebuilt)
+        print("Rebuilt file does not match the one on the server; downloading it again.")
+        return self.fetch_file_framed(file_name)
+
+    def fetch_file_parallel(self, file_name: str) -> bool:
+        """Downloads `file_name` as `self.streams` byte ranges over as many connections.
+
+        An empty range request on the main connection returns the size and
+        digests of the file, which is then preallocated so every range is
+        written in place by its own thread. Ranges are whole blocks, checked
+        against their digests as they arrive, so the finished file never has
+        to be read back; blocks that failed are requested again over the main
+        connection. If some still fail, the file is cut back to the first of
+        them, so it can be finished with `resume_file`.
+        """
+        header = self.request_file(file_name, 0, 0, blocks=True)
+        if "status" in header:
+            print(header["message"])
+            return True
+        self.socket.sendall(encode_frame(FrameType.FIN, struct.pack("!I", self.receive_body(header, None))))
+        file_size = header["size"]
+        blocks = BlockDigests(file_size, header["block_size"], header["blocks"])
+        self.file_manager.open_writer(file_name, file_size, truncate=False).close()
+        range_size = blocks.block_size * max(1, -(-len(blocks.digests) // self.streams))
+        threads = [
+            threading.Thread(target=self.fetch_range, args=(file_name, offset, min(range_size, file_size - offset), blocks))
+            for offset in range(0, file_size, range_size)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if blocks.missing() and not self.repair_file(file_name, header["sha256"], blocks):
+            offset, _ = blocks.block_range(blocks.missing()[0])
+            self.file_manager.open_writer(file_name, offset=offset).close()
+            print(f"File transfer failed. {offset} of {file_size} bytes verified in order; resume to finish it.")
+            return False
+        return self.verify_file(file_name, file_size, header["sha256"], None, blocks)
+
+    def fetch_range(self, file_name: str, offset: int, length: int, blocks: BlockDigests) -> None:
+        """Downloads one range of `fetch_file_parallel` over a connection of its own."""
+        try:
+            with self.open_connection() as _socket:
+                reader = FrameReader(_socket)
+                self.handshake(_socket, reader)
+                header = self.request_file(file_name, offset, length, False, _socket, reader)
+                if "status" in header:
+                    raise ConnectionError(header["message"])
+                with self.file_manager.open_writer(file_name, offset=offset, truncate=False) as writer:
+                    count = self.receive_body(header, writer, (blocks.stream(offset),), _socket, reader)
+                _socket.sendall(encode_frame(FrameType.FIN, struct.pack("!I", count)))
+                _socket.sendall(encode_frame(FrameType.EXIT))
+        except (OSError, ValueError) as e:
+            self.log_manager.add_error("Range %s+%s of %s failed: %s", offset, length, file_name, e)
+
+    def verify_file(self, file_name: str, file_size: int, file_sha256: str, transferred_file_sha256: str | None,
+                    blocks: BlockDigests | None = None) -> bool:
+        """Checks a downloaded file against the announced size and SHA-256.
+
+        `transferred_file_sha256` is hashed incrementally while the chunks are
+        written, so the finished file does not have to be read back from disk.
+        When it is None, because the file was not written in order, every one
+        of `blocks` must have matched its digest instead, and the whole-file
+        SHA-256 is not checked.
+        """
+        if transferred_file_sha256 is None:
+            if blocks.missing():
+                print(f"File transfer failed. {len(blocks.missing())} blocks do not match.")
+                return False
+            # The blocks were checked against the digests sent with the file; the
+            # whole-file SHA256 would take reading the file back, so it is not.
+            print(f"All {len(blocks.digests)} blocks match their SHA256 digests.")
+            print(f"Original file SHA256: {file_sha256} (not recomputed)")
+        else:
+            print(f"Transferred file SHA256: {transferred_file_sha256}")
+            print(f"Original file SHA256: {file_sha256}")
+            if transferred_file_sha256 != file_sha256:
+                print("File transfer failed. SHA256 mismatch.")
+                return False
+        if self.file_manager.get_file_size(file_name) != file_size:
+            print("File transfer failed. File size mismatch.")
+            return False
+        print("File transfer complete")
+        return True
+
+    def fetch_batch(self, patterns: list[str], connections: int = BATCH_CONNECTIONS) -> bool:
+        """Downloads every file named by `patterns`, which are file names or globs matched against `list_files`.
+
+        The files are spread over up to `connections` connections, the main
+        one included, largest first onto the connection with the fewest bytes
+        to fetch, and each connection asks for all of its files with a single
+        FILE request (see `Server.requested_files`). Blocks that arrive
+        corrupted are requested again over the main connection once every
+        file has arrived.
+
+        Returns:
+            bool: True if every file was downloaded and verified.
+        """
+        files = self.expand_patterns(patterns)
+        if not files:
+            print("No files to fetch.")
+            return False
+        start = time.perf_counter()
+        if not self.framed:
+            # The legacy protocol has no batch request: files are fetched one at a time.
+            results = {name: self.fetch_file(name) for name, _ in files}
+        else:
+            results: dict[str, bool] = {}
+            repairs: list[tuple[str, dict, BlockDigests]] = []
+            threads = [
+                threading.Thread(target=self.fetch_group, args=(group, results, repairs, index == 0))
+                for index, group in enumerate(self.split_batch(files, connections))
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for file_name, header, blocks in repairs:
+                results[file_name] = self.repair_file(file_name, header["sha256"], blocks) and \
+                    self.verify_file(file_name, header["size"], header["sha256"], None, blocks)
+        elapsed = time.perf_counter() - start
+        fetched = [name for name, _ in files if results.get(name)]
+        size = sum(self.file_manager.get_file_size(name) for name in fetched)
+        print(f"Fetched {len(fetched)} of {len(files)} files, {size / 2**20:.2f} MiB in {elapsed:.2f} s "
+              f"({size / 2**20 / elapsed:.2f} MiB/s).")
+        return len(fetched) == len(files)
+
+    def expand_patterns(self, patterns: list[str]) -> list[tuple[str, int]]:
+        """Returns the name and size of the files named by `patterns`.
+
+        Globs are matched against the server's files; plain names are kept
+        even when not listed, for the server to answer them.
+        """
+        listing = {file["name"]: file["size"] for file in self.list_files()}
+        files: dict[str, int] = {}
+        for pattern in patterns:
+            if not any(character in pattern for character in "*?["):
+                files[pattern] = listing.get(pattern, 0)
+                continue
+            matches = fnmatch.filter(listing, pattern)
+            if not matches:
+                print(f"No file matches {pattern}.")
+            files.update((name, listing[name]) for name in matches)
+        return list(files.items())
+
+    @staticmethod
+    def split_batch(files: list[tuple[str, int]], connections: int) -> list[list[str]]:
+        """Splits (name, size) pairs into up to `connections` groups holding about as many bytes each."""
+        groups: list[list[str]] = [[] for _ in range(max(1, min(connections, len(files))))]
+        loads = [0] * len(groups)
+        for name, size in sorted(files, key=lambda file: file[1], reverse=True):
+            index = min(range(len(groups)), key=lambda i: (loads[i], len(groups[i])))
+            groups[index].append(name)
+            loads[index] += size
+        return groups
+
+    def fetch_group(self, names: list[str], results: dict, repairs: list, main: bool) -> None:
+        """Downloads one group of `fetch_batch`, over the main connection or over one of its own."""
+        try:
+            if main:
+                self.receive_batch(names, results, repairs, self.socket, self.frame_reader)
+                return
+            with self.open_connection() as _socket:
+                reader = FrameReader(_socket)
+                self.handshake(_socket, reader)
+                self.receive_batch(names, results, repairs, _socket, reader)
+                _socket.sendall(encode_frame(FrameType.EXIT))
+        except (OSError, ValueError) as e:
+            self.log_manager.add_error("Batch of %s files failed: %s", len(names), e)
+
+    def receive_batch(self, names: list[str], results: dict, repairs: list, _socket: socket.socket, reader: FrameReader) -> None:
+        """Asks for `names` with one FILE request and receives them in order.
+
+        Sets `results[name]` once a file is verified or refused. Files with
+        corrupted blocks are NAKed and added to `repairs` as (name, header,
+        blocks), since the server may already be sending the next file.
+        """
+        request = {"names": names, "mode": "bulk" if self.bulk else "stream", "offset": 0, "blocks": True}
+        _socket.sendall(encode_frame(FrameType.FILE, json.dumps(request).encode("utf-8")))
+        for file_name in names:
+            header = json.loads(reader.read_frame().payload)
+            if "status" in header:
+                print(f"{file_name}: {header['message']}")
+                results[file_name] = False
+                continue
+            sha256_hash = hashlib.sha256()
+            blocks = BlockDigests(header["size"], header["block_size"], header["blocks"])
+            with self.file_manager.open_writer(file_name, header["size"]) as writer:
+                received = self.receive_body(header, writer, (sha256_hash, blocks.stream()), _socket, reader)
+            if blocks.missing():
+                repairs.append((file_name, header, blocks))
+                verified = False
+            else:
+                verified = results[file_name] = self.verify_file(file_name, header["size"], header["sha256"], sha256_hash.hexdigest())
+            _socket.sendall(encode_frame(FrameType.FIN if verified else FrameType.NAK, struct.pack("!I", received)))
+
+    def receive_file_frames(self, file_name: str, file_size: int, file_sha256: str, window: int) -> bool:
+        """Receives a file streamed as DATA frames after a legacy "202" header."""
+        self.window = window
+        header = {"size": file_size, "sha256": file_sha256, "mode": "stream"}
+        return self.receive_file(file_name, header, self.file_manager.open_writer(file_name, file_size), hashlib.sha256())
+
     def handle_chat(self) -> None:
+        if self.framed:
+            self.handle_chat_framed()
+            return
         request = "CHAT"
         self.socket.send(request.encode("utf-8"))
         response = self.socket.recv(60).decode("utf-8").split(CRLF)
@@ -135,18 +659,96 @@ class Client:
                             break
                     data = self.socket.recv(1024)
                     if data == b"":
-                        pass
+                        # The input thread stops at the next line typed.
+                        self.chat_mode = False
+                        self.socket.setblocking(True)
+                        print("Connection closed by server.")
                     else:
                         print(data.decode("utf-8"))
                 except BlockingIOError:
                     pass
+        else:
+            print(response[0][3:])
             
+    def handle_chat_framed(self) -> None:
+        self.socket.sendall(encode_frame(FrameType.CHAT))
+        frame = self.frame_reader.read_frame()
+        if frame.type != FrameType.MESSAGE:
+            print(json.loads(frame.payload)["message"])
+            return
+        print(frame.payload.decode("utf-8"))
+        self.chat_mode = True
+        self.input_thread = threading.Thread(target=self.input_thread_handler)
+        self.input_thread.start()
+        try:
+            while self.chat_mode:
+                self.lock.acquire()
+                messages, self.chat_messages = self.chat_messages, []
+                self.lock.release()
+                for message in messages:
+                    self.socket.sendall(encode_compressed_frame(self.codec, FrameType.MESSAGE, message.encode("utf-8")))
+                    if message == "/exit":
+                        self.chat_mode = False
+                        break
+                if not self.chat_mode:
+                    break
+                readable, _, _ = select.select([self.socket], [], [], 0.05)
+                if readable:
+                    self.frame_reader.fill()
+                for frame in self.frame_reader.frames():
+                    print(frame.payload.decode("utf-8"))
+            # The server confirms the leave with an EOF frame, after which no more
+            # chat messages are delivered to this connection.
+            while (frame := self.frame_reader.read_frame()).type != FrameType.EOF:
+                print(frame.payload.decode("utf-8"))
+        except ConnectionError:
+            # The input thread stops at the next line typed.
+            self.chat_mode = False
+            print("Connection closed by server.")
+
+    def fetch_stats(self) -> dict:
+        """Returns the server's metrics (see `app.common.metrics.Metrics.snapshot`)."""
+        if self.framed:
+            self.socket.sendall(encode_frame(FrameType.STAT))
+            return json.loads(self.frame_reader.read_frame().payload)
+        return self.legacy_json_request(b"STAT")
+
+    def list_files(self, pattern: str = "*") -> list[dict]:
+        """Returns the name and size of the server's files matching `pattern`."""
+        if self.framed:
+            self.socket.sendall(encode_frame(FrameType.LIST, json.dumps({"pattern": pattern}).encode("utf-8")))
+            return json.loads(self.frame_reader.read_frame().payload)["files"]
+        return self.legacy_json_request(f"LIST{pattern}".encode("utf-8"))["files"]
+
+    def print_files(self, pattern: str = "*") -> None:
+        for file in self.list_files(pattern):
+            print(f"{file['size']:>12}  {file['name']}")
+
+    def legacy_json_request(self, request: bytes) -> dict:
+        """Sends a legacy command answered with "200" and a JSON document, and returns the document."""
+        self.socket.sendall(request)
+        response = b""
+        while True:
+            data = self.socket.recv(65536)
+            if not data:
+                raise ConnectionError("Connection closed by server.")
+            response += data
+            if response[:3] == SERVER_BUSY[:3]:
+                raise ConnectionError("Server busy, try again later.")
+            try:
+                return json.loads(response[3 + len(CRLF):])
+            except ValueError:
+                continue
+
     def handle_request(self) -> None:
         pass
 
     def handle_exit(self) -> None:
-        request = "EXIT"
-        self.socket.send(request.encode("utf-8"))
+        if self.framed:
+            self.socket.sendall(encode_frame(FrameType.EXIT))
+        else:
+            request = "EXIT"
+            self.socket.send(request.encode("utf-8"))
         self.socket.close()
         self.running = False
         print("Exiting...")
@@ -1,7 +1,43 @@
+import argparse
+import sys
 from app.client.client import Client
+from app.common.compression import CODECS
+from app.common.constants import SERVER_IP, SERVER_PORT, CLIENT_PORT, BATCH_CONNECTIONS
 
-def main():
-    client = Client()
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="TCP file and chat client.")
+    parser.add_argument("--server-ip", default=SERVER_IP)
+    parser.add_argument("--server-port", type=int, default=SERVER_PORT)
+    parser.add_argument("--resume", action="store_true",
+                        help="only download what is missing from a partial local copy")
+    parser.add_argument("--streams", type=int, default=1,
+                        help="download files as this many byte ranges over parallel connections")
+    parser.add_argument("--delta", action="store_true",
+                        help="only download the parts of a file that differ from the local copy")
+    parser.add_argument("--compression", choices=sorted(CODECS),
+                        help="ask the server to compress file bodies and chat messages with this codec")
+    parser.add_argument("--list", nargs="?", const="*", metavar="PATTERN",
+                        help="print the server's files matching PATTERN and exit")
+    parser.add_argument("--fetch", nargs="+", metavar="FILE",
+                        help="download these files or glob patterns, then exit")
+    parser.add_argument("--connections", type=int, default=BATCH_CONNECTIONS,
+                        help="connections --fetch spreads the files over")
+    args = parser.parse_args(argv)
+    interactive = args.list is None and args.fetch is None
+    # Batch runs bind any free local port rather than prompting when CLIENT_PORT is taken.
+    client_port = CLIENT_PORT if interactive else 0
+    client = Client(args.server_ip, args.server_port, client_port, resume=args.resume, streams=args.streams,
+                    delta=args.delta, compression=args.compression, interactive=interactive)
+    if interactive:
+        return
+    client.connect()
+    ok = True
+    if args.list is not None:
+        client.print_files(args.list)
+    if args.fetch:
+        ok = client.fetch_batch(args.fetch, args.connections)
+    client.handle_exit()
+    sys.exit(0 if ok else 1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
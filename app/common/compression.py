@@ -0,0 +1,113 @@
+import lzma
+import zlib
+from abc import ABC, abstractmethod
+from typing import Iterator
+
+from app.common.constants import COMPRESSION_LEVEL, COMPRESSION_MAX_RATIO, COMPRESSION_MIN_SIZE, LZMA_PRESET
+
+
+class Codec(ABC):
+    """Compression format a framed connection can negotiate in its HELLO.
+
+    File bodies are compressed as one stream spread over DATA frames (see
+    `compress_stream`), chat messages one frame at a time (see
+    `app.common.framing.encode_compressed_frame`).
+
+    Attributes:
+        name (str): Name of the format in HELLO and HEADER frames.
+        codec_id (int): Byte identifying the format in COMPRESSED frames.
+    """
+    name = ""
+    codec_id = 0
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Compresses a whole payload."""
+
+    def decompress(self, data: bytes, max_size: int) -> bytes:
+        """Decompresses a whole payload, raising ValueError if it is corrupt or exceeds `max_size` bytes."""
+        try:
+            result = self.decompressor().decompress(data, max_size + 1)
+        except (zlib.error, lzma.LZMAError) as e:
+            raise ValueError(f"Corrupt {self.name} data: {e}") from e
+        if len(result) > max_size:
+            raise ValueError(f"Decompressed payload exceeds the {max_size} bytes limit.")
+        return result
+
+    @abstractmethod
+    def compressor(self):
+        """Returns an incremental compressor, with `compress(data)` and `flush()` methods."""
+
+    @abstractmethod
+    def decompressor(self):
+        """Returns an incremental decompressor, with a `decompress(data, max_length)` method."""
+
+    def finish(self, decompressor) -> bytes:
+        """Returns whatever `decompressor` still holds once the whole stream was fed to it."""
+        return b""
+
+
+class ZlibCodec(Codec):
+    """Fast general purpose compression, the default."""
+    name = "zlib"
+    codec_id = 1
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, COMPRESSION_LEVEL)
+
+    def compressor(self):
+        return zlib.compressobj(COMPRESSION_LEVEL)
+
+    def decompressor(self):
+        return zlib.decompressobj()
+
+    def finish(self, decompressor) -> bytes:
+        return decompressor.flush()
+
+
+class LzmaCodec(Codec):
+    """Slow but dense compression, for archival transfers over slow links."""
+    name = "lzma"
+    codec_id = 2
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=LZMA_PRESET)
+
+    def compressor(self):
+        return lzma.LZMACompressor(preset=LZMA_PRESET)
+
+    def decompressor(self):
+        return lzma.LZMADecompressor()
+
+
+CODECS: dict[str, Codec] = {codec.name: codec for codec in (ZlibCodec(), LzmaCodec())}
+CODEC_IDS: dict[int, Codec] = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+def negotiate(offered: list[str] | None) -> Codec | None:
+    """Returns the first of the codecs `offered` by a client that is supported, if any."""
+    for name in offered or ():
+        if name in CODECS:
+            return CODECS[name]
+    return None
+
+
+def is_compressible(sample: bytes) -> bool:
+    """Tells from a sample of some data whether compressing it is worth the CPU time.
+
+    The sample is compressed at the fastest zlib level: data that is already
+    compressed, such as JPEG images or gzip archives, barely shrinks.
+    """
+    return len(sample) >= COMPRESSION_MIN_SIZE and len(zlib.compress(sample, 1)) < len(sample) * COMPRESSION_MAX_RATIO
+
+
+def compress_stream(codec: Codec, chunks: Iterator[bytes]) -> Iterator[bytes]:
+    """Compresses `chunks` as one stream, yielding the compressed data as the compressor emits it."""
+    compressor = codec.compressor()
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    data = compressor.flush()
+    if data:
+        yield data
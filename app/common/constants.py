@@ -6,4 +6,100 @@ CLIENT_PORT = 2024
 
 CHUNK_SIZE = 4096
 
-CRLF = "\r\n"
\ No newline at end of file
+# Threads serving connections in the threaded servers, connections allowed to
+# wait for a thread, and seconds a waiting connection may wait before it is
+# rejected. Connections beyond these limits get a 503 right away.
+WORKER_THREADS = 128
+WORKER_QUEUE_SIZE = 256
+WORKER_MAX_WAIT = 5.0
+# Share of those threads chat sessions may hold at once. A chat member keeps
+# its thread for as long as it stays in the room, so without a cap idle chats
+# could take every thread; large chats belong on the asyncio engine.
+CHAT_WORKER_SHARE = 0.5
+
+# Reply sent instead of serving a connection the TCP server has no room for,
+# and seconds a TCP connection may stay silent before the server closes it
+# (chat sessions are exempt, see CHAT_WORKER_SHARE).
+SERVER_BUSY = b"503Server busy"
+TCP_IDLE_TIMEOUT = 60.0
+
+# Size of the buffer FileWriter uses to coalesce received chunks into larger writes.
+WRITE_BUFFER_SIZE = 256 * 1024
+
+# Minimum LogManager level (10 debug, 20 info, 30 warn, 40 error), and the size in
+# bytes / age in seconds after which log.log is rotated (0 disables the trigger),
+# keeping at most LOG_RETENTION rotated files.
+LOG_LEVEL = 20
+LOG_ROTATE_BYTES = 10 * 1024 * 1024
+LOG_ROTATE_INTERVAL = 0
+LOG_RETENTION = 5
+
+# LogManager flushes the log file once this many bytes are pending or this many
+# seconds have passed since the previous flush, whichever comes first.
+LOG_FLUSH_SIZE = 64 * 1024
+LOG_FLUSH_INTERVAL = 1.0
+
+# Messages queued per chat member before the backpressure policy applies, and
+# the policy itself: "drop-oldest" or "disconnect" (see app.server.chat).
+CHAT_QUEUE_SIZE = 256
+CHAT_BACKPRESSURE_POLICY = "drop-oldest"
+
+# Room chat members are placed in when they do not ask for a specific one.
+CHAT_DEFAULT_ROOM = "lobby"
+
+# Maximum number of FILE chunks in flight before the sender waits for an ACK.
+WINDOW_SIZE = 64
+
+# HTTP keep-alive: seconds an idle connection is kept open, requests served per
+# connection before it is closed, and the largest request head accepted.
+HTTP_IDLE_TIMEOUT = 15.0
+HTTP_MAX_REQUESTS = 100
+HTTP_MAX_HEADER_SIZE = 8192
+
+# HTTP response cache: total bytes of cached bodies, largest file cached (larger
+# files are streamed from disk), and seconds after which a cached file is
+# checked against the disk again.
+HTTP_CACHE_SIZE = 32 * 1024 * 1024
+HTTP_CACHE_MAX_FILE_SIZE = 1024 * 1024
+HTTP_CACHE_REVALIDATE_INTERVAL = 1.0
+
+# zlib level used to compress HTTP responses, and the largest file compressed.
+HTTP_COMPRESSION_LEVEL = 6
+HTTP_COMPRESSION_MAX_SIZE = 8 * 1024 * 1024
+
+# Seconds worker processes are given to finish their connections on shutdown,
+# and the delay before restarting a worker that exited right after starting.
+HTTP_SHUTDOWN_TIMEOUT = 20.0
+HTTP_WORKER_RESTART_DELAY = 1.0
+
+# File, relative to a FileManager base directory, where computed SHA-256 digests are kept.
+DIGEST_INDEX_FILE = ".digests.json"
+DIGEST_INDEX_SIZE = 1024
+
+# Size of the blocks whose SHA-256 digests are sent with a FILE header, and how
+# many times the client re-requests blocks that still do not match them.
+FILE_BLOCK_SIZE = 1024 * 1024
+FILE_BLOCK_RETRIES = 3
+
+# Connections a batch of files is spread over by the client.
+BATCH_CONNECTIONS = 4
+
+# Delta downloads: size of the blocks the client sends signatures of, most
+# signatures sent (larger files use larger blocks), unmatched bytes in a row
+# the server searches byte by byte before only trying block-aligned offsets,
+# and bytes it searches byte by byte in a whole request.
+DELTA_BLOCK_SIZE = 64 * 1024
+DELTA_MAX_BLOCKS = 16384
+DELTA_SEARCH_LIMIT = 4 * 1024 * 1024
+DELTA_SEARCH_BUDGET = 16 * 1024 * 1024
+
+# Compression negotiated by framed connections: zlib level and lzma preset,
+# smallest payload compressed, bytes of a file sampled to decide whether it is
+# compressible, and the compressed to original size ratio the sample must beat.
+COMPRESSION_LEVEL = 6
+LZMA_PRESET = 6
+COMPRESSION_MIN_SIZE = 512
+COMPRESSION_SAMPLE_SIZE = 64 * 1024
+COMPRESSION_MAX_RATIO = 0.9
+
+CRLF = "\r\n"
@@ -0,0 +1,100 @@
+import hashlib
+import mmap
+import os
+import zlib
+from typing import BinaryIO
+
+from app.common.constants import DELTA_BLOCK_SIZE, DELTA_MAX_BLOCKS, DELTA_SEARCH_BUDGET, DELTA_SEARCH_LIMIT
+
+# Kinds of the instructions of a delta plan.
+COPY = 0
+LITERAL = 1
+ADLER_MODULUS = 65521
+
+
+def delta_block_size(size: int) -> int:
+    """Returns the size of the blocks signatures of a `size` bytes file are computed over."""
+    return max(DELTA_BLOCK_SIZE, -(-size // DELTA_MAX_BLOCKS))
+
+
+def strong_checksum(block: bytes) -> str:
+    return hashlib.sha256(block).hexdigest()[:32]
+
+
+def block_signatures(file: BinaryIO, block_size: int) -> list[list]:
+    """Returns the [weak, strong] checksums of every full `block_size` block of `file`.
+
+    The weak checksum is the Adler-32 of the block, which can be rolled one
+    byte at a time; the strong one is the first 128 bits of its SHA-256. A
+    shorter last block is left out, since it could only match at the very
+    end of the new file.
+    """
+    signatures = []
+    for block in iter(lambda: file.read(block_size), b""):
+        if len(block) == block_size:
+            signatures.append([zlib.adler32(block), strong_checksum(block)])
+    return signatures
+
+
+def plan_delta(file: BinaryIO, block_size: int, signatures: list[list],
+               search_limit: int = DELTA_SEARCH_LIMIT, search_budget: int = DELTA_SEARCH_BUDGET) -> list[tuple[int, int, int]]:
+    """Describes `file` as blocks of another copy, given by their `signatures`, and literal data.
+
+    Returns, in file order, (COPY, first block, block count) instructions for
+    runs of the other copy's blocks and (LITERAL, offset, length) ones for the
+    bytes of `file` in between.
+
+    As in rsync, every offset of `file` is tried as the start of a block: the
+    Adler-32 of the window is rolled one byte at a time and looked up among
+    the weak checksums, and only candidates get their strong checksum
+    computed. Past `search_limit` unmatched bytes in a row, only offsets one
+    block apart are tried until the next match, and once `search_budget`
+    bytes were searched byte by byte in all, for the rest of the file. This
+    bounds the time spent on a file that shares little with the other copy,
+    even if a match now and then restarts the search.
+    """
+    size = os.fstat(file.fileno()).st_size
+    if size == 0:
+        return []
+    if not signatures or size < block_size:
+        return [(LITERAL, 0, size)]
+    table: dict[int, dict[str, int]] = {}
+    for index, (weak, strong) in enumerate(signatures):
+        table.setdefault(weak, {}).setdefault(strong, index)
+    plan: list[tuple[int, int, int]] = []
+    last = size - block_size
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        literal_start = position = 0
+        while position <= last:
+            weak = zlib.adler32(data[position:position + block_size])
+            a, b = weak & 0xFFFF, weak >> 16
+            start = position
+            end = min(last, literal_start + search_limit, position + search_budget)
+            while True:
+                candidates = table.get(b << 16 | a)
+                if candidates is not None:
+                    index = candidates.get(strong_checksum(data[position:position + block_size]))
+                    if index is not None:
+                        break
+                if position >= end:
+                    index = None
+                    break
+                removed, added = data[position], data[position + block_size]
+                a = (a - removed + added) % ADLER_MODULUS
+                b = (b - block_size * removed + a - 1) % ADLER_MODULUS
+                position += 1
+            search_budget -= position - start
+            if index is None:
+                position += block_size
+                continue
+            if literal_start < position:
+                plan.append((LITERAL, literal_start, position - literal_start))
+            if plan and plan[-1][0] == COPY and plan[-1][1] + plan[-1][2] == index:
+                plan[-1] = (COPY, plan[-1][1], plan[-1][2] + 1)
+            else:
+                plan.append((COPY, index, 1))
+            position += block_size
+            literal_start = position
+    if literal_start < size:
+        plan.append((LITERAL, literal_start, size - literal_start))
+    return plan
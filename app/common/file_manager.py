@@ -1,7 +1,116 @@
 import os
+import fnmatch
 import hashlib
-from typing import Generator
-from app.common.constants import CHUNK_SIZE
+import json
+import threading
+from collections import OrderedDict
+from typing import BinaryIO, Generator
+from app.common.constants import CHUNK_SIZE, DIGEST_INDEX_FILE, DIGEST_INDEX_SIZE, FILE_BLOCK_SIZE, WRITE_BUFFER_SIZE
+
+class DigestIndex:
+    """Persistent, bounded cache of file SHA-256 digests, along with the digests of their blocks.
+
+    Entries are keyed by file path and are only valid while the file's size,
+    modification time and inode are unchanged, so edited or replaced files are
+    rehashed automatically. The least recently used entry is evicted once
+    `max_entries` is exceeded. The index is loaded lazily and saved to
+    `index_path` every time an entry is added.
+
+    Attributes:
+        index_path (str): Path of the JSON file the index is persisted to.
+        max_entries (int): Maximum number of digests kept.
+    """
+    def __init__(self, index_path: str, max_entries: int = DIGEST_INDEX_SIZE) -> None:
+        self.index_path = index_path
+        self.max_entries = max_entries
+        self.entries: OrderedDict[str, list] | None = None
+        self.lock = threading.Lock()
+
+    def load(self) -> None:
+        try:
+            with open(self.index_path, "r") as file:
+                self.entries = OrderedDict(json.load(file))
+        except (OSError, ValueError):
+            self.entries = OrderedDict()
+
+    def save(self) -> None:
+        temporary_path = f"{self.index_path}.tmp"
+        try:
+            with open(temporary_path, "w") as file:
+                json.dump(list(self.entries.items()), file)
+            os.replace(temporary_path, self.index_path)
+        except OSError:
+            pass
+
+    def get(self, path: str, stat: os.stat_result) -> tuple[str, list[str]] | None:
+        """Returns the digest of the file and the digests of its blocks, if known."""
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            entry = self.entries.get(path)
+            # Entries written before block digests were kept have no fifth field.
+            if entry is None or len(entry) < 5 or entry[:3] != [stat.st_size, stat.st_mtime_ns, stat.st_ino]:
+                return None
+            self.entries.move_to_end(path)
+            return entry[3], entry[4]
+
+    def put(self, path: str, stat: os.stat_result, digest: str, block_digests: list[str]) -> None:
+        with self.lock:
+            if self.entries is None:
+                self.load()
+            self.entries[path] = [stat.st_size, stat.st_mtime_ns, stat.st_ino, digest, block_digests]
+            self.entries.move_to_end(path)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            self.save()
+
+class FileWriter:
+    """Writer that keeps a single open handle for the whole transfer of a file.
+
+    Small writes are coalesced by a `buffer_size` bytes buffer before reaching
+    the file, and when the final `size` is known the file is preallocated up
+    front so the filesystem does not have to grow it on every write. On close
+    the file is truncated to the number of bytes actually written.
+
+    With an `offset`, the existing file is written in place from that
+    position instead of being replaced, to resume a partial download or to
+    fill one range of a preallocated file. `truncate=False` leaves the file
+    length alone on close, so writers of other ranges are not cut off.
+
+    Attributes:
+        offset (int): Position of the first byte written.
+        written (int): Number of bytes written so far.
+    """
+    def __init__(self, file_path: str, size: int | None = None, buffer_size: int = WRITE_BUFFER_SIZE,
+                 offset: int | None = None, truncate: bool = True) -> None:
+        self.file = open(file_path, "wb" if offset is None else "r+b", buffering=buffer_size)
+        self.offset = offset or 0
+        self.truncate = truncate
+        self.written = 0
+        if self.offset:
+            self.file.seek(self.offset)
+        if size:
+            try:
+                os.posix_fallocate(self.file.fileno(), 0, size)
+            except (AttributeError, OSError):
+                self.file.truncate(size)
+
+    def write(self, data: bytes) -> None:
+        self.written += self.file.write(data)
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        self.file.flush()
+        if self.truncate:
+            self.file.truncate(self.offset + self.written)
+        self.file.close()
+
+    def __enter__(self) -> "FileWriter":
+        return self
+
+    def __exit__(self, *_) -> None:
+        self.close()
 
 class FileManager:
     """Abstraction for file manipulations.
@@ -18,6 +127,7 @@ class FileManager:
             raise FileNotFoundError()
         
         self.base_directory = _base_directory
+        self.digest_index = DigestIndex(f"{_base_directory}/{DIGEST_INDEX_FILE}")
     
     def write_to_file(self, content: str, file_name: str, overwrite: bool = False) -> None:
         try:
@@ -43,22 +153,77 @@ class FileManager:
         except OSError as e:
             raise e
     
-    def read_from_file(self, file_name: str):
+    def read_from_file(self, file_name: str, offset: int = 0, length: int | None = None):
+        """Yields the size of the file, then its content from `offset` in CHUNK_SIZE chunks.
+
+        At most `length` bytes are read, or up to the end of the file if None.
+        """
         try:
             file_path = f"{self.base_directory}/{file_name}"
             with open(file_path, "rb") as file:
                 yield os.path.getsize(file_path)
+                file.seek(offset)
+                remaining = length
                 while True:
-                    data = file.read(CHUNK_SIZE)
+                    data = file.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
                     if not data:
                         break
+                    if remaining is not None:
+                        remaining -= len(data)
                     yield data
         except OSError:
             return False
         
+    def open_writer(self, file_name: str, size: int | None = None, offset: int | None = None,
+                    truncate: bool = True) -> FileWriter:
+        """Opens `file_name` for a streamed write.
+
+        The existing content is replaced unless `offset` is given, in which
+        case writing starts at that position of the existing file (see `FileWriter`).
+        """
+        return FileWriter(f"{self.base_directory}/{file_name}", size, offset=offset, truncate=truncate)
+
+    def open_for_append(self, file_name: str, buffer_size: int = WRITE_BUFFER_SIZE) -> BinaryIO:
+        return open(f"{self.base_directory}/{file_name}", "ab", buffering=buffer_size)
+
+    def open_file(self, file_name: str) -> BinaryIO:
+        return open(f"{self.base_directory}/{file_name}", "rb")
+
+    def list_files(self, pattern: str = "*") -> list[tuple[str, int]]:
+        """Returns the name and size of the files of the base directory whose name matches `pattern`.
+
+        Directories and hidden files, such as the digest index, are left out.
+        """
+        files = []
+        with os.scandir(self.base_directory) as entries:
+            for entry in entries:
+                if not entry.name.startswith(".") and entry.is_file() and fnmatch.fnmatchcase(entry.name, pattern):
+                    files.append((entry.name, entry.stat().st_size))
+        return sorted(files)
+
+    def replace_file(self, source_name: str, file_name: str) -> None:
+        """Atomically replaces `file_name` with `source_name`."""
+        os.replace(f"{self.base_directory}/{source_name}", f"{self.base_directory}/{file_name}")
+
+    def remove_file(self, file_name: str) -> None:
+        try:
+            os.remove(f"{self.base_directory}/{file_name}")
+        except FileNotFoundError:
+            pass
+
     def check_file_exists(self, file_name: str) -> bool:
         return os.path.exists(f"{self.base_directory}/{file_name}")
 
+    def is_served(self, file_name: str) -> bool:
+        """Whether clients may fetch `file_name`: one of the files `list_files` returns.
+
+        Hidden files, such as the digest index, files in subdirectories, such
+        as the logs, and paths leading out of the base directory are refused.
+        """
+        if not file_name or file_name.startswith(".") or "/" in file_name or os.sep in file_name:
+            return False
+        return os.path.isfile(f"{self.base_directory}/{file_name}")
+
     def check_or_create_directory(self, directory_name: str) -> bool:
         try:
             if not os.path.exists(f"{self.base_directory}/{directory_name}"):
@@ -68,15 +233,34 @@ class FileManager:
             return False
         
     def calculate_sha256(self, file_name: str) -> str | bool:
+        """Returns the SHA-256 of a file, reusing the digest index when the file is unchanged."""
+        digests = self.calculate_digests(file_name)
+        return digests[0] if digests else False
+
+    def calculate_digests(self, file_name: str) -> tuple[str, list[str]] | None:
+        """Returns the SHA-256 of a file and of each of its FILE_BLOCK_SIZE blocks.
+
+        Both are computed in a single read of the file and kept in the digest
+        index while the file is unchanged.
+        """
         try:
             sha256_hash = hashlib.sha256()
+            block_digests = []
             file_path = f"{self.base_directory}/{file_name}"
+            stat = os.stat(file_path)
+            digests = self.digest_index.get(file_path, stat)
+            if digests is not None:
+                return digests
             with open(file_path, "rb") as file:
-                for chunk in iter(lambda: file.read(4096), b""):
-                    sha256_hash.update(chunk)
-            return sha256_hash.hexdigest()
+                for block in iter(lambda: file.read(FILE_BLOCK_SIZE), b""):
+                    sha256_hash.update(block)
+                    block_digests.append(hashlib.sha256(block).hexdigest())
+            digest = sha256_hash.hexdigest()
+            if os.stat(file_path).st_mtime_ns == stat.st_mtime_ns:
+                self.digest_index.put(file_path, stat, digest, block_digests)
+            return digest, block_digests
         except OSError:
-            return False
+            return None
     
     def get_file_size(self, file_name: str) -> int:
         try:
@@ -0,0 +1,153 @@
+import socket
+import struct
+from enum import IntEnum
+from typing import Iterator, NamedTuple
+
+from app.common.compression import CODEC_IDS, Codec
+from app.common.constants import COMPRESSION_MIN_SIZE
+
+FRAME_HEADER = struct.Struct("!BI")
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+
+
+class FrameType(IntEnum):
+    """Frame types of the framed protocol.
+
+    A framed connection starts with the client sending HELLO. Legacy requests
+    always start with an ASCII command (EXIT, FILE, CHAT, STAT, LIST), so the server can
+    tell both protocols apart from the first byte of the connection.
+
+    A COMPRESSED frame wraps another frame: its payload is the type of the
+    wrapped frame, the id of the codec (see `app.common.compression`) and the
+    compressed payload. Decoders unwrap them, so readers never see one.
+    """
+    HELLO = 0x01
+    FILE = 0x02
+    CHAT = 0x03
+    EXIT = 0x04
+    HEADER = 0x05
+    DATA = 0x06
+    EOF = 0x07
+    ACK = 0x08
+    FIN = 0x09
+    NAK = 0x0A
+    MESSAGE = 0x0B
+    ERROR = 0x0C
+    STAT = 0x0D
+    LIST = 0x0E
+    DELTA = 0x0F
+    COPY = 0x10
+    COMPRESSED = 0x11
+
+
+class Frame(NamedTuple):
+    type: int
+    payload: bytes
+
+
+def encode_frame(frame_type: int, payload: bytes = b"") -> bytes:
+    """Encodes a frame as a type byte, a 4-byte big endian length and the payload."""
+    return FRAME_HEADER.pack(frame_type, len(payload)) + payload
+
+
+def encode_compressed_frame(codec: Codec | None, frame_type: int, payload: bytes) -> bytes:
+    """Encodes a frame wrapped in a COMPRESSED frame, unless there is no codec or compressing does not make it smaller."""
+    if codec is not None and len(payload) >= COMPRESSION_MIN_SIZE:
+        compressed = codec.compress(payload)
+        if len(compressed) + 2 < len(payload):
+            return encode_frame(FrameType.COMPRESSED, bytes((frame_type, codec.codec_id)) + compressed)
+    return encode_frame(frame_type, payload)
+
+
+class FrameDecoder:
+    """Incremental frame decoder.
+
+    Bytes are appended to a single buffer as they arrive and complete frames are
+    sliced out of it. Consumed bytes are only discarded once they make up more
+    than half of the buffer, so decoding many small frames from one read does not
+    shift the buffer once per frame. Every byte fed is added to `counter`, if
+    given (see `app.common.metrics.Counter`).
+    """
+    def __init__(self, max_frame_size: int = MAX_FRAME_SIZE, counter=None) -> None:
+        self.buffer = bytearray()
+        self.offset = 0
+        self.max_frame_size = max_frame_size
+        self.counter = counter
+
+    def feed(self, data: bytes) -> None:
+        if self.counter is not None:
+            self.counter.inc(len(data))
+        if self.offset and self.offset * 2 >= len(self.buffer):
+            del self.buffer[:self.offset]
+            self.offset = 0
+        self.buffer += data
+
+    def next_frame(self) -> Frame | None:
+        available = len(self.buffer) - self.offset
+        if available < FRAME_HEADER.size:
+            return None
+        frame_type, length = FRAME_HEADER.unpack_from(self.buffer, self.offset)
+        if length > self.max_frame_size:
+            raise ValueError(f"Frame of {length} bytes exceeds the {self.max_frame_size} bytes limit.")
+        if available < FRAME_HEADER.size + length:
+            return None
+        start = self.offset + FRAME_HEADER.size
+        self.offset = start + length
+        if frame_type == FrameType.COMPRESSED:
+            codec = CODEC_IDS.get(self.buffer[start + 1])
+            if codec is None:
+                raise ValueError(f"Unknown codec {self.buffer[start + 1]} in a compressed frame.")
+            return Frame(self.buffer[start], codec.decompress(bytes(self.buffer[start + 2:self.offset]), self.max_frame_size))
+        return Frame(frame_type, bytes(self.buffer[start:self.offset]))
+
+    def frames(self) -> Iterator[Frame]:
+        while (frame := self.next_frame()) is not None:
+            yield frame
+
+
+class FrameReader(FrameDecoder):
+    """Frame decoder bound to a blocking socket.
+
+    Reads go through `recv_into` on a preallocated scratch buffer, so no new
+    bytes object is allocated per read.
+    """
+    def __init__(self, _socket: socket.socket, read_size: int = 65536, counter=None) -> None:
+        super().__init__(counter=counter)
+        self.socket = _socket
+        self.scratch = bytearray(read_size)
+        self.view = memoryview(self.scratch)
+
+    def fill(self) -> None:
+        count = self.socket.recv_into(self.scratch)
+        if count == 0:
+            raise ConnectionError("Connection closed by peer.")
+        self.feed(self.view[:count])
+
+    def read_frame(self) -> Frame:
+        while (frame := self.next_frame()) is None:
+            self.fill()
+        return frame
+
+    def peek(self, size: int) -> bytes:
+        """Returns the next `size` bytes without consuming them, reading from the socket if needed."""
+        while len(self.buffer) - self.offset < size:
+            self.fill()
+        return bytes(self.buffer[self.offset:self.offset + size])
+
+    def read_raw(self, size: int) -> Iterator[bytes]:
+        """Yields exactly `size` unframed bytes following the last decoded frame.
+
+        Bytes already buffered by the decoder are returned first; the rest is
+        read straight from the socket.
+        """
+        buffered = min(size, len(self.buffer) - self.offset)
+        if buffered:
+            yield bytes(self.buffer[self.offset:self.offset + buffered])
+            self.offset += buffered
+            size -= buffered
+        while size > 0:
+            count = self.socket.recv_into(self.scratch, min(size, len(self.scratch)))
+            if count == 0:
+                raise ConnectionError("Connection closed by peer.")
+            size -= count
+            yield bytes(self.view[:count])
@@ -0,0 +1,75 @@
+import hashlib
+
+
+class BlockDigests:
+    """Per-block SHA-256 digests of a file being received.
+
+    The file is split into `block_size` blocks, the last one possibly
+    shorter. Data is checked through `BlockStream`s as it is written, so a
+    corrupted block is known as soon as its last byte arrives and can be
+    requested again on its own, and a file whose blocks all matched needs no
+    further read to be verified.
+
+    Attributes:
+        size (int): Size of the whole file.
+        block_size (int): Size of every block but the last.
+        digests (list[str]): Hex SHA-256 digest of each block.
+        verified (set[int]): Indices of the blocks that matched their digest.
+        corrupt (set[int]): Indices of the blocks that did not.
+    """
+    def __init__(self, size: int, block_size: int, digests: list[str]) -> None:
+        self.size = size
+        self.block_size = block_size
+        self.digests = digests
+        self.verified: set[int] = set()
+        self.corrupt: set[int] = set()
+
+    def block_range(self, index: int) -> tuple[int, int]:
+        """Returns the (offset, length) of a block."""
+        offset = index * self.block_size
+        return offset, min(self.block_size, self.size - offset)
+
+    def check(self, index: int, digest: str) -> bool:
+        if digest == self.digests[index]:
+            self.verified.add(index)
+            self.corrupt.discard(index)
+            return True
+        self.corrupt.add(index)
+        return False
+
+    def missing(self) -> list[int]:
+        """Indices of the blocks not verified yet, corrupt or never received."""
+        return [index for index in range(len(self.digests)) if index not in self.verified]
+
+    def stream(self, offset: int = 0) -> "BlockStream":
+        """Returns a checker for data written sequentially from `offset`, which must start a block."""
+        if offset % self.block_size:
+            raise ValueError(f"Offset {offset} is not aligned to {self.block_size} bytes blocks.")
+        return BlockStream(self, offset // self.block_size)
+
+
+class BlockStream:
+    """Hashes sequential data block by block, checking each block against `BlockDigests`.
+
+    Has the same `update` method as a hashlib object, so it can be fed
+    alongside the whole-file hash.
+    """
+    def __init__(self, blocks: BlockDigests, index: int) -> None:
+        self.blocks = blocks
+        self.index = index
+        self.sha256_hash = hashlib.sha256()
+        self.filled = 0
+
+    def update(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view and self.index < len(self.blocks.digests):
+            _, length = self.blocks.block_range(self.index)
+            taken = min(len(view), length - self.filled)
+            self.sha256_hash.update(view[:taken])
+            view = view[taken:]
+            self.filled += taken
+            if self.filled == length:
+                self.blocks.check(self.index, self.sha256_hash.hexdigest())
+                self.index += 1
+                self.sha256_hash = hashlib.sha256()
+                self.filled = 0
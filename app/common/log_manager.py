@@ -1,41 +1,189 @@
+import atexit
 import datetime
+import json
+import os
+import queue
+import threading
+import time
+from app.common.constants import \
+    LOG_FLUSH_INTERVAL, \
+    LOG_FLUSH_SIZE, \
+    LOG_LEVEL, \
+    LOG_ROTATE_BYTES, \
+    LOG_ROTATE_INTERVAL, \
+    LOG_RETENTION
 from app.common.file_manager import FileManager
 
+DEBUG = 10
+INFO = 20
+WARN = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARN: "WARN", ERROR: "ERROR"}
+LEVELS = {name: level for level, name in LEVEL_NAMES.items()}
+
 class LogManager:
-    def __init__(self, file_manager: FileManager):
+    """Asynchronous logger writing to `logs/<file_name>` under a FileManager base directory.
+
+    `add_debug`, `add_log`, `add_warn` and `add_error` only push the record onto
+    a queue, so callers never wait on disk or console I/O. Records below `level`
+    are dropped before anything is formatted; call sites on hot paths should
+    pass %-style arguments instead of pre-formatted strings so that a disabled
+    record costs a single comparison.
+
+    A single writer thread formats the records (as text lines or, with
+    `json_format`, as JSON lines), keeps the log file open and flushes it once
+    `LOG_FLUSH_SIZE` bytes are pending or `LOG_FLUSH_INTERVAL` seconds have
+    passed. The file is rotated to `<file_name>.1`, `<file_name>.2`, ... once it exceeds
+    `rotate_bytes` or is older than `rotate_interval` seconds (0 disables
+    either trigger), keeping at most `retention` rotated files. Pending records
+    are written out when the interpreter exits.
+
+    Attributes:
+        echo (bool): Whether records are also printed to the console.
+        level (int): Minimum level of the records that are kept.
+    """
+    _STOP = object()
+
+    def __init__(self,
+                 file_manager: FileManager,
+                 echo: bool = True,
+                 level: int = LOG_LEVEL,
+                 json_format: bool = False,
+                 rotate_bytes: int = LOG_ROTATE_BYTES,
+                 rotate_interval: float = LOG_ROTATE_INTERVAL,
+                 retention: int = LOG_RETENTION,
+                 file_name: str = "log.log"):
         self.base_dir = "logs"
         self.file_manager = file_manager
+        self.echo = echo
+        self.level = level
+        self.json_format = json_format
+        self.rotate_bytes = rotate_bytes
+        self.rotate_interval = rotate_interval
+        self.retention = retention
         self.check_or_create_base_directory()
+        self.log_file = f"{self.base_dir}/{file_name}"
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.writer_thread = threading.Thread(target=self.writer, daemon=True)
+        self.writer_thread.start()
+        atexit.register(self.close)
 
     def check_or_create_base_directory(self) -> None:
         self.file_manager.check_or_create_directory(self.base_dir)
+
+    def is_enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def add_debug(self, message: str, *args) -> None:
+        if DEBUG >= self.level:
+            self.queue.put((DEBUG, time.time(), message, args))
     
-    def add_log(self, message: str) -> None:
+    def add_log(self, message: str, *args) -> None:
+        if INFO >= self.level:
+            self.queue.put((INFO, time.time(), message, args))
+
+    def add_warn(self, message: str, *args) -> None:
+        if WARN >= self.level:
+            self.queue.put((WARN, time.time(), message, args))
+    
+    def add_error(self, message: str, *args) -> None:
+        if ERROR >= self.level:
+            self.queue.put((ERROR, time.time(), message, args))
+
+    def close(self) -> None:
+        """Writes out every queued record and stops the writer thread."""
+        if self.writer_thread.is_alive():
+            self.queue.put(self._STOP)
+            self.writer_thread.join()
+
+    def format(self, record: tuple[int, float, str, tuple]) -> str:
+        level, timestamp, message, args = record
+        if args:
+            message = message % args
+        moment = datetime.datetime.fromtimestamp(timestamp)
+        if self.json_format:
+            return json.dumps({
+                "time": moment.isoformat(timespec="milliseconds"),
+                "level": LEVEL_NAMES[level],
+                "message": message,
+            })
+        current_time = moment.strftime("%Y-%m-%d %H:%M:%S")
+        return f"[{LEVEL_NAMES[level][0]} {current_time}]: {message}"
+
+    def open_log_file(self):
         try:
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            message = f"[I {current_time}]: {message}"
-            log_file = f"{self.base_dir}/log.log"
-            self.file_manager.write_to_file(content=f"{message}\n", file_name=log_file, overwrite=False)
-            print(message)
+            file = self.file_manager.open_for_append(self.log_file)
+            return file, file.tell()
         except OSError as e:
             print(f"error: {e}")
+            return None, 0
 
-    def add_warn(self, message: str) -> None:
+    def rotate(self, file):
+        """Closes the current file and shifts it to `<file_name>.1`, dropping files past `retention`."""
+        file.close()
+        path = f"{self.file_manager.base_directory}/{self.log_file}"
         try:
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            message = f"[W {current_time}]: {message}"
-            log_file = f"{self.base_dir}/log.log"
-            self.file_manager.write_to_file(content=f"{message}\n", file_name=log_file, overwrite=False)
-            print(message)
+            if self.retention <= 0:
+                os.remove(path)
+            else:
+                if os.path.exists(f"{path}.{self.retention}"):
+                    os.remove(f"{path}.{self.retention}")
+                for index in range(self.retention - 1, 0, -1):
+                    if os.path.exists(f"{path}.{index}"):
+                        os.replace(f"{path}.{index}", f"{path}.{index + 1}")
+                os.replace(path, f"{path}.1")
         except OSError as e:
             print(f"error: {e}")
-    
-    def add_error(self, message: str) -> None:
-        try:
-            current_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            message = f"[E {current_time}]: {message}"
-            log_file = f"{self.base_dir}/log.log"
-            self.file_manager.write_to_file(content=f"{message}\n", file_name=log_file, overwrite=False)
-            print(message)
-        except OSError as e:
-            print(f"error: {e}")
\ No newline at end of file
+        return self.open_log_file()
+
+    def writer(self) -> None:
+        file, size = self.open_log_file()
+        opened_at = time.time()
+        pending = 0
+        last_flush = time.monotonic()
+        while True:
+            timeout = max(0.0, LOG_FLUSH_INTERVAL - (time.monotonic() - last_flush)) if pending else None
+            try:
+                record = self.queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            if record is not None and record is not self._STOP:
+                try:
+                    message = self.format(record)
+                except Exception as e:
+                    # A record whose arguments do not match its message must
+                    # not stop the thread: log what it held instead.
+                    level, timestamp, template, args = record
+                    message = self.format((level, timestamp, f"Unformattable record {template!r} {args!r}: {e!r}", ()))
+                if self.echo:
+                    try:
+                        print(message)
+                    except (OSError, ValueError):
+                        pass
+                if file is not None:
+                    if (self.rotate_bytes and size >= self.rotate_bytes) or \
+                       (self.rotate_interval and record[1] - opened_at >= self.rotate_interval):
+                        file, size = self.rotate(file)
+                        opened_at = record[1]
+                        pending = 0
+                if file is not None:
+                    line = f"{message}\n".encode(errors="backslashreplace")
+                    try:
+                        file.write(line)
+                        pending += len(line)
+                        size += len(line)
+                    except (OSError, ValueError) as e:
+                        print(f"error: {e}")
+            if pending and (record is None or record is self._STOP or pending >= LOG_FLUSH_SIZE
+                            or time.monotonic() - last_flush >= LOG_FLUSH_INTERVAL):
+                try:
+                    file.flush()
+                except OSError as e:
+                    print(f"error: {e}")
+                pending = 0
+                last_flush = time.monotonic()
+            if record is self._STOP:
+                if file is not None:
+                    file.close()
+                return
@@ -0,0 +1,227 @@
+import json
+import threading
+from bisect import bisect_left
+
+# Upper bounds, in seconds, of the buckets latency histograms count into.
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class PerThreadCells:
+    """Base of the metrics that threads update without taking a lock.
+
+    Every thread writes to a cell of its own, found through a
+    `threading.local`, and reading the metric sums the cells, so an update
+    never contends with other threads. Cells of threads that exit are kept,
+    which suits the long-lived worker threads of the servers.
+    """
+    def __init__(self) -> None:
+        self.local = threading.local()
+        self.cells: list[list] = []
+        self.lock = threading.Lock()
+
+    def cell_size(self) -> int:
+        return 1
+
+    def new_cell(self) -> list:
+        cell = [0] * self.cell_size()
+        self.local.cell = cell
+        with self.lock:
+            self.cells.append(cell)
+        return cell
+
+    def totals(self) -> list:
+        with self.lock:
+            cells = tuple(self.cells)
+        return [sum(column) for column in zip(*cells)] or [0] * self.cell_size()
+
+
+class Counter(PerThreadCells):
+    """Monotonic counter, cheap enough to increment in per-chunk loops."""
+    kind = "counter"
+
+    def inc(self, amount: int = 1) -> None:
+        try:
+            self.local.cell[0] += amount
+        except AttributeError:
+            self.new_cell()[0] += amount
+
+    @property
+    def value(self) -> int:
+        return self.totals()[0]
+
+
+class Gauge:
+    """Value that goes up and down, or is set from a snapshot of some other state."""
+    kind = "gauge"
+
+    def __init__(self) -> None:
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount: int = 1) -> None:
+        with self.lock:
+            self.value -= amount
+
+    def set(self, value) -> None:
+        self.value = value
+
+
+class Histogram(PerThreadCells):
+    """Distribution of observed values, counted into fixed buckets.
+
+    Each per-thread cell holds a count per bucket, the last one for values
+    above every bound, followed by the sum of the values.
+
+    Attributes:
+        buckets (tuple[float, ...]): Increasing upper bounds of the buckets.
+    """
+    kind = "histogram"
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__()
+        self.buckets = buckets
+
+    def cell_size(self) -> int:
+        return len(self.buckets) + 2
+
+    def observe(self, value: float) -> None:
+        try:
+            cell = self.local.cell
+        except AttributeError:
+            cell = self.new_cell()
+        cell[bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    @property
+    def value(self) -> list:
+        """Count per bucket followed by the sum, over every thread."""
+        return self.totals()
+
+    def quantile(self, counts: list, q: float) -> float | None:
+        """Upper bound of the bucket holding the `q` quantile of `counts`, as returned by `value`.
+
+        Returns None if that quantile lies above the largest bound.
+        """
+        total = sum(counts[:-1])
+        if total == 0:
+            return 0.0
+        seen = 0
+        for bound, count in zip(self.buckets, counts):
+            seen += count
+            if seen >= q * total:
+                return bound
+        return None
+
+
+class Family:
+    """Metrics sharing a name and a type, told apart by their labels."""
+    def __init__(self, kind: str, description: str) -> None:
+        self.kind = kind
+        self.description = description
+        self.children: dict[tuple, Counter | Gauge | Histogram] = {}
+
+
+class Metrics:
+    """Registry of the counters, gauges and histograms of a server.
+
+    Metrics are created on first use and identified by their name and
+    labels, so call sites only need `metrics.counter("name", label="value")`.
+    Hot paths should look their metric up once and keep it. Collectors
+    registered with `add_collector` run before every export, to refresh
+    gauges that mirror state kept elsewhere, such as a worker pool.
+
+    `render` exports the metrics in the Prometheus text format, `snapshot`
+    as a JSON-friendly dict where histograms are summarised by their count,
+    sum and estimated median and 99th percentile.
+    """
+    def __init__(self) -> None:
+        self.families: dict[str, Family] = {}
+        self.collectors: list = []
+        self.lock = threading.Lock()
+
+    def counter(self, name: str, description: str = "", **labels) -> Counter:
+        return self.get(Counter, name, description, labels)
+
+    def gauge(self, name: str, description: str = "", **labels) -> Gauge:
+        return self.get(Gauge, name, description, labels)
+
+    def histogram(self, name: str, description: str = "", **labels) -> Histogram:
+        return self.get(Histogram, name, description, labels)
+
+    def get(self, metric_class, name: str, description: str, labels: dict):
+        key = tuple(sorted(labels.items()))
+        family = self.families.get(name)
+        if family is not None:
+            metric = family.children.get(key)
+            if metric is not None:
+                return metric
+        with self.lock:
+            family = self.families.setdefault(name, Family(metric_class.kind, description))
+            if family.kind != metric_class.kind:
+                raise ValueError(f"Metric {name} is a {family.kind}, not a {metric_class.kind}.")
+            family.description = family.description or description
+            return family.children.setdefault(key, metric_class())
+
+    def add_collector(self, collector) -> None:
+        self.collectors.append(collector)
+
+    def collect(self) -> list[tuple[str, Family, list]]:
+        for collector in self.collectors:
+            collector()
+        with self.lock:
+            return [(name, family, list(family.children.items())) for name, family in sorted(self.families.items())]
+
+    def render(self) -> str:
+        lines = []
+        for name, family, children in self.collect():
+            lines.append(f"# HELP {name} {family.description}")
+            lines.append(f"# TYPE {name} {family.kind}")
+            for key, metric in children:
+                if family.kind != "histogram":
+                    lines.append(f"{name}{format_labels(key)} {metric.value}")
+                    continue
+                counts = metric.value
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f"{name}_bucket{format_labels(key + (('le', le),))} {cumulative}")
+                lines.append(f"{name}_sum{format_labels(key)} {counts[-1]}")
+                lines.append(f"{name}_count{format_labels(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Returns every metric by name, keyed by its labels when the name has several."""
+        result = {}
+        for name, family, children in self.collect():
+            values = {}
+            for key, metric in children:
+                value = metric.value
+                if family.kind == "histogram":
+                    value = {
+                        "count": sum(value[:-1]),
+                        "sum": value[-1],
+                        "p50": metric.quantile(value, 0.5),
+                        "p99": metric.quantile(value, 0.99),
+                    }
+                values[",".join(f"{label}={label_value}" for label, label_value in key)] = value
+            result[name] = values[""] if list(values) == [""] else values
+        return result
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(key: tuple) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{label}="{escape_label(value)}"' for label, value in key) + "}"
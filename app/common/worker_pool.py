@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+from app.common.constants import WORKER_THREADS, WORKER_QUEUE_SIZE, WORKER_MAX_WAIT
+
+
+class WorkerPool:
+    """Fixed set of threads serving connections from a bounded queue.
+
+    `submit` never blocks: when `queue_size` connections are already waiting
+    for a thread, the new one is handed to `reject` right away, on the
+    calling thread. A connection that waited longer than `max_wait` seconds
+    by the time a thread picks it up is rejected as well, since its client
+    has likely given up. At most `workers + queue_size` connections are held
+    at any time.
+
+    Attributes:
+        workers (int): Number of threads.
+        queue_size (int): Maximum number of connections waiting for a thread.
+        busy (int): Number of threads currently running a job.
+        started (int): Number of jobs run so far.
+        rejected (int): Number of jobs rejected so far.
+        total_wait (float): Seconds spent in the queue by the jobs run so far.
+        max_wait_seen (float): Longest time a job spent in the queue.
+    """
+    def __init__(self, function, reject, workers: int = WORKER_THREADS, queue_size: int = WORKER_QUEUE_SIZE,
+                 max_wait: float = WORKER_MAX_WAIT, log_manager=None) -> None:
+        # queue.Queue treats a size of 0 as unbounded, which would disable admission control.
+        if workers < 1 or queue_size < 1:
+            raise ValueError("A worker pool needs at least one thread and room for one waiting connection.")
+        self.function = function
+        self.reject = reject
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.log_manager = log_manager
+        self.queue: queue.Queue = queue.Queue(queue_size)
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.started = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        for index in range(workers):
+            threading.Thread(target=self.worker, name=f"worker-{index}", daemon=True).start()
+
+    @property
+    def max_connections(self) -> int:
+        return self.workers + self.queue_size
+
+    def pending(self) -> int:
+        return self.queue.qsize()
+
+    def saturated(self) -> bool:
+        """Whether connections are waiting while every thread is busy."""
+        return self.busy >= self.workers and self.queue.qsize() > 0
+
+    def submit(self, *args) -> bool:
+        """Queues `function(*args)`; returns False if it was rejected instead."""
+        try:
+            self.queue.put_nowait((time.monotonic(), args))
+            return True
+        except queue.Full:
+            self.run_reject(args)
+            return False
+
+    def run_reject(self, args: tuple) -> None:
+        with self.lock:
+            self.rejected += 1
+        self.call(self.reject, args)
+
+    def worker(self) -> None:
+        while True:
+            enqueued_at, args = self.queue.get()
+            wait = time.monotonic() - enqueued_at
+            if wait > self.max_wait:
+                self.run_reject(args)
+                continue
+            with self.lock:
+                self.busy += 1
+                self.started += 1
+                self.total_wait += wait
+                self.max_wait_seen = max(self.max_wait_seen, wait)
+            try:
+                self.call(self.function, args)
+            finally:
+                with self.lock:
+                    self.busy -= 1
+
+    def drain(self, timeout: float) -> bool:
+        """Waits up to `timeout` seconds for every queued and running job to finish."""
+        deadline = time.monotonic() + timeout
+        while self.busy or self.queue.qsize():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.05)
+        return True
+
+    def call(self, function, args: tuple) -> None:
+        try:
+            function(*args)
+        except Exception as e:
+            if self.log_manager is not None:
+                self.log_manager.add_error("Exception occurred: %s", e)
+
+    def export_metrics(self, metrics) -> None:
+        """Mirrors `stats` into `worker_pool_<stat>` gauges of an `app.common.metrics.Metrics`."""
+        def collect() -> None:
+            for name, value in self.stats().items():
+                metrics.gauge(f"worker_pool_{name}", f"Worker pool {name.replace('_', ' ')}.").set(value)
+        metrics.add_collector(collect)
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue_size,
+                "started": self.started,
+                "rejected": self.rejected,
+                "wait_avg": self.total_wait / self.started if self.started else 0.0,
+                "wait_max": self.max_wait_seen,
+            }
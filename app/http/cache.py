@@ -0,0 +1,208 @@
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from email.utils import formatdate
+from app.common.constants import HTTP_CACHE_SIZE, HTTP_CACHE_MAX_FILE_SIZE, HTTP_CACHE_REVALIDATE_INTERVAL, \
+    HTTP_COMPRESSION_LEVEL, HTTP_COMPRESSION_MAX_SIZE
+
+# zlib window bits producing each supported Content-Encoding.
+ENCODINGS = {"gzip": 31, "deflate": 15}
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml", "image/svg+xml")
+
+
+def is_compressible(content_type: str) -> bool:
+    return content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+class CacheEntry:
+    """Static file along with its prebuilt response headers.
+
+    Attributes:
+        path (str): Path of the file on disk.
+        body (bytes | None): Content of the file, or None if it is too large to
+            be held in memory and must be streamed from disk.
+        content_type (str): Value of the Content-Type header.
+        headers (bytes): Content-Type and Content-Length header lines, CRLF terminated.
+        etag (str): Strong entity tag derived from the modification time and size.
+        last_modified (str): Modification time as an HTTP date.
+        validators (bytes): ETag, Last-Modified, Accept-Ranges and, for
+            compressible types, Vary header lines.
+        compressible (bool): Whether the content type is worth compressing.
+        variants (dict[str, Variant | None]): Compressed representations built
+            so far, by encoding; None if compressing did not pay off.
+        mtime_ns (int): Modification time of the file when it was read.
+        size (int): Size of the body, or of the file when it is streamed.
+        checked (float): Monotonic time of the last check against the file on disk.
+    """
+    def __init__(self, path: str, content_type: str, body: bytes | None, stat: os.stat_result) -> None:
+        self.path = path
+        self.body = body
+        self.mtime_ns = stat.st_mtime_ns
+        self.size = stat.st_size if body is None else len(body)
+        self.content_type = content_type
+        self.headers = f"Content-Type: {content_type}\r\nContent-Length: {self.size}\r\n".encode("utf-8")
+        self.etag = f'"{self.mtime_ns:x}-{self.size:x}"'
+        self.last_modified = formatdate(self.mtime_ns / 1e9, usegmt=True)
+        self.compressible = is_compressible(content_type)
+        vary = "Vary: Accept-Encoding\r\n" if self.compressible else ""
+        self.validators = f"ETag: {self.etag}\r\nLast-Modified: {self.last_modified}\r\nAccept-Ranges: bytes\r\n{vary}".encode("utf-8")
+        self.variants: dict[str, Variant | None] = {}
+        self.checked = time.monotonic()
+
+    def is_current(self, stat: os.stat_result) -> bool:
+        return stat.st_mtime_ns == self.mtime_ns and stat.st_size == self.size
+
+    def matches(self, etag: str) -> bool:
+        """Whether `etag` is the entity tag of this file or of one of its encodings."""
+        return etag == self.etag or etag in [Variant.etag_for(self, encoding) for encoding in ENCODINGS]
+
+    @property
+    def cost(self) -> int:
+        """Bytes the entry is charged against the cache budget."""
+        cost = len(self.headers) + len(self.validators) + (len(self.body) if self.body is not None else 0)
+        return cost + sum(len(variant.body) for variant in self.variants.values() if variant is not None)
+
+
+class Variant:
+    """Compressed representation of a `CacheEntry`.
+
+    Attributes:
+        body (bytes): Compressed content.
+        etag (str): Entity tag of the representation, distinct from the identity one.
+        validators (bytes): ETag, Last-Modified and Vary header lines.
+        headers (bytes): Content-Type, Content-Length and Content-Encoding header
+            lines followed by the validators.
+    """
+    def __init__(self, entry: CacheEntry, encoding: str, body: bytes) -> None:
+        self.body = body
+        self.etag = self.etag_for(entry, encoding)
+        self.validators = self.validators_for(entry, encoding)
+        self.headers = f"Content-Type: {entry.content_type}\r\nContent-Length: {len(body)}\r\nContent-Encoding: {encoding}\r\n".encode("utf-8") + self.validators
+
+    @staticmethod
+    def etag_for(entry: CacheEntry, encoding: str) -> str:
+        return f'{entry.etag[:-1]}-{encoding}"'
+
+    @staticmethod
+    def validators_for(entry: CacheEntry, encoding: str) -> bytes:
+        """Validators of the `encoding` representation of `entry`, known before it is compressed."""
+        return f"ETag: {Variant.etag_for(entry, encoding)}\r\nLast-Modified: {entry.last_modified}\r\nVary: Accept-Encoding\r\n".encode("utf-8")
+
+
+class ResponseCache:
+    """LRU cache of static files, bounded by the total size of the cached bodies.
+
+    A hit does not touch the filesystem unless the entry was last checked more
+    than `revalidate_interval` seconds ago, in which case the file is stat'ed
+    and reloaded if its mtime or size changed. Files larger than
+    `max_file_size` are never read into memory: their entry is cached without
+    a body, which keeps its validators and headers.
+
+    Compressed variants are built on first request and kept on the entry,
+    so a file is compressed once per encoding for as long as it stays
+    cached. A `<file>.gz` next to a file, at least as recent as the file, is
+    used as its gzip variant instead of compressing it.
+    """
+    def __init__(self, max_bytes: int = HTTP_CACHE_SIZE, max_file_size: int = HTTP_CACHE_MAX_FILE_SIZE,
+                 revalidate_interval: float = HTTP_CACHE_REVALIDATE_INTERVAL,
+                 compression_level: int = HTTP_COMPRESSION_LEVEL) -> None:
+        self.max_bytes = max_bytes
+        self.max_file_size = min(max_file_size, max_bytes)
+        self.revalidate_interval = revalidate_interval
+        self.compression_level = compression_level
+        self.entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+
+    def get(self, path: str, content_type: str) -> CacheEntry:
+        """Returns the entry for `path`, reading the file on a miss.
+
+        Raises:
+            OSError: If the file cannot be read.
+        """
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is not None:
+                self.entries.move_to_end(path)
+        if entry is not None:
+            if time.monotonic() - entry.checked < self.revalidate_interval:
+                return entry
+            stat = os.stat(path)
+            if entry.is_current(stat):
+                entry.checked = time.monotonic()
+                return entry
+        return self.load(path, content_type)
+
+    def load(self, path: str, content_type: str) -> CacheEntry:
+        with open(path, "rb") as file:
+            stat = os.fstat(file.fileno())
+            body = file.read() if stat.st_size <= self.max_file_size else None
+        entry = CacheEntry(path, content_type, body, stat)
+        self.put(entry)
+        return entry
+
+    def put(self, entry: CacheEntry) -> None:
+        with self.lock:
+            previous = self.entries.pop(entry.path, None)
+            if previous is not None:
+                self.total_bytes -= previous.cost
+            self.entries[entry.path] = entry
+            self.total_bytes += entry.cost
+            self.evict()
+
+    def evict(self) -> None:
+        while self.total_bytes > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.cost
+
+    def variant(self, entry: CacheEntry, encoding: str) -> Variant | None:
+        """Returns `entry` compressed with `encoding`, or None if it is not worth compressing."""
+        if encoding in entry.variants:
+            return entry.variants[encoding]
+        variant = self.compress(entry, encoding)
+        with self.lock:
+            if encoding not in entry.variants:
+                entry.variants[encoding] = variant
+                if variant is not None and self.entries.get(entry.path) is entry:
+                    self.total_bytes += len(variant.body)
+                    self.evict()
+        return entry.variants[encoding]
+
+    def compress(self, entry: CacheEntry, encoding: str) -> Variant | None:
+        if not entry.compressible or entry.size > HTTP_COMPRESSION_MAX_SIZE:
+            return None
+        if encoding == "gzip":
+            try:
+                with open(f"{entry.path}.gz", "rb") as file:
+                    stat = os.fstat(file.fileno())
+                    if stat.st_mtime_ns >= entry.mtime_ns and stat.st_size <= self.max_file_size:
+                        return Variant(entry, encoding, file.read())
+            except OSError:
+                pass
+        compressor = zlib.compressobj(self.compression_level, zlib.DEFLATED, ENCODINGS[encoding])
+        if entry.body is not None:
+            body = compressor.compress(entry.body) + compressor.flush()
+        else:
+            chunks = []
+            with open(entry.path, "rb") as file:
+                if not entry.is_current(os.fstat(file.fileno())):
+                    return None
+                while chunk := file.read(256 * 1024):
+                    chunks.append(compressor.compress(chunk))
+            body = b"".join(chunks) + compressor.flush()
+        # Compressed bodies are held in memory, so they must fit the same limit.
+        if len(body) >= entry.size or len(body) > self.max_file_size:
+            return None
+        return Variant(entry, encoding, body)
+
+    def warm(self, directory: str, content_type_for) -> int:
+        """Loads every file under `directory`; returns the number of files read."""
+        count = 0
+        for root, _, files in os.walk(directory):
+            for name in files:
+                path = os.path.join(root, name)
+                self.load(path, content_type_for(path))
+                count += 1
+        return count
@@ -1,7 +1,68 @@
+import argparse
+import signal
+import sys
+from app.common.constants import SERVER_PORT, HTTP_IDLE_TIMEOUT, HTTP_MAX_REQUESTS, WORKER_THREADS, WORKER_QUEUE_SIZE
+from app.common.log_manager import LEVELS
+from app.http.prefork import Supervisor
 from app.http.server import Server
 
-def main():
-    server = Server()
+def worker_args(argv: list[str]) -> list[str]:
+    """Returns `argv` without the --workers option, to start the worker processes with."""
+    args = []
+    skip = False
+    for arg in argv:
+        if skip:
+            skip = False
+        elif arg == "--workers":
+            skip = True
+        elif not arg.startswith("--workers="):
+            args.append(arg)
+    return args
+
+def stop_worker(signum, frame):
+    # Raised in the main thread, this interrupts accept() and lets
+    # Server.main stop accepting and drain its connections.
+    sys.exit(0)
+
+def main(argv: list[str] | None = None):
+    argv = sys.argv[1:] if argv is None else argv
+    parser = argparse.ArgumentParser(description="Static file HTTP server.", allow_abbrev=False)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="number of server processes sharing the port through SO_REUSEPORT")
+    parser.add_argument("--worker-index", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS,
+                        help="connections served at once by each process")
+    parser.add_argument("--queue-size", type=int, default=WORKER_QUEUE_SIZE,
+                        help="connections waiting for a thread before new ones get a 503")
+    parser.add_argument("--idle-timeout", type=float, default=HTTP_IDLE_TIMEOUT,
+                        help="seconds an idle keep-alive connection is kept open")
+    parser.add_argument("--max-requests", type=int, default=HTTP_MAX_REQUESTS,
+                        help="requests served per connection before it is closed")
+    parser.add_argument("--warm-cache", action="store_true",
+                        help="load assets/, public/ and error/ into the response cache at startup")
+    parser.add_argument("--no-compression", action="store_true",
+                        help="never gzip or deflate responses")
+    parser.add_argument("--quiet", action="store_true", help="do not echo log records to the console")
+    parser.add_argument("--log-level", choices=LEVELS.keys(), default="INFO")
+    parser.add_argument("--log-json", action="store_true", help="write the log file as JSON lines")
+    args = parser.parse_args(argv)
+    if args.threads < 1 or args.queue_size < 1:
+        parser.error("--threads and --queue-size must be at least 1")
+    log_options = {
+        "echo": not args.quiet,
+        "level": LEVELS[args.log_level],
+        "json_format": args.log_json,
+    }
+    if args.workers > 1:
+        Supervisor(args.workers, worker_args(argv), log_options).run()
+        return
+    reuse_port = args.worker_index is not None
+    if reuse_port:
+        log_options["file_name"] = f"worker-{args.worker_index}.log"
+        signal.signal(signal.SIGTERM, stop_worker)
+    server = Server(args.port, log_options, args.idle_timeout, args.max_requests, args.warm_cache, not args.no_compression, reuse_port,
+                    args.threads, args.queue_size)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
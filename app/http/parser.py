@@ -0,0 +1,141 @@
+from typing import Iterator, NamedTuple
+from app.common.constants import HTTP_MAX_HEADER_SIZE
+
+MAX_BODY_SIZE = 1024 * 1024
+MAX_RANGES = 16
+
+
+class HttpRequest(NamedTuple):
+    method: str
+    target: str
+    version: str
+    headers: dict[str, str]
+    body: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        """Whether the client allows the connection to be reused after this request."""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.0":
+            return "keep-alive" in connection
+        return "close" not in connection
+
+
+class RequestParser:
+    """Incremental HTTP/1.1 request parser.
+
+    Bytes read from a connection are fed into a single buffer and complete
+    requests are sliced out of it, so a request split over several reads is
+    only parsed once its head is complete, and several pipelined requests
+    arriving in one read are returned one after the other. Consumed bytes are
+    discarded the same way `FrameDecoder` does.
+    """
+    def __init__(self, max_header_size: int = HTTP_MAX_HEADER_SIZE, max_body_size: int = MAX_BODY_SIZE) -> None:
+        self.buffer = bytearray()
+        self.offset = 0
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+
+    def feed(self, data: bytes) -> None:
+        if self.offset and self.offset * 2 >= len(self.buffer):
+            del self.buffer[:self.offset]
+            self.offset = 0
+        self.buffer += data
+
+    def next_request(self) -> HttpRequest | None:
+        """Returns the next complete request, or None until more bytes are fed.
+
+        Raises:
+            ValueError: If the request is malformed or its head is too large.
+        """
+        # Empty lines before a request line are allowed (RFC 9112, 2.2).
+        while self.buffer.startswith(b"\r\n", self.offset):
+            self.offset += 2
+        end = self.buffer.find(b"\r\n\r\n", self.offset)
+        if end == -1:
+            if len(self.buffer) - self.offset > self.max_header_size:
+                raise ValueError("Request head too large.")
+            return None
+        if end - self.offset > self.max_header_size:
+            raise ValueError("Request head too large.")
+        lines = self.buffer[self.offset:end].decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ")
+        if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+            raise ValueError(f"Malformed request line: {lines[0]!r}")
+        headers = {}
+        for line in lines[1:]:
+            name, separator, value = line.partition(":")
+            if not separator or not name or name != name.strip():
+                raise ValueError(f"Malformed header line: {line!r}")
+            headers[name.lower()] = value.strip()
+        if "transfer-encoding" in headers:
+            raise ValueError("Chunked request bodies are not supported.")
+        length = headers.get("content-length", "0")
+        if not length.isdigit() or int(length) > self.max_body_size:
+            raise ValueError(f"Invalid Content-Length: {length!r}")
+        body_start = end + 4
+        body_end = body_start + int(length)
+        if len(self.buffer) < body_end:
+            return None
+        self.offset = body_end
+        return HttpRequest(parts[0], parts[1], parts[2], headers, bytes(self.buffer[body_start:body_end]))
+
+    def requests(self) -> Iterator[HttpRequest]:
+        while (request := self.next_request()) is not None:
+            yield request
+
+
+def parse_range(value: str, size: int) -> list[tuple[int, int]] | None:
+    """Parses a `Range: bytes=...` header against a representation of `size` bytes.
+
+    Returns the satisfiable ranges as inclusive (start, end) pairs, which is an
+    empty list if none of them is satisfiable, or None if the header is not a
+    valid byte range set and must be ignored (RFC 9110, 14.2).
+    """
+    unit, separator, ranges = value.partition("=")
+    if not separator or unit.strip().lower() != "bytes":
+        return None
+    specs = ranges.split(",")
+    if len(specs) > MAX_RANGES:
+        return None
+    satisfiable = []
+    for spec in specs:
+        first, separator, last = spec.strip().partition("-")
+        if not separator or not (first or last) or not (first or "0").isdigit() or not (last or "0").isdigit():
+            return None
+        if not first:
+            if int(last) > 0 and size > 0:
+                satisfiable.append((max(0, size - int(last)), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            satisfiable.append((start, min(int(last), size - 1) if last else size - 1))
+    return satisfiable
+
+
+def negotiate_encoding(value: str, available: tuple[str, ...]) -> str | None:
+    """Picks the content coding of `available` preferred by an Accept-Encoding header.
+
+    Codings are weighed by their q-value, ties going to the earliest one in
+    `available`. Returns None if the identity coding should be used.
+    """
+    weights = {}
+    for item in value.split(","):
+        coding, _, parameters = item.partition(";")
+        weight = 1.0
+        for parameter in parameters.split(";"):
+            name, _, number = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(number)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.strip().lower()] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
@@ -0,0 +1,75 @@
+import signal
+import subprocess
+import sys
+import time
+from app.common.constants import HTTP_SHUTDOWN_TIMEOUT, HTTP_WORKER_RESTART_DELAY
+from app.common.file_manager import FileManager
+from app.common.log_manager import LogManager
+
+
+class Supervisor:
+    """Runs several HTTP server worker processes on the same port.
+
+    Each worker is a separate interpreter running `app.http.main` with
+    `--worker-index`, so it binds its own `SO_REUSEPORT` socket and the
+    kernel spreads incoming connections across the workers, sidestepping the
+    GIL. A worker that exits is restarted, after `HTTP_WORKER_RESTART_DELAY`
+    if it did not stay up that long. On SIGTERM or SIGINT the workers are
+    asked to stop with SIGTERM and killed if they are still draining
+    connections after `shutdown_timeout` seconds.
+
+    Attributes:
+        workers (int): Number of worker processes.
+        worker_args (list[str]): Command line arguments given to every worker.
+    """
+    def __init__(self, workers: int, worker_args: list[str], log_options: dict | None = None,
+                 shutdown_timeout: float = HTTP_SHUTDOWN_TIMEOUT) -> None:
+        self.workers = workers
+        self.worker_args = worker_args
+        self.shutdown_timeout = shutdown_timeout
+        self.file_manager = FileManager("http")
+        self.log_manager = LogManager(self.file_manager, **(log_options or {}))
+        self.processes: list[subprocess.Popen | None] = [None] * workers
+        self.started_at: list[float] = [0.0] * workers
+        self.stopping = False
+
+    def start_worker(self, index: int) -> None:
+        self.processes[index] = subprocess.Popen(
+            [sys.executable, "-m", "app.http.main", *self.worker_args, "--worker-index", str(index)]
+        )
+        self.started_at[index] = time.monotonic()
+        self.log_manager.add_log("Worker %s started with pid %s.", index, self.processes[index].pid)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        for index in range(self.workers):
+            self.start_worker(index)
+        while not self.stopping:
+            for index, process in enumerate(self.processes):
+                if process.poll() is None or self.stopping:
+                    continue
+                self.log_manager.add_warn("Worker %s (pid %s) exited with status %s.", index, process.pid, process.returncode)
+                if time.monotonic() - self.started_at[index] < HTTP_WORKER_RESTART_DELAY:
+                    time.sleep(HTTP_WORKER_RESTART_DELAY)
+                self.start_worker(index)
+            time.sleep(0.2)
+        self.stop()
+
+    def request_stop(self, signum, frame) -> None:
+        self.stopping = True
+
+    def stop(self) -> None:
+        self.log_manager.add_log("Stopping %s workers...", self.workers)
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(signal.SIGTERM)
+        deadline = time.monotonic() + self.shutdown_timeout
+        for index, process in enumerate(self.processes):
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                self.log_manager.add_warn("Worker %s (pid %s) did not stop in time; killing it.", index, process.pid)
+                process.kill()
+                process.wait()
+        self.log_manager.add_log("All workers stopped.")
@@ -0,0 +1,93 @@
+import os
+import threading
+import time
+from typing import NamedTuple
+from urllib.parse import unquote
+from app.common.constants import HTTP_CACHE_REVALIDATE_INTERVAL
+
+MIME_TYPES = {
+    ".html": "text/html; charset=UTF-8",
+    ".css": "text/css; charset=UTF-8",
+    ".js": "application/javascript; charset=UTF-8",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".svg": "image/svg+xml",
+    ".ico": "image/x-icon",
+    ".json": "application/json; charset=UTF-8",
+    ".xml": "application/xml; charset=UTF-8",
+    ".txt": "text/plain; charset=UTF-8",
+}
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+
+def content_type_for(path: str) -> str:
+    return MIME_TYPES.get(os.path.splitext(path)[1].lower(), DEFAULT_MIME_TYPE)
+
+
+class Route(NamedTuple):
+    file_path: str
+    content_type: str
+    allow_ranges: bool
+    # Canonical URL path, shared by every URL serving the same file.
+    path: str
+
+
+class RouteIndex:
+    """Index of the URL paths the HTTP server may serve.
+
+    Built by walking the static directories once, so dispatching a request is
+    a single dict lookup and nothing outside the indexed files can ever be
+    reached, whatever `..` segments or encodings the request path contains.
+    A lookup that misses rescans the directories, at most once every
+    `rescan_interval` seconds, to pick up files added since the last scan;
+    removed files are reported by the response cache when opened. A `<file>.gz`
+    next to `<file>` is only served as its gzip encoding, never under its own path.
+
+    Attributes:
+        base_directory (str): Directory the static directories live in.
+        directories (tuple[str, ...]): Directories, relative to `base_directory`,
+            whose files are served under `/<directory>/`.
+        routes (dict[str, Route]): Routes by URL path.
+    """
+    def __init__(self, base_directory: str, directories: tuple[str, ...] = ("assets", "public"),
+                 rescan_interval: float = HTTP_CACHE_REVALIDATE_INTERVAL) -> None:
+        self.base_directory = base_directory
+        self.directories = directories
+        self.rescan_interval = rescan_interval
+        self.routes: dict[str, Route] = {}
+        self.scanned = 0.0
+        self.lock = threading.Lock()
+        self.scan()
+
+    def scan(self) -> None:
+        index = Route(f"{self.base_directory}/index.html", "text/html; charset=UTF-8", False, "/index.html")
+        routes = {"/": index, "/index.html": index}
+        for directory in self.directories:
+            for root, _, files in os.walk(f"{self.base_directory}/{directory}"):
+                for name in files:
+                    # `<file>.gz` is the precompressed gzip variant of `<file>`
+                    # (see `ResponseCache`), not a resource of its own.
+                    if name.endswith(".gz") and name[:-3] in files:
+                        continue
+                    file_path = os.path.join(root, name)
+                    url_path = "/" + os.path.relpath(file_path, self.base_directory).replace(os.sep, "/")
+                    routes[url_path] = Route(file_path, content_type_for(name), True, url_path)
+        # Swapping the whole dict keeps concurrent lookups consistent.
+        self.routes = routes
+        self.scanned = time.monotonic()
+
+    def lookup(self, target: str) -> Route | None:
+        path = unquote(target.partition("?")[0].partition("#")[0])
+        route = self.routes.get(path)
+        if route is None and time.monotonic() - self.scanned >= self.rescan_interval:
+            with self.lock:
+                if time.monotonic() - self.scanned >= self.rescan_interval:
+                    self.scan()
+            route = self.routes.get(path)
+        return route
+
+    def is_static_path(self, target: str) -> bool:
+        """Whether `target` lies under one of the static directories."""
+        return target.startswith(tuple(f"/{directory}/" for directory in self.directories))
@@ -2,35 +2,105 @@ import threading
 import socket
 import hashlib
 import os
+import secrets
+import time
+from email.utils import parsedate_to_datetime
 from wsgiref import headers
-from app.common.constants import CHUNK_SIZE, SERVER_IP, SERVER_PORT, CRLF
+from app.common.constants import CHUNK_SIZE, SERVER_IP, SERVER_PORT, CRLF, HTTP_IDLE_TIMEOUT, HTTP_MAX_REQUESTS, \
+    HTTP_SHUTDOWN_TIMEOUT, WORKER_THREADS, WORKER_QUEUE_SIZE
 from app.common.file_manager import FileManager
 from app.common.log_manager import LogManager
+from app.common.metrics import Counter, Histogram, Metrics
+from app.common.worker_pool import WorkerPool
+from app.http.cache import ENCODINGS, CacheEntry, ResponseCache, Variant
+from app.http.parser import HttpRequest, RequestParser, negotiate_encoding, parse_range
+from app.http.routes import Route, RouteIndex, content_type_for
+
+CONNECTION_KEEP_ALIVE = b"Connection: keep-alive\r\n\r\n"
+CONNECTION_CLOSE = b"Connection: close\r\n\r\n"
+SERVICE_UNAVAILABLE = (
+    b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: text/plain; charset=UTF-8\r\n"
+    b"Content-Length: 20\r\nRetry-After: 1\r\nConnection: close\r\n\r\nServer is too busy.\n"
+)
+# Separates the parts of multipart/byteranges responses.
+BYTERANGES_BOUNDARY = secrets.token_hex(16)
+METRICS_PATH = "/metrics"
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=UTF-8"
+# Route label of the requests that did not match a route.
+UNMATCHED_ROUTE = "unmatched"
 
 class Server:
-    def __init__(self):
+    """Static file HTTP/1.1 server.
+
+    Connections are persistent: requests are parsed incrementally from a
+    per-connection buffer, pipelined requests are answered in order, and a
+    connection is closed after `idle_timeout` seconds without a request, after
+    `max_requests` requests, or when the client asks for it.
+
+    Static files, error pages included, are served from a `ResponseCache`;
+    with `warm_cache` the cache is filled at startup so the first requests do
+    not hit the disk either. Files above `HTTP_CACHE_MAX_FILE_SIZE` bypass the
+    cache and are streamed with sendfile. With `compression`, text files are
+    sent gzip or deflate encoded to clients that accept it.
+
+    Connections are served by a `WorkerPool` of `threads` threads. When all
+    of them are busy and `queue_size` connections are already waiting, new
+    connections get an immediate 503. While every thread is busy and
+    connections are waiting, keep-alive connections are closed after their
+    current response so waiting ones get a thread.
+
+    Connection, traffic, status and per-route latency metrics are served at
+    `/metrics` in the Prometheus text format. In pre-forked mode every worker
+    process keeps its own metrics.
+    """
+    def __init__(self, port: int = SERVER_PORT, log_options: dict | None = None,
+                 idle_timeout: float = HTTP_IDLE_TIMEOUT, max_requests: int = HTTP_MAX_REQUESTS,
+                 warm_cache: bool = False, compression: bool = True, reuse_port: bool = False,
+                 threads: int = WORKER_THREADS, queue_size: int = WORKER_QUEUE_SIZE):
+        self.port: int = port
+        self.threads: int = threads
+        self.queue_size: int = queue_size
+        self.pool: WorkerPool | None = None
+        self.reuse_port: bool = reuse_port
+        self.stopping: bool = False
+        self.compression: bool = compression
+        self.idle_timeout: float = idle_timeout
+        self.max_requests: int = max_requests
         self.file_manager: FileManager | None = FileManager("http")
-        self.log_manager: LogManager | None = LogManager(self.file_manager)
+        self.log_manager: LogManager | None = LogManager(self.file_manager, **(log_options or {}))
         self.lock: threading.Lock | None = threading.Lock()
         self.log_manager.add_log("Starting server...")
+        self.metrics = Metrics()
+        self.connections_active = self.metrics.gauge("http_connections_active", "Connections being served.")
+        self.bytes_received = self.metrics.counter("http_bytes_received_total", "Bytes read from clients.")
+        self.bytes_sent = self.metrics.counter("http_bytes_sent_total", "Bytes sent to clients.")
+        # Labelled metrics of the per-request path, by label value.
+        self.route_latency: dict[str, Histogram] = {}
+        self.responses: dict[str, Counter] = {}
+        self.metrics.add_collector(self.collect_cache_metrics)
+        self.routes = RouteIndex(self.file_manager.base_directory)
+        self.cache = ResponseCache()
+        if warm_cache:
+            self.warm_cache()
         self.socket: socket.socket | None = self.create_socket()
-        self.client_threads = []
-        self.client_sockets = {}
         self.main()
 
     def create_socket(self) -> socket.socket | None:
-        server_port = SERVER_PORT
+        server_port = self.port
         while True:
             try:
-                self.log_manager.add_log(f"Binding socket to {SERVER_IP}:{server_port}...")
+                self.log_manager.add_log("Binding socket to %s:%s...", SERVER_IP, server_port)
                 _socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                if self.reuse_port:
+                    _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
                 _socket.bind((SERVER_IP, server_port))
-                self.log_manager.add_log(f"Socket bound.")
+                self.log_manager.add_log("Socket bound.")
                 return _socket
             except OSError:
                 _input = ""
                 while _input not in ["y", "n"]:
-                    self.log_manager.add_warn(f"Port {server_port} is already in use. Try another port?")
+                    self.log_manager.add_warn("Port %s is already in use. Try another port?", server_port)
                     _input = input("(y/n): ")
                     if _input == "y":
                         server_port += 1
@@ -41,166 +111,301 @@ class Server:
                 continue
     
     def client_thread_handler(self, client_socket: socket.socket, client_address) -> None:
-        while True:
-            try:
+        parser = RequestParser()
+        served = 0
+        client_socket.settimeout(self.idle_timeout)
+        # Responses to pipelined requests are written back to back; without
+        # TCP_NODELAY every second one waits for the client's delayed ACK.
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_active.inc()
+        try:
+            while served < self.max_requests:
                 data = client_socket.recv(CHUNK_SIZE)
                 if not data:
                     break
-                request = data.decode("utf-8").split("\r\n")[0]
-                method = request.split(" ")[0]
-                if method not in ["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS", "TRACE", "CONNECT"]:
-                    self.send_400_response(client_socket, client_address)
-                    break
-                if (method != "GET"):
-                    self.send_405_response(client_socket, client_address)
-                    break
-                self.log_manager.add_log(f"{client_address[0]}:{client_address[1]} - {request}")
-                self.handle_GET_request(data.decode("utf-8").split("\r\n")[0].split(" ")[1], client_socket, client_address)
-            except Exception as e:
-                self.log_manager.add_error(f"Exception occurred: {e}")
-                pass
-
-    def handle_GET_request(self, data: str, client_socket: socket.socket, client_address) -> None:
-        if data.strip() == "/" or data.strip() == "/index.html":
-            self.send_index_html(client_socket, client_address)
-        elif not data.strip().startswith("/assets") and not data.strip().startswith("/public"):
-            self.send_403_response(client_socket, client_address)
-        else:
-            file_path = f"{self.file_manager.base_directory}{data}"
-            if not os.path.exists(file_path):
-                self.send_404_response(client_socket, client_address)
-            else:
-                self.send_file(file_path, client_socket, client_address)
+                self.bytes_received.inc(len(data))
+                parser.feed(data)
+                try:
+                    for request in parser.requests():
+                        served += 1
+                        keep_alive = request.keep_alive and served < self.max_requests and not self.stopping \
+                            and not self.pool.saturated()
+                        start = time.perf_counter()
+                        route = self.handle_request(request, client_socket, client_address, keep_alive)
+                        self.observe_latency(route, time.perf_counter() - start)
+                        if not keep_alive:
+                            return
+                except ValueError as e:
+                    self.log_manager.add_warn("%s:%s - %s", client_address[0], client_address[1], e)
+                    self.send_400_response(client_socket, client_address, False)
+                    return
+        except socket.timeout:
+            pass
+        except Exception as e:
+            self.log_manager.add_error("Exception occurred: %s", e)
+        finally:
+            self.connections_active.dec()
+            client_socket.close()
 
-    def send_index_html(self, client_socket: socket.socket, client_address) -> None:
+    def reject_connection(self, client_socket: socket.socket, client_address) -> None:
+        self.count_response("503")
+        stats = self.pool.stats()
+        self.log_manager.add_warn("%s:%s - HTTP/1.1 503 Service Unavailable (%s busy, %s queued, %.3fs max wait)",
+                                  client_address[0], client_address[1], stats["busy"], stats["queued"], stats["wait_max"])
         try:
-            with open(f"{self.file_manager.base_directory}/index.html", "rb") as file:
-                content = file.read()
-                length = len(content)
-                status_line = "HTTP/1.1 200 OK\r\n".encode("utf-8")
-                headers = f"Content-Type: text/html; charset=UTF-8\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-                response = status_line + headers + content
-                client_socket.send(response)
-                self.log_manager.add_log(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
-        except Exception as e:
-            self.send_500_response(client_socket, client_address)
-    
-    def send_file(self, file_path: str, client_socket: socket.socket, client_address) -> None:
-        if file_path.endswith(".html"):
-            content_type = "text/html; charset=UTF-8"
-        elif file_path.endswith(".css"):
-            content_type = "text/css; charset=UTF-8"
-        elif file_path.endswith(".js"):
-            content_type = "application/javascript; charset=UTF-8"
-        elif file_path.endswith(".jpg") or file_path.endswith(".jpeg"):
-            content_type = "image/jpeg"
-        elif file_path.endswith(".png"):
-            content_type = "image/png"
-        elif file_path.endswith(".gif"):
-            content_type = "image/gif"
-        elif file_path.endswith(".svg"):
-            content_type = "image/svg+xml"
-        elif file_path.endswith(".ico"):
-            content_type = "image/x-icon"
-        elif file_path.endswith(".json"):
-            content_type = "application/json; charset=UTF-8"
-        elif file_path.endswith(".xml"):
-            content_type = "application/xml; charset=UTF-8"
-        elif file_path.endswith(".txt"):
-            content_type = "text/plain; charset=UTF-8"
+            client_socket.sendall(SERVICE_UNAVAILABLE)
+        except OSError:
+            pass
+        client_socket.close()
+
+    def handle_request(self, request: HttpRequest, client_socket: socket.socket, client_address, keep_alive: bool) -> str:
+        """Answers a request and returns the path of the route it matched, used to label its metrics."""
+        if request.method not in ["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS", "TRACE", "CONNECT"]:
+            self.send_400_response(client_socket, client_address, keep_alive)
+            return UNMATCHED_ROUTE
+        if (request.method != "GET"):
+            self.send_405_response(client_socket, client_address, keep_alive)
+            return UNMATCHED_ROUTE
+        self.log_manager.add_log("%s:%s - %s %s %s", client_address[0], client_address[1], request.method, request.target, request.version)
+        return self.handle_GET_request(request.target, client_socket, client_address, keep_alive, request.headers)
+
+    def handle_GET_request(self, data: str, client_socket: socket.socket, client_address, keep_alive: bool = True, headers: dict[str, str] | None = None) -> str:
+        if data.partition("?")[0] == METRICS_PATH:
+            self.send_response("200 OK", METRICS_CONTENT_TYPE, self.metrics.render().encode("utf-8"), client_socket, client_address, keep_alive)
+            return METRICS_PATH
+        route = self.routes.lookup(data)
+        if route is not None:
+            self.send_file(route, client_socket, client_address, keep_alive, headers)
+            return route.path
+        elif self.routes.is_static_path(data):
+            self.send_404_response(client_socket, client_address, keep_alive)
         else:
-            content_type = "application/octet-stream"
-        try:
-            with open(file_path, "rb") as file:
-                content = file.read()
-                length = len(content)
-                status_line = "HTTP/1.1 200 OK\r\n".encode("utf-8")
-                headers = f"Content-Type: {content_type}\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-                response = status_line + headers + content
-                client_socket.send(response)
-                self.log_manager.add_log(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
-        except Exception as e:
-            self.send_500_response(client_socket)
-    
-    def send_400_response(self, client_socket: socket.socket, client_address) -> None:
+            self.send_403_response(client_socket, client_address, keep_alive)
+        return UNMATCHED_ROUTE
+
+    def observe_latency(self, route: str, seconds: float) -> None:
+        histogram = self.route_latency.get(route)
+        if histogram is None:
+            histogram = self.route_latency[route] = self.metrics.histogram(
+                "http_request_duration_seconds", "Time to answer a request, by route.", route=route)
+        histogram.observe(seconds)
+
+    def count_response(self, status: str) -> None:
+        counter = self.responses.get(status)
+        if counter is None:
+            counter = self.responses[status] = self.metrics.counter(
+                "http_responses_total", "Responses by status code.", status=status[:3])
+        counter.inc()
+
+    def collect_cache_metrics(self) -> None:
+        self.metrics.gauge("http_cache_entries", "Files held by the response cache.").set(len(self.cache.entries))
+        self.metrics.gauge("http_cache_bytes", "Bytes charged against the response cache budget.").set(self.cache.total_bytes)
+
+    def warm_cache(self) -> None:
+        count = self.cache.warm(f"{self.file_manager.base_directory}/error", content_type_for)
+        for route in set(self.routes.routes.values()):
+            self.cache.get(route.file_path, route.content_type)
+            count += 1
+        if self.compression:
+            for entry in list(self.cache.entries.values()):
+                self.cache.variant(entry, "gzip")
+        self.log_manager.add_log("Response cache warmed with %s files (%s bytes).", count, self.cache.total_bytes)
+
+    def send_buffers(self, client_socket: socket.socket, buffers: list[bytes]) -> None:
+        """Writes `buffers` back to back with as few `sendmsg` calls as the socket allows."""
+        views = [memoryview(buffer) for buffer in buffers if buffer]
+        while views:
+            sent = client_socket.sendmsg(views)
+            self.bytes_sent.inc(sent)
+            while views and sent >= len(views[0]):
+                sent -= len(views.pop(0))
+            if sent:
+                views[0] = views[0][sent:]
+
+    def send_response(self, status: str, content_type: str, content: bytes, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        headers = f"Content-Type: {content_type}\r\nContent-Length: {len(content)}\r\n".encode("utf-8")
+        self.send_prebuilt_response(status, headers, content, client_socket, client_address, keep_alive)
+
+    def send_entry(self, status: str, entry: CacheEntry, client_socket: socket.socket, client_address, keep_alive: bool = True, extra_headers: bytes = b"") -> None:
+        if entry.body is not None:
+            self.send_prebuilt_response(status, entry.headers + extra_headers, entry.body, client_socket, client_address, keep_alive)
+            return
+        # Large files are streamed: the body goes from the page cache to the
+        # socket with sendfile (socket.sendfile falls back to chunked reads
+        # where it is unavailable), so memory per request does not grow with
+        # the file size.
+        with open(entry.path, "rb") as file:
+            self.send_prebuilt_response(status, entry.headers + extra_headers, b"", client_socket, client_address, keep_alive)
+            self.send_file_range(file, 0, entry.size, client_socket)
+
+    def send_file_range(self, file, offset: int, count: int, client_socket: socket.socket) -> None:
+        sent = client_socket.sendfile(file, offset, count)
+        self.bytes_sent.inc(sent)
+        if sent != count:
+            raise ConnectionError(f"{file.name} changed while being sent.")
+
+    def send_static(self, entry: CacheEntry, headers: dict[str, str], client_socket: socket.socket, client_address, keep_alive: bool = True, allow_ranges: bool = False) -> None:
+        """Answers a GET for a static file, honouring conditional and Range headers.
+
+        Validators are evaluated first, so a 304 never waits for the file to
+        be compressed.
+        """
+        encoding = None
+        # Ranges are only served from the identity representation.
+        if self.compression and entry.compressible and "range" not in headers:
+            encoding = negotiate_encoding(headers.get("accept-encoding", ""), tuple(ENCODINGS))
+        if self.is_not_modified(entry, headers):
+            validators = self.not_modified_validators(entry, encoding, headers)
+            self.send_prebuilt_response("304 Not Modified", validators, b"", client_socket, client_address, keep_alive)
+            return
+        variant = self.cache.variant(entry, encoding) if encoding is not None else None
+        if variant is not None:
+            self.send_prebuilt_response("200 OK", variant.headers, variant.body, client_socket, client_address, keep_alive)
+            return
+        if allow_ranges and "range" in headers and headers.get("if-range", entry.etag) in (entry.etag, entry.last_modified):
+            ranges = parse_range(headers["range"], entry.size)
+            if ranges == []:
+                content_range = f"Content-Range: bytes */{entry.size}\r\n".encode("utf-8")
+                self.send_prebuilt_response("416 Range Not Satisfiable", content_range + b"Content-Length: 0\r\n", b"", client_socket, client_address, keep_alive)
+                return
+            if ranges is not None:
+                self.send_ranges(entry, ranges, client_socket, client_address, keep_alive)
+                return
+        self.send_entry("200 OK", entry, client_socket, client_address, keep_alive, entry.validators)
+
+    def not_modified_validators(self, entry: CacheEntry, encoding: str | None, headers: dict[str, str]) -> bytes:
+        """Validators of the representation a 304 stands for, found without compressing the file.
+
+        A variant not built yet is assumed to be the one the client has if
+        its If-None-Match names it.
+        """
+        if encoding is None:
+            return entry.validators
+        if encoding in entry.variants:
+            variant = entry.variants[encoding]
+            return entry.validators if variant is None else variant.validators
+        if Variant.etag_for(entry, encoding) in headers.get("if-none-match", ""):
+            return Variant.validators_for(entry, encoding)
+        return entry.validators
+
+    def is_not_modified(self, entry: CacheEntry, headers: dict[str, str]) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110, 13.2.2).
+        if_none_match = headers.get("if-none-match")
+        if if_none_match is not None:
+            tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+            return "*" in tags or any(entry.matches(tag) for tag in tags)
+        if_modified_since = headers.get("if-modified-since")
+        if if_modified_since is None:
+            return False
         try:
-            with open(f"{self.file_manager.base_directory}/error/400.html", "rb") as file:
-                content = file.read()
-                length = len(content)
-                status_line = "HTTP/1.1 400 Bad Request\r\n".encode("utf-8")
-                headers = f"Content-Type: text/html; charset=UTF-8\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-                response = status_line + headers + content
-                client_socket.send(response)
-                self.log_manager.add_error(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
-        except Exception as e:
-            self.send_500_response(client_socket)
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return entry.mtime_ns // 1_000_000_000 <= since
+
+    def send_ranges(self, entry: CacheEntry, ranges: list[tuple[int, int]], client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        """Sends a 206 response, as multipart/byteranges if there is more than one range."""
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            parts = [(b"", start, end)]
+            trailer = b""
+            headers = f"Content-Type: {entry.content_type}\r\nContent-Length: {end - start + 1}\r\nContent-Range: bytes {start}-{end}/{entry.size}\r\n"
+        else:
+            parts = [
+                (f"--{BYTERANGES_BOUNDARY}\r\nContent-Type: {entry.content_type}\r\nContent-Range: bytes {start}-{end}/{entry.size}\r\n\r\n".encode("utf-8"), start, end)
+                for start, end in ranges
+            ]
+            trailer = f"--{BYTERANGES_BOUNDARY}--\r\n".encode("utf-8")
+            length = sum(len(head) + end - start + 3 for head, start, end in parts) + len(trailer)
+            headers = f"Content-Type: multipart/byteranges; boundary={BYTERANGES_BOUNDARY}\r\nContent-Length: {length}\r\n"
+        part_end = b"\r\n" if trailer else b""
+        self.send_prebuilt_response("206 Partial Content", headers.encode("utf-8") + entry.validators, b"", client_socket, client_address, keep_alive)
+        if entry.body is not None:
+            body = memoryview(entry.body)
+            buffers = []
+            for head, start, end in parts:
+                buffers += [head, body[start:end + 1], part_end]
+            self.send_buffers(client_socket, buffers + [trailer])
+            return
+        with open(entry.path, "rb") as file:
+            for head, start, end in parts:
+                self.send_buffers(client_socket, [head])
+                self.send_file_range(file, start, end - start + 1, client_socket)
+                self.send_buffers(client_socket, [part_end])
+        self.send_buffers(client_socket, [trailer])
 
-    def send_403_response(self, client_socket: socket.socket, client_address) -> None:
+    def send_prebuilt_response(self, status: str, headers: bytes, content: bytes, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        status_line = f"HTTP/1.1 {status}\r\n".encode("utf-8")
+        connection = CONNECTION_KEEP_ALIVE if keep_alive else CONNECTION_CLOSE
+        self.send_buffers(client_socket, [status_line, headers, connection, content])
+        self.count_response(status)
+        if status.startswith(("4", "5")):
+            self.log_manager.add_error("%s:%s - HTTP/1.1 %s", client_address[0], client_address[1], status)
+        else:
+            self.log_manager.add_log("%s:%s - HTTP/1.1 %s", client_address[0], client_address[1], status)
+
+    def send_cached_file(self, status: str, file_path: str, content_type: str, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
         try:
-            with open(f"{self.file_manager.base_directory}/error/403.html", "rb") as file:
-                content = file.read()
-                length = len(content)
-                status_line = "HTTP/1.1 403 Forbidden\r\n".encode("utf-8")
-                headers = f"Content-Type: text/html; charset=UTF-8\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-                response = status_line + headers + content
-                client_socket.send(response)
-                self.log_manager.add_error(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
-        except Exception as e:
-            self.send_500_response(client_socket, client_address)
+            entry = self.cache.get(file_path, content_type)
+        except OSError:
+            self.send_500_response(client_socket, client_address, keep_alive)
+            return
+        self.send_entry(status, entry, client_socket, client_address, keep_alive)
 
-    def send_404_response(self, client_socket: socket.socket, client_address) -> None:
+    def send_file(self, route: Route, client_socket: socket.socket, client_address, keep_alive: bool = True, headers: dict[str, str] | None = None) -> None:
         try:
-            with open(f"{self.file_manager.base_directory}/error/404.html", "rb") as file:
-                content = file.read()
-                length = len(content)
-                status_line = "HTTP/1.1 404 Not Found\r\n".encode("utf-8")
-                headers = f"Content-Type: text/html; charset=UTF-8\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-                response = status_line + headers + content
-                client_socket.send(response)
-                self.log_manager.add_error(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
-        except Exception as e:
-            self.send_500_response(client_socket, client_address)
+            entry = self.cache.get(route.file_path, route.content_type)
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            self.send_404_response(client_socket, client_address, keep_alive)
+            return
+        except OSError:
+            self.send_500_response(client_socket, client_address, keep_alive)
+            return
+        self.send_static(entry, headers or {}, client_socket, client_address, keep_alive, route.allow_ranges)
+
+    def send_error_page(self, status: str, page: str, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        self.send_cached_file(status, f"{self.file_manager.base_directory}/error/{page}", "text/html; charset=UTF-8", client_socket, client_address, keep_alive)
+
+    def send_400_response(self, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        self.send_error_page("400 Bad Request", "400.html", client_socket, client_address, keep_alive)
+
+    def send_403_response(self, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        self.send_error_page("403 Forbidden", "403.html", client_socket, client_address, keep_alive)
+
+    def send_404_response(self, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        self.send_error_page("404 Not Found", "404.html", client_socket, client_address, keep_alive)
     
-    def send_405_response(self, client_socket: socket.socket, client_address) -> None:
-        try:
-            with open(f"{self.file_manager.base_directory}/error/405.html", "rb") as file:
-                content = file.read()
-                length = len(content)
-                status_line = "HTTP/1.1 405 Method Not Allowed\r\n".encode("utf-8")
-                headers = f"Content-Type: text/html; charset=UTF-8\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-                response = status_line + headers + content
-                client_socket.send(response)
-                self.log_manager.add_error(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
-        except Exception as e:
-            self.send_500_response(client_socket, client_address)
+    def send_405_response(self, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
+        self.send_error_page("405 Method Not Allowed", "405.html", client_socket, client_address, keep_alive)
     
-    def send_500_response(self, client_socket: socket.socket, client_address) -> None:
+    def send_500_response(self, client_socket: socket.socket, client_address, keep_alive: bool = True) -> None:
         content = b"<!DOCTYPE html><html lang=\"en-us\"><head><meta charset=\"UTF-8\"><title>500 Internal Server Error</title></head><body><h1>500 Internal Server Error</h1><p>Sorry, something went wrong on the server.</p></body></html>"
-        length = len(content)
-        status_line = "HTTP/1.1 500 Internal Server Error\r\n".encode("utf-8")
-        headers = f"Content-Type: text/html; charset=UTF-8\r\nConnection: keep-alive\r\nContent-Length: {length}\r\n\r\n".encode("utf-8")
-        response = status_line + headers + content
         try:
-            client_socket.send(response)
-            self.log_manager.add_error(f"{client_address[0]}:{client_address[1]} - {status_line.decode("utf-8")}")
+            self.send_response("500 Internal Server Error", "text/html; charset=UTF-8", content, client_socket, client_address, keep_alive)
         except Exception as e:
-            self.log_manager.add_error(f"Exception occurred: {e}")
+            self.log_manager.add_error("Exception occurred: %s", e)
             pass
 
     def main(self) -> None:
-        self.socket.listen()
-        self.log_manager.add_log(f"Listening on {SERVER_IP}:{self.socket.getsockname()[1]}...")
+        self.socket.listen(socket.SOMAXCONN)
+        self.pool = WorkerPool(self.client_thread_handler, self.reject_connection, self.threads, self.queue_size,
+                               log_manager=self.log_manager)
+        self.pool.export_metrics(self.metrics)
+        self.log_manager.add_log("Listening on %s:%s...", SERVER_IP, self.socket.getsockname()[1])
+        try:
+            self.accept_loop()
+        finally:
+            # Stop accepting right away; connections being served are closed
+            # after their current request (see `stopping`), and the process
+            # exits once the pool is idle.
+            self.stopping = True
+            self.socket.close()
+            self.pool.drain(HTTP_SHUTDOWN_TIMEOUT)
+
+    def accept_loop(self) -> None:
+        accepted = self.metrics.counter("http_connections_accepted_total", "Connections accepted.")
         while True:
             client_socket, client_address = self.socket.accept()
-            self.log_manager.add_log(f"Connection established with {client_address[0]}:{client_address[1]}")
-            
-            self.lock.acquire()
-            client_thread = threading.Thread(
-                target=self.client_thread_handler,
-                args=(client_socket, client_address)
-            )
-            client_thread.start()
-            self.lock.release()
-            print('started thread')
-            self.client_threads.append(client_thread)
-            self.client_sockets[client_address] = client_socket
+            accepted.inc()
+            self.log_manager.add_log("Connection established with %s:%s", client_address[0], client_address[1])
+            self.pool.submit(client_socket, client_address)
\ No newline at end of file
@@ -0,0 +1,338 @@
+import asyncio
+import json
+import socket
+import struct
+import time
+from app.common.compression import Codec, compress_stream, negotiate
+from app.common.constants import SERVER_IP, SERVER_PORT, WINDOW_SIZE, CHUNK_SIZE, CRLF, FILE_BLOCK_SIZE
+from app.common.framing import FrameDecoder, FrameType, Frame, encode_frame
+from app.server.chat import AsyncSubscriber
+from app.server.server import Server
+
+class AsyncServer(Server):
+    """Event-loop engine for the EXIT/FILE/CHAT protocol.
+
+    Serves the same legacy and framed protocols as `Server`, but every
+    connection is a coroutine on a single asyncio event loop instead of a
+    dedicated thread, so an idle connection only costs its stream buffers and
+    chat connections wait on the socket instead of polling it.
+
+    Disk reads of file chunks are served from the page cache and stay on the
+    loop; hashing a file that is not in the digest index and compressing file
+    bodies run on the default executor so they do not stall other connections.
+    """
+    def main(self) -> None:
+        asyncio.run(self.serve())
+
+    async def serve(self) -> None:
+        self.socket.listen(socket.SOMAXCONN)
+        self.socket.setblocking(False)
+        server = await asyncio.start_server(self.client_handler, sock=self.socket)
+        self.log_manager.add_log("Listening on %s:%s...", SERVER_IP, self.socket.getsockname()[1])
+        async with server:
+            await server.serve_forever()
+
+    async def client_handler(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client_address = writer.get_extra_info("peername")
+        self.log_manager.add_log("Connection established with %s:%s", client_address[0], client_address[1])
+        self.metrics.counter("tcp_connections_accepted_total", "Connections accepted.").inc()
+        # asyncio already disables Nagle on TCP transports; kept explicit to match `Server`.
+        writer.get_extra_info("socket").setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_active.inc()
+        try:
+            data = await reader.read(1024)
+            if data[:1] == bytes([FrameType.HELLO]):
+                await self.handle_framed_connection_async(reader, writer, client_address, data)
+            else:
+                await self.handle_legacy_connection_async(reader, writer, client_address, data)
+        except (ConnectionError, ValueError) as e:
+            self.log_manager.add_error("Exception occurred: %s", e)
+        finally:
+            self.connections_active.dec()
+            writer.close()
+
+    async def handle_legacy_connection_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_address, data: bytes) -> None:
+        while data:
+            self.bytes_received.inc(len(data))
+            if data[:4] == b"EXIT":
+                self.count_request("EXIT")
+                self.log_manager.add_log("[EXIT request from %s:%s]", client_address[0], client_address[1])
+                self.log_manager.add_log("Connection with %s:%s closed.", client_address[0], client_address[1])
+                return
+            elif data[:4] == b"FILE":
+                self.count_request("FILE")
+                file_name = data[4:].decode()
+                self.log_manager.add_log("[FILE request from %s:%s]: %s", client_address[0], client_address[1], file_name)
+                await self.handle_file_request_async(file_name, reader, writer, client_address)
+            elif data[:4] == b"CHAT":
+                self.count_request("CHAT")
+                self.log_manager.add_log("[CHAT request fom %s:%s]", client_address[0], client_address[1])
+                await self.handle_chat_request_async(reader, writer, client_address, None, data[4:].decode().strip())
+            elif data[:4] == b"STAT":
+                self.count_request("STAT")
+                writer.write(f"200{CRLF}{self.metrics.to_json()}".encode("utf-8"))
+                await writer.drain()
+            elif data[:4] == b"LIST":
+                self.count_request("LIST")
+                writer.write(f"200{CRLF}".encode("utf-8") + self.list_files(data[4:].decode().strip()))
+                await writer.drain()
+            else:
+                writer.write(b"400Invalid request")
+                await writer.drain()
+                return
+            data = await reader.read(1024)
+
+    async def handle_file_request_async(self, file_name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_address) -> None:
+        start = time.perf_counter()
+        try:
+            if not self.file_manager.is_served(file_name):
+                writer.write(("404" + CRLF + "File not found.").encode("utf-8"))
+                await writer.drain()
+                return
+            file_size = self.file_manager.get_file_size(file_name)
+            file_hash = await asyncio.to_thread(self.file_manager.calculate_sha256, file_name)
+            response = "202" + CRLF + \
+                       file_name + CRLF + \
+                       str(file_size) + CRLF + \
+                       str(file_hash) + CRLF + \
+                       f"WINDOW={WINDOW_SIZE}"
+            writer.write(response.encode("utf-8"))
+            client_response = b""
+            while client_response != b"ACK" and not client_response.startswith(b"WINDOW"):
+                client_response = await self.read_legacy_response(reader)
+
+            file_generator = self.file_manager.read_from_file(file_name)
+            next(file_generator)
+            if client_response.startswith(b"WINDOW"):
+                window = max(1, min(int(client_response[6:]), WINDOW_SIZE))
+                if not await self.send_file_frames_async(file_generator, window, reader, writer, FrameDecoder(counter=self.bytes_received)):
+                    self.record_file_transfer("legacy", start, False)
+                    self.log_manager.add_warn("[FILE rejected by %s:%s]: %s", client_address[0], client_address[1], file_name)
+                    return
+            else:
+                for chunk in file_generator:
+                    await self.send_until_ack(b"200" + chunk, reader, writer)
+                    self.file_bytes_sent.inc(len(chunk))
+                await self.send_until_ack(b"EOF", reader, writer)
+            self.record_file_transfer("legacy", start, True)
+            self.log_manager.add_log("[FILE sent to %s:%s]: %s", client_address[0], client_address[1], file_name)
+        except OSError:
+            # The connection is gone: let the caller close it.
+            raise
+        except Exception as e:
+            self.log_manager.add_error("Exception occurred: %s", e)
+            writer.write(f"500Internal server error.{CRLF}".encode("utf-8"))
+            await writer.drain()
+
+    async def read_legacy_response(self, reader: asyncio.StreamReader) -> bytes:
+        data = await reader.read(1024)
+        if not data:
+            raise ConnectionError("Connection closed by peer.")
+        self.bytes_received.inc(len(data))
+        return data
+
+    async def send_until_ack(self, message: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client_response = b""
+        while client_response != b"ACK":
+            writer.write(message)
+            await writer.drain()
+            client_response = await self.read_legacy_response(reader)
+
+    async def read_frame(self, reader: asyncio.StreamReader, decoder: FrameDecoder) -> Frame:
+        while (frame := decoder.next_frame()) is None:
+            data = await reader.read(65536)
+            if not data:
+                raise ConnectionError("Connection closed by peer.")
+            decoder.feed(data)
+        return frame
+
+    async def send_file_frames_async(self, file_generator, window: int, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, decoder: FrameDecoder,
+                                     offload: bool = False) -> bool:
+        """Coroutine counterpart of `Server.send_file_frames`.
+
+        With `offload`, chunks are pulled from `file_generator` on the default
+        executor, for generators that compress them.
+        """
+        sent = 0
+        acked = 0
+        while True:
+            chunk = await asyncio.to_thread(next, file_generator, None) if offload else next(file_generator, None)
+            if chunk is None:
+                break
+            writer.write(encode_frame(FrameType.DATA, chunk))
+            self.file_bytes_sent.inc(len(chunk))
+            await writer.drain()
+            sent += 1
+            while sent - acked >= window:
+                frame_type, acked = await self.receive_window_ack_async(reader, decoder)
+        writer.write(encode_frame(FrameType.EOF))
+        await writer.drain()
+        while True:
+            frame_type, acked = await self.receive_window_ack_async(reader, decoder)
+            if frame_type != FrameType.ACK:
+                return frame_type == FrameType.FIN and acked == sent
+
+    async def receive_window_ack_async(self, reader: asyncio.StreamReader, decoder: FrameDecoder) -> tuple[int, int]:
+        frame = await self.read_frame(reader, decoder)
+        if frame.type not in (FrameType.ACK, FrameType.FIN, FrameType.NAK):
+            raise ValueError(f"Unexpected frame type {frame.type} during file transfer.")
+        return frame.type, struct.unpack("!I", frame.payload)[0]
+
+    async def handle_framed_connection_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_address, data: bytes) -> None:
+        decoder = FrameDecoder(counter=self.bytes_received)
+        decoder.feed(data)
+        window = WINDOW_SIZE
+        codec = None
+        while True:
+            frame = await self.read_frame(reader, decoder)
+            if frame.type == FrameType.HELLO:
+                options = json.loads(frame.payload or b"{}")
+                window = max(1, min(int(options.get("window", WINDOW_SIZE)), WINDOW_SIZE))
+                codec = negotiate(options.get("compression"))
+                response = json.dumps({"window": window, "chunk_size": CHUNK_SIZE, "compression": codec and codec.name})
+                writer.write(encode_frame(FrameType.HELLO, response.encode("utf-8")))
+                await writer.drain()
+            elif frame.type == FrameType.FILE:
+                request = json.loads(frame.payload)
+                names = self.requested_files(request)
+                if names is None:
+                    writer.write(encode_frame(FrameType.ERROR, json.dumps({"status": 400, "message": "Invalid file names."}).encode("utf-8")))
+                    await writer.drain()
+                    continue
+                pending = [] if len(names) > 1 and request.get("mode") == "bulk" else None
+                for file_name in names:
+                    self.count_request("FILE")
+                    self.log_manager.add_log("[FILE request from %s:%s]: %s", client_address[0], client_address[1], file_name)
+                    await self.handle_framed_file_request_async({**request, "name": file_name}, reader, writer, client_address, decoder, window, pending,
+                                                                codec=codec)
+                for file_name, start in pending or ():
+                    confirmed = (await self.read_frame(reader, decoder)).type == FrameType.FIN
+                    self.finish_file_transfer(file_name, client_address, "bulk", start, confirmed)
+            elif frame.type == FrameType.CHAT:
+                self.count_request("CHAT")
+                self.log_manager.add_log("[CHAT request fom %s:%s]", client_address[0], client_address[1])
+                await self.handle_chat_request_async(reader, writer, client_address, decoder, frame.payload.decode("utf-8"), codec=codec)
+            elif frame.type == FrameType.STAT:
+                self.count_request("STAT")
+                writer.write(encode_frame(FrameType.STAT, self.metrics.to_json().encode("utf-8")))
+                await writer.drain()
+            elif frame.type == FrameType.DELTA:
+                self.count_request("DELTA")
+                request = json.loads(frame.payload)
+                self.log_manager.add_log("[DELTA request from %s:%s]: %s", client_address[0], client_address[1], request['name'])
+                await self.handle_delta_request_async(request, reader, writer, client_address, decoder)
+            elif frame.type == FrameType.LIST:
+                self.count_request("LIST")
+                pattern = json.loads(frame.payload or b"{}").get("pattern", "*")
+                writer.write(encode_frame(FrameType.LIST, self.list_files(pattern)))
+                await writer.drain()
+            elif frame.type == FrameType.EXIT:
+                self.count_request("EXIT")
+                self.log_manager.add_log("[EXIT request from %s:%s]", client_address[0], client_address[1])
+                self.log_manager.add_log("Connection with %s:%s closed.", client_address[0], client_address[1])
+                return
+            else:
+                payload = json.dumps({"status": 400, "message": "Invalid request"}).encode("utf-8")
+                writer.write(encode_frame(FrameType.ERROR, payload))
+                await writer.drain()
+                return
+
+    async def handle_framed_file_request_async(self, request: dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_address, decoder: FrameDecoder, window: int,
+                                               pending: list | None = None, codec: Codec | None = None) -> None:
+        """Coroutine counterpart of `Server.handle_framed_file_request`."""
+        start = time.perf_counter()
+        file_name = request["name"]
+        if not self.file_manager.is_served(file_name):
+            payload = json.dumps({"status": 404, "message": "File not found."}).encode("utf-8")
+            writer.write(encode_frame(FrameType.ERROR, payload))
+            await writer.drain()
+            return
+        bulk = request.get("mode") == "bulk"
+        file_size = self.file_manager.get_file_size(file_name)
+        byte_range = self.resolve_range(request, file_size)
+        if byte_range is None:
+            payload = json.dumps({"status": 416, "message": "Invalid range."}).encode("utf-8")
+            writer.write(encode_frame(FrameType.ERROR, payload))
+            await writer.drain()
+            return
+        offset, length = byte_range
+        encoding = self.choose_encoding(file_name, offset, length, codec) if pending is None else None
+        bulk = bulk and encoding is None
+        digest, block_digests = await asyncio.to_thread(self.file_manager.calculate_digests, file_name) or ("", [])
+        header = {
+            "name": file_name,
+            "size": file_size,
+            "sha256": digest,
+            "mode": "bulk" if bulk else "stream",
+            "offset": offset,
+            "length": length,
+        }
+        if encoding is not None:
+            header["encoding"] = encoding.name
+        if request.get("blocks"):
+            header["block_size"] = FILE_BLOCK_SIZE
+            header["blocks"] = block_digests
+        writer.write(encode_frame(FrameType.HEADER, json.dumps(header).encode("utf-8")))
+        await writer.drain()
+        if bulk:
+            with self.file_manager.open_file(file_name) as file:
+                sent = await asyncio.get_running_loop().sendfile(writer.transport, file, offset, length) if length > 0 else 0
+            self.file_bytes_sent.inc(sent)
+            if sent != length:
+                raise ConnectionError(f"{file_name} changed while being sent.")
+            if pending is not None:
+                pending.append((file_name, start))
+                return
+            confirmed = (await self.read_frame(reader, decoder)).type == FrameType.FIN
+        else:
+            file_generator = self.file_manager.read_from_file(file_name, offset, length)
+            next(file_generator)
+            if encoding is not None:
+                file_generator = compress_stream(encoding, file_generator)
+            confirmed = await self.send_file_frames_async(file_generator, window, reader, writer, decoder, offload=encoding is not None)
+        self.finish_file_transfer(file_name, client_address, "bulk" if bulk else "stream", start, confirmed)
+
+    async def handle_delta_request_async(self, request: dict, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_address, decoder: FrameDecoder) -> None:
+        """Coroutine counterpart of `Server.handle_delta_request`; the delta is planned on a worker thread."""
+        start = time.perf_counter()
+        file_name = request["name"]
+        error = self.check_delta_request(file_name, request)
+        if error is not None:
+            status, message = error
+            writer.write(encode_frame(FrameType.ERROR, json.dumps({"status": status, "message": message}).encode("utf-8")))
+            await writer.drain()
+            return
+        header, plan = await asyncio.to_thread(self.plan_file_delta, file_name, request)
+        writer.write(encode_frame(FrameType.HEADER, json.dumps(header).encode("utf-8")))
+        with self.file_manager.open_file(file_name) as file:
+            for frames in self.delta_frames(file, plan):
+                writer.write(frames)
+                await writer.drain()
+        confirmed = (await self.read_frame(reader, decoder)).type == FrameType.FIN
+        self.finish_file_transfer(file_name, client_address, "delta", start, confirmed)
+
+    async def handle_chat_request_async(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, client_address, decoder: FrameDecoder | None, room_name: str = "",
+                                        codec: Codec | None = None) -> None:
+        """Runs a chat session; `decoder` is None for legacy connections."""
+        peer = f"{client_address[0]}:{client_address[1]}"
+        welcome = "You are now in the chat room. Type /exit to leave."
+        if decoder is None:
+            writer.write(f"200{CRLF}{welcome}".encode("utf-8"))
+        else:
+            writer.write(encode_frame(FrameType.MESSAGE, welcome.encode("utf-8")))
+        subscriber = AsyncSubscriber(peer, writer, framed=decoder is not None, codec=codec)
+        self.join_chat(subscriber, room_name)
+        try:
+            while True:
+                if decoder is None:
+                    text = (await self.read_legacy_response(reader)).decode("utf-8")
+                else:
+                    frame = await self.read_frame(reader, decoder)
+                    if frame.type != FrameType.MESSAGE:
+                        break
+                    text = frame.payload.decode("utf-8")
+                if not self.handle_chat_message(subscriber, text):
+                    break
+        finally:
+            self.leave_chat(subscriber)
+            await subscriber.close(encode_frame(FrameType.EOF) if decoder is not None else b"")
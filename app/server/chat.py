@@ -0,0 +1,246 @@
+import asyncio
+import socket
+import threading
+from collections import deque
+from app.common.compression import Codec
+from app.common.constants import CHAT_QUEUE_SIZE, CHAT_BACKPRESSURE_POLICY, CHAT_DEFAULT_ROOM
+from app.common.framing import FrameType, encode_compressed_frame, encode_frame
+
+DROP_OLDEST = "drop-oldest"
+DISCONNECT = "disconnect"
+MAX_ROOM_NAME_LENGTH = 32
+
+class ChatMessage:
+    """Chat message encoded at most once per wire format, however many members receive it.
+
+    Members whose connection negotiated a codec get the message compressed,
+    when that makes it smaller.
+    """
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self._legacy: bytes | None = None
+        self._framed: bytes | None = None
+        self._compressed: dict[str, bytes] = {}
+
+    def encode(self, framed: bool, codec: Codec | None = None) -> bytes:
+        if self._legacy is None:
+            self._legacy = self.text.encode("utf-8")
+        if not framed:
+            return self._legacy
+        if codec is not None:
+            encoded = self._compressed.get(codec.name)
+            if encoded is None:
+                encoded = self._compressed[codec.name] = encode_compressed_frame(codec, FrameType.MESSAGE, self._legacy)
+            return encoded
+        if self._framed is None:
+            self._framed = encode_frame(FrameType.MESSAGE, self._legacy)
+        return self._framed
+
+class Subscriber:
+    """Chat member with a bounded outbound queue.
+
+    Broadcasting only appends the encoded message to the queue; the bytes are
+    written to the socket by a writer owned by the subscriber, so a slow reader
+    never holds up the rest of the room. When the queue is full the
+    `policy` decides what happens: DROP_OLDEST discards the oldest queued
+    message, DISCONNECT evicts the subscriber.
+
+    Attributes:
+        name (str): Address of the member, used in log lines and chat messages.
+        framed (bool): Whether the member speaks the framed protocol.
+        codec (Codec | None): Compression negotiated by the member's connection.
+        dropped (int): Number of messages discarded because the queue was full.
+        room (ChatRoom | None): Room the member is currently in.
+    """
+    def __init__(self, name: str, framed: bool, capacity: int = CHAT_QUEUE_SIZE, policy: str = CHAT_BACKPRESSURE_POLICY,
+                 codec: Codec | None = None) -> None:
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"Unknown backpressure policy: {policy}")
+        self.name = name
+        self.framed = framed
+        self.codec = codec
+        self.capacity = capacity
+        self.policy = policy
+        self.queue: deque[bytes] = deque()
+        self.dropped = 0
+        self.closed = False
+        self.room: ChatRoom | None = None
+
+    def push(self, message: ChatMessage) -> bool:
+        """Queues a message, applying the backpressure policy. Returns False if the subscriber must be evicted."""
+        if self.closed:
+            return True
+        if len(self.queue) >= self.capacity:
+            if self.policy == DISCONNECT:
+                self.closed = True
+                self.queue.clear()
+                return False
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(message.encode(self.framed, self.codec))
+        return True
+
+    def take(self) -> bytes:
+        """Removes every queued message and returns them as one buffer."""
+        batch = b"".join(self.queue)
+        self.queue.clear()
+        return batch
+
+class ThreadSubscriber(Subscriber):
+    """Subscriber drained by a dedicated writer thread doing blocking sends."""
+    def __init__(self, name: str, client_socket: socket.socket, framed: bool, **kwargs) -> None:
+        super().__init__(name, framed, **kwargs)
+        self.socket = client_socket
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self.writer, daemon=True)
+        self.thread.start()
+
+    def offer(self, message: ChatMessage) -> None:
+        with self.condition:
+            accepted = self.push(message)
+            self.condition.notify()
+        if not accepted:
+            self.evict()
+
+    def writer(self) -> None:
+        while True:
+            with self.condition:
+                while not self.queue and not self.closed:
+                    self.condition.wait()
+                if not self.queue:
+                    return
+                batch = self.take()
+            try:
+                self.socket.sendall(batch)
+            except OSError:
+                with self.condition:
+                    self.closed = True
+                    self.queue.clear()
+                return
+
+    def evict(self) -> None:
+        # Shutting the socket down wakes up the session blocked on recv, which
+        # then leaves the room like any disconnected member.
+        try:
+            self.socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def close(self, final: bytes = b"") -> None:
+        """Flushes the queue, then `final`, and stops the writer thread."""
+        with self.condition:
+            if final and not self.closed:
+                self.queue.append(final)
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
+
+class AsyncSubscriber(Subscriber):
+    """Subscriber writing straight to its asyncio transport until the transport pushes back.
+
+    While the transport's write buffer is below its high-water mark messages
+    are handed to it immediately. Once it is above, messages go to the bounded
+    queue, which a task flushes whenever the transport drains.
+    """
+    def __init__(self, name: str, writer: asyncio.StreamWriter, framed: bool, **kwargs) -> None:
+        super().__init__(name, framed, **kwargs)
+        self.writer = writer
+        self.event = asyncio.Event()
+        self.task = asyncio.create_task(self.drain_queue())
+
+    def offer(self, message: ChatMessage) -> None:
+        if self.closed:
+            return
+        transport = self.writer.transport
+        if not self.queue and transport.get_write_buffer_size() < transport.get_write_buffer_limits()[1]:
+            transport.write(message.encode(self.framed, self.codec))
+            return
+        if not self.push(message):
+            transport.abort()
+        self.event.set()
+
+    async def drain_queue(self) -> None:
+        while True:
+            await self.event.wait()
+            self.event.clear()
+            try:
+                while self.queue:
+                    await self.writer.drain()
+                    self.writer.write(self.take())
+                await self.writer.drain()
+            except ConnectionError:
+                self.closed = True
+                self.queue.clear()
+                return
+            if self.closed:
+                return
+
+    async def close(self, final: bytes = b"") -> None:
+        if final and not self.closed:
+            self.queue.append(final)
+        self.closed = True
+        self.event.set()
+        await self.task
+
+class ChatRoom:
+    """Set of chat members with a broadcast that never blocks on a member's socket."""
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.subscribers: set[Subscriber] = set()
+        self.lock = threading.Lock()
+
+    def join(self, subscriber: Subscriber) -> None:
+        with self.lock:
+            self.subscribers.add(subscriber)
+
+    def leave(self, subscriber: Subscriber) -> None:
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def broadcast(self, text: str, sender: Subscriber | None = None) -> None:
+        message = ChatMessage(text)
+        with self.lock:
+            subscribers = tuple(self.subscribers)
+        for subscriber in subscribers:
+            if subscriber is not sender:
+                subscriber.offer(message)
+
+class ChatRegistry:
+    """Named chat rooms.
+
+    Rooms are created by their first join and removed when their last member
+    leaves, except for the default room. Every member is in one room at a
+    time, so a broadcast only ever walks the members of that room.
+    """
+    def __init__(self, default_room: str = CHAT_DEFAULT_ROOM) -> None:
+        self.default_room = default_room
+        self.rooms: dict[str, ChatRoom] = {default_room: ChatRoom(default_room)}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def is_valid_name(name: str) -> bool:
+        return 0 < len(name) <= MAX_ROOM_NAME_LENGTH and name.isprintable() and not any(c.isspace() for c in name)
+
+    def join(self, name: str, subscriber: Subscriber) -> ChatRoom:
+        with self.lock:
+            room = self.rooms.get(name)
+            if room is None:
+                room = self.rooms[name] = ChatRoom(name)
+            room.join(subscriber)
+            subscriber.room = room
+        return room
+
+    def leave(self, subscriber: Subscriber) -> ChatRoom | None:
+        with self.lock:
+            room = subscriber.room
+            if room is None:
+                return None
+            room.leave(subscriber)
+            subscriber.room = None
+            if not room.subscribers and room.name != self.default_room:
+                del self.rooms[room.name]
+        return room
+
+    def list(self) -> list[tuple[str, int]]:
+        with self.lock:
+            return sorted((name, len(room.subscribers)) for name, room in self.rooms.items())
@@ -1,7 +1,36 @@
+import argparse
+from app.common.constants import SERVER_PORT, WORKER_THREADS, WORKER_QUEUE_SIZE
+from app.common.log_manager import LEVELS
 from app.server.server import Server
+from app.server.async_server import AsyncServer
 
-def main():
-    server = Server()
+ENGINES = {
+    "threaded": Server,
+    "asyncio": AsyncServer,
+}
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(description="TCP file and chat server.")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default="threaded",
+                        help="threaded: one thread per connection; asyncio: single event loop")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--threads", type=int, default=WORKER_THREADS,
+                        help="threaded engine: connections served at once, at most half of them chat sessions "
+                             "(use the asyncio engine for large chats)")
+    parser.add_argument("--queue-size", type=int, default=WORKER_QUEUE_SIZE,
+                        help="threaded engine: connections waiting for a thread before new ones get a 503")
+    parser.add_argument("--quiet", action="store_true", help="do not echo log records to the console")
+    parser.add_argument("--log-level", choices=LEVELS.keys(), default="INFO")
+    parser.add_argument("--log-json", action="store_true", help="write the log file as JSON lines")
+    args = parser.parse_args(argv)
+    if args.threads < 1 or args.queue_size < 1:
+        parser.error("--threads and --queue-size must be at least 1")
+    log_options = {
+        "echo": not args.quiet,
+        "level": LEVELS[args.log_level],
+        "json_format": args.log_json,
+    }
+    server = ENGINES[args.engine](args.port, log_options, args.threads, args.queue_size)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,26 +1,47 @@
 import threading
 import socket
-from app.common.constants import CHUNK_SIZE, SERVER_IP, SERVER_PORT, CRLF
+import struct
+import json
+import time
+from app.common.constants import CHUNK_SIZE, SERVER_IP, SERVER_PORT, WINDOW_SIZE, CRLF, WORKER_THREADS, WORKER_QUEUE_SIZE, \
+    FILE_BLOCK_SIZE, WRITE_BUFFER_SIZE, COMPRESSION_MIN_SIZE, COMPRESSION_SAMPLE_SIZE, SERVER_BUSY, TCP_IDLE_TIMEOUT, \
+    DELTA_MAX_BLOCKS, CHAT_WORKER_SHARE
+from app.common.compression import Codec, compress_stream, is_compressible, negotiate
+from app.common.delta import COPY, delta_block_size, plan_delta
 from app.common.file_manager import FileManager
+from app.common.framing import FrameReader, FrameType, encode_frame
 from app.common.log_manager import LogManager
+from app.common.metrics import Metrics
+from app.common.worker_pool import WorkerPool
+from app.server.chat import ChatMessage, ChatRegistry, ChatRoom, Subscriber, ThreadSubscriber
 
 class Server:
-    def __init__(self):
+    def __init__(self, port: int = SERVER_PORT, log_options: dict | None = None,
+                 workers: int = WORKER_THREADS, queue_size: int = WORKER_QUEUE_SIZE):
+        self.port: int = port
+        self.workers: int = workers
+        self.queue_size: int = queue_size
+        self.pool: WorkerPool | None = None
         self.file_manager: FileManager | None = FileManager("server")
-        self.log_manager: LogManager | None = LogManager(self.file_manager)
+        self.log_manager: LogManager | None = LogManager(self.file_manager, **(log_options or {}))
         self.lock: threading.Lock | None = threading.Lock()
         self.log_manager.add_log("Starting server...")
+        self.metrics = Metrics()
+        self.connections_active = self.metrics.gauge("tcp_connections_active", "Connections being served.")
+        self.bytes_received = self.metrics.counter("tcp_bytes_received_total", "Bytes read from clients by the request handlers.")
+        self.file_bytes_sent = self.metrics.counter("tcp_file_bytes_sent_total", "File content bytes sent to clients.")
+        self.chat_fanout = self.metrics.histogram("tcp_chat_fanout_seconds", "Time to queue a chat message for every member of its room.")
         self.socket: socket.socket | None = self.create_socket()
-        self.client_threads = []
-        self.client_sockets = {}
-        self.chat_sockets = []
+        self.chat_rooms = ChatRegistry()
+        # Chat members hold their pool thread until they leave: keep the rest for transfers.
+        self.chat_slots = threading.BoundedSemaphore(max(1, int(workers * CHAT_WORKER_SHARE)))
         self.main()
 
     def create_socket(self) -> socket.socket | None:
-        server_port = SERVER_PORT
+        server_port = self.port
         while True:
             try:
-                self.log_manager.add_log(f"Binding socket to {SERVER_IP}:{server_port}...")
+                self.log_manager.add_log("Binding socket to %s:%s...", SERVER_IP, server_port)
                 _socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 _socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
                 _socket.bind((SERVER_IP, server_port))
@@ -29,7 +50,7 @@ class Server:
             except OSError:
                 _input = ""
                 while _input not in ["y", "n"]:
-                    self.log_manager.add_warn(f"Port {server_port} is already in use. Try another port?")
+                    self.log_manager.add_warn("Port %s is already in use. Try another port?", server_port)
                     _input = input("(y/n): ")
                     if _input == "y":
                         server_port += 1
@@ -40,34 +61,83 @@ class Server:
                 continue
     
     def client_thread_handler(self, client_socket: socket.socket, client_address) -> None:
+        # Pool threads are few: a client that goes quiet must not keep one forever.
+        client_socket.settimeout(TCP_IDLE_TIMEOUT)
+        # Replies are small frames written back to back (HEADER then body, ACKs,
+        # chat messages); without TCP_NODELAY they wait for the client's delayed ACK.
+        client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.connections_active.inc()
         while True:
             try:
                 data = client_socket.recv(1024)
-                if (data == b""): pass
+                if (data == b""):
+                    break
 
+                if (data[:1] == bytes([FrameType.HELLO])):
+                    self.handle_framed_connection(client_socket, client_address, data)
+                    break
+                self.bytes_received.inc(len(data))
                 if (data[:4] == b"EXIT"):
-                    self.log_manager.add_log(f"[EXIT request from {client_address[0]}:{client_address[1]}]")
+                    self.count_request("EXIT")
+                    self.log_manager.add_log("[EXIT request from %s:%s]", client_address[0], client_address[1])
                     self.handle_exit_request(client_socket, client_address)
                     break
                 elif (data[:4] == b"FILE"):
-                    self.log_manager.add_log(f"[FILE request from {client_address[0]}:{client_address[1]}]: {data.decode()[4:]}")
+                    self.count_request("FILE")
+                    self.log_manager.add_log("[FILE request from %s:%s]: %s", client_address[0], client_address[1], data.decode()[4:])
                     data = data[4:]
                     self.handle_file_request(data.decode(), client_socket)
                 elif (data[:4] == b"CHAT"):
-                    self.log_manager.add_log(f"[CHAT request fom {client_address[0]}:{client_address[1]}]")
-                    self.handle_chat_request(client_socket)
+                    self.count_request("CHAT")
+                    self.log_manager.add_log("[CHAT request fom %s:%s]", client_address[0], client_address[1])
+                    self.handle_chat_request(client_socket, data[4:].decode().strip())
                     pass
+                elif (data[:4] == b"STAT"):
+                    self.count_request("STAT")
+                    client_socket.sendall(f"200{CRLF}{self.metrics.to_json()}".encode("utf-8"))
+                elif (data[:4] == b"LIST"):
+                    self.count_request("LIST")
+                    client_socket.sendall(f"200{CRLF}".encode("utf-8") + self.list_files(data[4:].decode().strip()))
                 else:
                     response = b"400Invalid request"
                     client_socket.send(response)
                     break
+            except TimeoutError:
+                self.log_manager.add_log("Closing idle connection with %s:%s", client_address[0], client_address[1])
+                break
             except Exception as e:
-                self.log_manager.add_error(f"Exception occurred: {e}")
-                pass
+                # The thread belongs to a bounded pool: give it back instead
+                # of retrying on a socket that keeps failing.
+                self.log_manager.add_error("Exception occurred: %s", e)
+                break
+        self.connections_active.dec()
+        client_socket.close()
+
+    def count_request(self, command: str) -> None:
+        self.metrics.counter("tcp_requests_total", "Requests by command.", command=command).inc()
+
+    def record_file_transfer(self, mode: str, start: float, confirmed: bool) -> None:
+        """Records a FILE transfer that started at `start` (a `time.perf_counter` value) and just ended."""
+        self.metrics.histogram("tcp_file_transfer_seconds", "Time from a FILE request to the client's answer.",
+                               mode=mode).observe(time.perf_counter() - start)
+        self.metrics.counter("tcp_file_transfers_total", "FILE transfers by outcome.",
+                             result="confirmed" if confirmed else "rejected").inc()
+
+    def reject_connection(self, client_socket: socket.socket, client_address) -> None:
+        self.metrics.counter("tcp_connections_rejected_total", "Connections turned away with a 503.").inc()
+        stats = self.pool.stats()
+        self.log_manager.add_warn("Server busy, rejecting %s:%s (%s busy, %s queued, %.3fs max wait).",
+                                  client_address[0], client_address[1], stats["busy"], stats["queued"], stats["wait_max"])
+        try:
+            client_socket.send(SERVER_BUSY)
+        except OSError:
+            pass
+        client_socket.close()
 
     def handle_file_request(self, file_name: str, client_socket: socket.socket) -> None:
+        start = time.perf_counter()
         try:
-            if not self.file_manager.check_file_exists(file_name):
+            if not self.file_manager.is_served(file_name):
                 status_code = "404"
                 message = "File not found."
                 response = status_code + CRLF + \
@@ -82,92 +152,492 @@ class Server:
                 response = status_code + CRLF + \
                            file_name + CRLF + \
                            str(file_size) + CRLF + \
-                           str(file_hash)
+                           str(file_hash) + CRLF + \
+                           f"WINDOW={WINDOW_SIZE}"
                 client_response = b""
                 client_socket.send(response.encode("utf-8"))
-                while client_response != b"ACK":
-                    client_response = client_socket.recv(1024)
-                client_response = b""
+                while client_response != b"ACK" and not client_response.startswith(b"WINDOW"):
+                    client_response = self.receive_legacy_response(client_socket)
 
-                for chunk in file_generator:
-                    status_code = "200"
-                    response = status_code.encode("utf-8") + chunk
+                if client_response.startswith(b"WINDOW"):
+                    window = max(1, min(int(client_response[6:]), WINDOW_SIZE))
+                    if not self.send_file_frames(file_generator, window, client_socket, FrameReader(client_socket, counter=self.bytes_received)):
+                        self.record_file_transfer("legacy", start, False)
+                        address, port = client_socket.getpeername()
+                        self.log_manager.add_warn("[FILE rejected by %s:%s]: %s", address, port, file_name)
+                        return
+                else:
+                    client_response = b""
+                    for chunk in file_generator:
+                        status_code = "200"
+                        response = status_code.encode("utf-8") + chunk
+                        client_response = b""
+                        while client_response != b"ACK":
+                            client_socket.send(response)
+                            client_response = self.receive_legacy_response(client_socket)
+                        self.file_bytes_sent.inc(len(chunk))
                     client_response = b""
                     while client_response != b"ACK":
-                        client_socket.send(response)
-                        client_response = client_socket.recv(1024)
-                client_response = b""
-                while client_response != b"ACK":
-                    client_socket.send(b"EOF")
-                    client_response = client_socket.recv(1024)
+                        client_socket.send(b"EOF")
+                        client_response = self.receive_legacy_response(client_socket)
+                self.record_file_transfer("legacy", start, True)
                 address, port = client_socket.getpeername()
-                self.log_manager.add_log(f"[FILE sent to {address}:{port}]: {file_name}")
+                self.log_manager.add_log("[FILE sent to %s:%s]: %s", address, port, file_name)
         except BlockingIOError:
             pass
+        except OSError:
+            # The connection is gone or idle: let the caller close it.
+            raise
         except Exception as e:
             status_code = "500"
             message = "Internal server error."
             response = f"{status_code}{message}\r\n"
             client_socket.send(response.encode("utf-8"))
 
-    def handle_chat_request(self, client_socket: socket.socket) -> None:
+    def receive_legacy_response(self, client_socket: socket.socket) -> bytes:
+        data = client_socket.recv(1024)
+        if not data:
+            raise ConnectionError("Connection closed by peer.")
+        self.bytes_received.inc(len(data))
+        return data
+
+    def send_file_frames(self, file_generator, window: int, client_socket: socket.socket, reader: FrameReader) -> bool:
+        """Streams file chunks as DATA frames keeping up to `window` of them unacknowledged.
+
+        The stream ends with an EOF frame. The client answers with cumulative ACK
+        frames carrying the number of chunks received so far and, after verifying
+        the file, with a FIN or NAK frame carrying the final chunk count.
+
+        Returns:
+            bool: True if the client confirmed the transfer, False otherwise.
+        """
+        sent = 0
+        acked = 0
+        for chunk in file_generator:
+            client_socket.sendall(encode_frame(FrameType.DATA, chunk))
+            self.file_bytes_sent.inc(len(chunk))
+            sent += 1
+            while sent - acked >= window:
+                frame_type, acked = self.receive_window_ack(reader)
+        client_socket.sendall(encode_frame(FrameType.EOF))
+        while True:
+            frame_type, acked = self.receive_window_ack(reader)
+            if frame_type != FrameType.ACK:
+                return frame_type == FrameType.FIN and acked == sent
+
+    def receive_window_ack(self, reader: FrameReader) -> tuple[int, int]:
+        frame = reader.read_frame()
+        if frame.type not in (FrameType.ACK, FrameType.FIN, FrameType.NAK):
+            raise ValueError(f"Unexpected frame type {frame.type} during file transfer.")
+        return frame.type, struct.unpack("!I", frame.payload)[0]
+
+    def handle_framed_connection(self, client_socket: socket.socket, client_address, data: bytes) -> None:
+        """Serves a connection speaking the framed protocol (see `app.common.framing`).
+
+        `data` holds whatever the first read returned, which starts with the
+        client's HELLO frame and may already contain the following requests.
+        """
+        reader = FrameReader(client_socket, counter=self.bytes_received)
+        reader.feed(data)
+        window = WINDOW_SIZE
+        codec = None
+        try:
+            while True:
+                frame = reader.read_frame()
+                if frame.type == FrameType.HELLO:
+                    options = json.loads(frame.payload or b"{}")
+                    window = max(1, min(int(options.get("window", WINDOW_SIZE)), WINDOW_SIZE))
+                    codec = negotiate(options.get("compression"))
+                    response = json.dumps({"window": window, "chunk_size": CHUNK_SIZE, "compression": codec and codec.name})
+                    client_socket.sendall(encode_frame(FrameType.HELLO, response.encode("utf-8")))
+                elif frame.type == FrameType.FILE:
+                    request = json.loads(frame.payload)
+                    names = self.requested_files(request)
+                    if names is None:
+                        self.send_error_frame(client_socket, 400, "Invalid file names.")
+                        continue
+                    pending = [] if len(names) > 1 and request.get("mode") == "bulk" else None
+                    for file_name in names:
+                        self.count_request("FILE")
+                        self.log_manager.add_log("[FILE request from %s:%s]: %s", client_address[0], client_address[1], file_name)
+                        self.handle_framed_file_request({**request, "name": file_name}, client_socket, client_address, reader, window, pending,
+                                                        codec=codec)
+                    for file_name, start in pending or ():
+                        confirmed = reader.read_frame().type == FrameType.FIN
+                        self.finish_file_transfer(file_name, client_address, "bulk", start, confirmed)
+                elif frame.type == FrameType.CHAT:
+                    self.count_request("CHAT")
+                    self.log_manager.add_log("[CHAT request fom %s:%s]", client_address[0], client_address[1])
+                    self.handle_framed_chat_request(client_socket, client_address, reader, frame.payload.decode("utf-8"), codec=codec)
+                elif frame.type == FrameType.STAT:
+                    self.count_request("STAT")
+                    client_socket.sendall(encode_frame(FrameType.STAT, self.metrics.to_json().encode("utf-8")))
+                elif frame.type == FrameType.DELTA:
+                    self.count_request("DELTA")
+                    request = json.loads(frame.payload)
+                    self.log_manager.add_log("[DELTA request from %s:%s]: %s", client_address[0], client_address[1], request['name'])
+                    self.handle_delta_request(request, client_socket, client_address, reader)
+                elif frame.type == FrameType.LIST:
+                    self.count_request("LIST")
+                    pattern = json.loads(frame.payload or b"{}").get("pattern", "*")
+                    client_socket.sendall(encode_frame(FrameType.LIST, self.list_files(pattern)))
+                elif frame.type == FrameType.EXIT:
+                    self.count_request("EXIT")
+                    self.log_manager.add_log("[EXIT request from %s:%s]", client_address[0], client_address[1])
+                    self.handle_exit_request(client_socket, client_address)
+                    break
+                else:
+                    self.send_error_frame(client_socket, 400, "Invalid request")
+                    break
+        except (ConnectionError, ValueError) as e:
+            self.log_manager.add_error("Exception occurred: %s", e)
+            client_socket.close()
+
+    def handle_framed_file_request(self, request: dict, client_socket: socket.socket, client_address, reader: FrameReader, window: int,
+                                   pending: list | None = None, codec: Codec | None = None) -> None:
+        """Serves a FILE frame.
+
+        `request["mode"]` selects how the body is sent: "stream" sends DATA
+        frames under the negotiated window, while "bulk" sends the raw file body
+        right after the HEADER frame with `socket.sendfile`, so the bytes go from
+        the page cache to the socket without being copied through user space.
+
+        Only the `request["length"]` bytes starting at `request["offset"]` are
+        sent when those are given, which lets clients resume a partial download
+        or fetch ranges of a file over several connections. The HEADER frame
+        still carries the size and SHA-256 of the whole file, and with
+        `request["blocks"]` the SHA-256 of each of its FILE_BLOCK_SIZE blocks,
+        so the client can check the data as it arrives and re-request only
+        the blocks that got corrupted.
+
+        With `pending`, a bulk body is not followed by a wait for the client's
+        FIN or NAK: the file name and start time are appended to `pending`
+        instead, for the caller to read the confirmation later.
+
+        With the `codec` negotiated by the connection, a body that compresses
+        well (see `choose_encoding`) is compressed as one stream and sent as
+        DATA frames whatever the mode, and the HEADER frame names the codec in
+        "encoding". Sizes and digests still describe the uncompressed file.
+        Bodies of a bulk batch are never compressed, since their confirmations
+        are read only once the whole batch is sent.
+        """
+        start = time.perf_counter()
+        file_name = request["name"]
+        if not self.file_manager.is_served(file_name):
+            self.send_error_frame(client_socket, 404, "File not found.")
+            return
+        bulk = request.get("mode") == "bulk"
+        file_size = self.file_manager.get_file_size(file_name)
+        byte_range = self.resolve_range(request, file_size)
+        if byte_range is None:
+            self.send_error_frame(client_socket, 416, "Invalid range.")
+            return
+        offset, length = byte_range
+        encoding = self.choose_encoding(file_name, offset, length, codec) if pending is None else None
+        bulk = bulk and encoding is None
+        digest, block_digests = self.file_manager.calculate_digests(file_name) or ("", [])
+        header = {
+            "name": file_name,
+            "size": file_size,
+            "sha256": digest,
+            "mode": "bulk" if bulk else "stream",
+            "offset": offset,
+            "length": length,
+        }
+        if encoding is not None:
+            header["encoding"] = encoding.name
+        if request.get("blocks"):
+            header["block_size"] = FILE_BLOCK_SIZE
+            header["blocks"] = block_digests
+        client_socket.sendall(encode_frame(FrameType.HEADER, json.dumps(header).encode("utf-8")))
+        if bulk:
+            with self.file_manager.open_file(file_name) as file:
+                sent = client_socket.sendfile(file, offset, length) if length > 0 else 0
+            self.file_bytes_sent.inc(sent)
+            # The client expects exactly `length` raw bytes: after a short send
+            # it would read the next frames as file data.
+            if sent != length:
+                raise ConnectionError(f"{file_name} changed while being sent.")
+            if pending is not None:
+                pending.append((file_name, start))
+                return
+            confirmed = reader.read_frame().type == FrameType.FIN
+        else:
+            file_generator = self.file_manager.read_from_file(file_name, offset, length)
+            next(file_generator)
+            if encoding is not None:
+                file_generator = compress_stream(encoding, file_generator)
+            confirmed = self.send_file_frames(file_generator, window, client_socket, reader)
+        self.finish_file_transfer(file_name, client_address, "bulk" if bulk else "stream", start, confirmed)
+
+    def choose_encoding(self, file_name: str, offset: int, length: int, codec: Codec | None) -> Codec | None:
+        """Returns `codec` if the requested bytes of `file_name` are worth compressing, judging from their start."""
+        if codec is None or length < COMPRESSION_MIN_SIZE:
+            return None
+        with self.file_manager.open_file(file_name) as file:
+            file.seek(offset)
+            sample = file.read(min(length, COMPRESSION_SAMPLE_SIZE))
+        return codec if is_compressible(sample) else None
+
+    def handle_delta_request(self, request: dict, client_socket: socket.socket, client_address, reader: FrameReader) -> None:
+        """Serves a DELTA frame: sends a file as the differences from the client's copy of it.
+
+        `request["signatures"]` holds the checksums of the `request["block_size"]`
+        blocks of the client's copy (see `app.common.delta`). The HEADER frame
+        is followed by COPY frames, each naming a run of those blocks as a
+        4-byte first block and a 4-byte count, and DATA frames with the bytes
+        in between, up to an EOF frame. The client answers with FIN or NAK
+        once it has checked the rebuilt file against the HEADER's SHA-256.
+        """
+        start = time.perf_counter()
+        file_name = request["name"]
+        error = self.check_delta_request(file_name, request)
+        if error is not None:
+            self.send_error_frame(client_socket, *error)
+            return
+        header, plan = self.plan_file_delta(file_name, request)
+        client_socket.sendall(encode_frame(FrameType.HEADER, json.dumps(header).encode("utf-8")))
+        with self.file_manager.open_file(file_name) as file:
+            for frames in self.delta_frames(file, plan):
+                client_socket.sendall(frames)
+        confirmed = reader.read_frame().type == FrameType.FIN
+        self.finish_file_transfer(file_name, client_address, "delta", start, confirmed)
+
+    def check_delta_request(self, file_name: str, request: dict) -> tuple[int, str] | None:
+        """Returns the status and message to refuse a DELTA request with, or None if it can be served.
+
+        Planning a delta takes time proportional to the number of blocks of
+        the file, holding the GIL, so blocks smaller than the ones
+        `delta_block_size` picks for the file, or more than DELTA_MAX_BLOCKS
+        signatures, are refused.
+        """
+        if not self.file_manager.is_served(file_name):
+            return 404, "File not found."
+        try:
+            block_size = int(request.get("block_size", 0))
+        except (TypeError, ValueError):
+            block_size = 0
+        if block_size < delta_block_size(self.file_manager.get_file_size(file_name)):
+            return 400, "Invalid block size."
+        signatures = request.get("signatures")
+        if not isinstance(signatures, list) or len(signatures) > DELTA_MAX_BLOCKS:
+            return 400, "Invalid signatures."
+        for signature in signatures:
+            if not (isinstance(signature, list) and len(signature) == 2
+                    and isinstance(signature[0], int) and isinstance(signature[1], str)):
+                return 400, "Invalid signatures."
+        return None
+
+    def plan_file_delta(self, file_name: str, request: dict) -> tuple[dict, list]:
+        """Returns the HEADER of a DELTA answer and the plan (see `app.common.delta.plan_delta`) of its body."""
+        block_size = int(request["block_size"])
+        with self.file_manager.open_file(file_name) as file:
+            plan = plan_delta(file, block_size, request["signatures"])
+        literal = sum(length for kind, _, length in plan if kind != COPY)
+        header = {
+            "name": file_name,
+            "size": self.file_manager.get_file_size(file_name),
+            "sha256": self.file_manager.calculate_sha256(file_name) or "",
+            "mode": "delta",
+            "block_size": block_size,
+            "literal": literal,
+        }
+        self.log_manager.add_log("[DELTA of %s]: %s literal bytes of %s", file_name, literal, header["size"])
+        return header, plan
+
+    def delta_frames(self, file, plan: list):
+        """Yields the COPY, DATA and EOF frames of a delta `plan` of `file`, coalesced into writes of WRITE_BUFFER_SIZE bytes."""
+        frames = bytearray()
+        for kind, start, length in plan:
+            if kind == COPY:
+                frames += encode_frame(FrameType.COPY, struct.pack("!II", start, length))
+                continue
+            file.seek(start)
+            while length > 0:
+                data = file.read(min(length, WRITE_BUFFER_SIZE))
+                if not data:
+                    break
+                length -= len(data)
+                frames += encode_frame(FrameType.DATA, data)
+                self.file_bytes_sent.inc(len(data))
+                if len(frames) >= WRITE_BUFFER_SIZE:
+                    yield bytes(frames)
+                    frames.clear()
+        frames += encode_frame(FrameType.EOF)
+        yield bytes(frames)
+
+    def finish_file_transfer(self, file_name: str, client_address, mode: str, start: float, confirmed: bool) -> None:
+        self.record_file_transfer(mode, start, confirmed)
+        if confirmed:
+            self.log_manager.add_log("[FILE sent to %s:%s]: %s", client_address[0], client_address[1], file_name)
+        else:
+            self.log_manager.add_warn("[FILE rejected by %s:%s]: %s", client_address[0], client_address[1], file_name)
+
+    def handle_framed_chat_request(self, client_socket: socket.socket, client_address, reader: FrameReader, room_name: str = "",
+                                   codec: Codec | None = None) -> None:
+        peer = f"{client_address[0]}:{client_address[1]}"
+        if not self.chat_slots.acquire(blocking=False):
+            self.reject_chat(peer)
+            self.send_error_frame(client_socket, 503, "Chat is full, try again later.")
+            return
+        client_socket.sendall(encode_frame(FrameType.MESSAGE, b"You are now in the chat room. Type /exit to leave."))
+        subscriber = ThreadSubscriber(peer, client_socket, framed=True, codec=codec)
+        # Members may listen without talking for as long as they like.
+        client_socket.settimeout(None)
+        self.join_chat(subscriber, room_name)
+        try:
+            while True:
+                frame = reader.read_frame()
+                if frame.type != FrameType.MESSAGE:
+                    break
+                if not self.handle_chat_message(subscriber, frame.payload.decode("utf-8")):
+                    break
+        finally:
+            self.leave_chat(subscriber)
+            subscriber.close(encode_frame(FrameType.EOF))
+            client_socket.settimeout(TCP_IDLE_TIMEOUT)
+            self.chat_slots.release()
+
+    def reject_chat(self, peer: str) -> None:
+        self.metrics.counter("tcp_chat_rejected_total", "CHAT requests turned away, chat holding its share of the threads.").inc()
+        self.log_manager.add_warn("Chat is full, rejecting %s.", peer)
+
+    def requested_files(self, request: dict) -> list[str] | None:
+        """Returns the names a FILE request asks for, or None if they are not a name or a list of names.
+
+        A request with "names" instead of "name" asks for several files at
+        once, answered in turn with a HEADER or an ERROR frame and a body
+        each, as if requested one at a time. In "bulk" mode the bodies are
+        sent back to back and the client's FIN or NAK for each of them is
+        only read once they are all sent, so a batch takes a single round
+        trip however many files it holds.
+        """
+        names = request.get("names")
+        if names is None:
+            names = [request.get("name")]
+        if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+            return None
+        return names
+
+    def list_files(self, pattern: str = "*") -> bytes:
+        """Returns the JSON answer to a LIST request: the name and size of the files matching `pattern`."""
+        files = [{"name": name, "size": size} for name, size in self.file_manager.list_files(pattern or "*")]
+        return json.dumps({"files": files}).encode("utf-8")
+
+    def resolve_range(self, request: dict, file_size: int) -> tuple[int, int] | None:
+        """Returns the (offset, length) a FILE request asks for, or None if it is invalid.
+
+        A missing offset means the start of the file and a missing length the
+        rest of it; a length running past the end of the file is cut short.
+        """
+        try:
+            offset = int(request.get("offset", 0))
+            length = request.get("length")
+            length = file_size - offset if length is None else min(int(length), file_size - offset)
+        except (TypeError, ValueError):
+            return None
+        if offset < 0 or offset > file_size or length < 0:
+            return None
+        return offset, length
+
+    def send_error_frame(self, client_socket: socket.socket, status: int, message: str) -> None:
+        payload = json.dumps({"status": status, "message": message}).encode("utf-8")
+        client_socket.sendall(encode_frame(FrameType.ERROR, payload))
+
+    def join_chat(self, subscriber: Subscriber, room_name: str = "") -> None:
+        if not ChatRegistry.is_valid_name(room_name):
+            room_name = self.chat_rooms.default_room
+        room = self.chat_rooms.join(room_name, subscriber)
+        message = f"[CHAT {subscriber.name} joined #{room.name}]"
+        self.log_manager.add_log(message)
+        self.broadcast(room, message, subscriber)
+        subscriber.offer(ChatMessage(f"[CHAT you are in #{room.name}. Commands: /join <room>, /leave, /rooms, /exit]"))
+
+    def leave_chat(self, subscriber: Subscriber) -> None:
+        room = self.chat_rooms.leave(subscriber)
+        if room is None:
+            return
+        message = f"[CHAT {subscriber.name} left #{room.name}]"
+        self.log_manager.add_log(message)
+        self.broadcast(room, message, subscriber)
+
+    def broadcast(self, room: ChatRoom, message: str, sender: Subscriber) -> None:
+        start = time.perf_counter()
+        room.broadcast(message, sender)
+        self.chat_fanout.observe(time.perf_counter() - start)
+
+    def handle_chat_message(self, subscriber: Subscriber, text: str) -> bool:
+        """Handles a line typed by a chat member.
+
+        Lines starting with a slash are room commands; anything else is
+        broadcast to the member's current room.
+
+        Returns:
+            bool: False when the member asked to leave the chat.
+        """
+        command = text.strip()
+        if command[:5] == "/exit":
+            return False
+        if command.startswith("/join "):
+            room_name = command[6:].strip()
+            if not ChatRegistry.is_valid_name(room_name):
+                subscriber.offer(ChatMessage(f"[CHAT invalid room name: {room_name}]"))
+            elif room_name != subscriber.room.name:
+                self.leave_chat(subscriber)
+                self.join_chat(subscriber, room_name)
+        elif command == "/leave":
+            if subscriber.room.name != self.chat_rooms.default_room:
+                self.leave_chat(subscriber)
+                self.join_chat(subscriber)
+        elif command == "/rooms":
+            rooms = ", ".join(f"#{name} ({members})" for name, members in self.chat_rooms.list())
+            subscriber.offer(ChatMessage(f"[CHAT rooms: {rooms}]"))
+        else:
+            message = f"[{subscriber.name}]: {text}"
+            self.log_manager.add_log(message)
+            self.broadcast(subscriber.room, message, subscriber)
+        return True
+
+    def handle_chat_request(self, client_socket: socket.socket, room_name: str = "") -> None:
+        peer = "{}:{}".format(*client_socket.getpeername())
+        if not self.chat_slots.acquire(blocking=False):
+            self.reject_chat(peer)
+            client_socket.sendall(b"503Chat is full, try again later.")
+            return
         response = "200\r\nYou are now in the chat room. Type /exit to leave."
-        self.chat_sockets.append(client_socket)
         client_socket.send(response.encode("utf-8"))
-        client_socket.setblocking(False)
-        message = f"[CHAT {client_socket.getpeername()[0]}:{client_socket.getpeername()[1]} joined the chat]"
-        self.log_manager.add_log(message)
-        self.lock.acquire()
-        for socket in self.chat_sockets:
-            if socket != client_socket:
-                socket.send(message.encode("utf-8"))
-        self.lock.release()
+        subscriber = ThreadSubscriber(peer, client_socket, framed=False)
+        client_socket.settimeout(None)
+        self.join_chat(subscriber, room_name)
         while True:
             try:
                 data = client_socket.recv(1024)
-                if data == b"": 
-                    pass
-                if data[:5] == b"/exit":
-                    self.log_manager.add_log(f"[CHAT {client_socket.getpeername()[0]}:{client_socket.getpeername()[1]} left the chat]")
-                    self.lock.acquire()
-                    for socket in self.chat_sockets:
-                        if socket != client_socket:
-                            socket.send(f"[CHAT {client_socket.getpeername()[0]}:{client_socket.getpeername()[1]} left the chat]".encode("utf-8"))
-                    self.lock.release()
-                    client_socket.setblocking(True)
+                self.bytes_received.inc(len(data))
+                if data == b"" or not self.handle_chat_message(subscriber, data.decode()):
                     break
-                message = f"[{client_socket.getpeername()[0]}:{client_socket.getpeername()[1]}]: {data.decode()}"
-                self.log_manager.add_log(message)
-                self.lock.acquire()
-                for socket in self.chat_sockets:
-                    if socket != client_socket:
-                        socket.send(message.encode("utf-8"))
-                self.lock.release()
-            except BlockingIOError as e:
-                pass
+            except OSError as e:
+                self.log_manager.add_error("Exception ocurred: %s", e)
+                break
             except Exception as e:
-                self.log_manager.add_error(f"Exception ocurred: {e}")
-        self.chat_sockets.remove(client_socket)
+                self.log_manager.add_error("Exception ocurred: %s", e)
+        self.leave_chat(subscriber)
+        subscriber.close()
+        client_socket.settimeout(TCP_IDLE_TIMEOUT)
+        self.chat_slots.release()
         
     def handle_exit_request(self, client_socket, client_address) -> None:
         client_socket.close()
-        self.log_manager.add_log(f"Connection with {client_address[0]}:{client_address[1]} closed.")
-        if (client_address in self.client_sockets.keys()):
-            del self.client_sockets[client_address]
-        current_thread = threading.current_thread()
-        self.client_threads.remove(current_thread)
-        pass
+        self.log_manager.add_log("Connection with %s:%s closed.", client_address[0], client_address[1])
 
     def main(self) -> None:
-        self.socket.listen(10)
-        self.log_manager.add_log(f"Listening on {SERVER_IP}:{self.socket.getsockname()[1]}...")
+        self.socket.listen(socket.SOMAXCONN)
+        self.pool = WorkerPool(self.client_thread_handler, self.reject_connection, self.workers, self.queue_size,
+                               log_manager=self.log_manager)
+        self.pool.export_metrics(self.metrics)
+        accepted = self.metrics.counter("tcp_connections_accepted_total", "Connections accepted.")
+        self.log_manager.add_log("Listening on %s:%s...", SERVER_IP, self.socket.getsockname()[1])
         while True:
             client_socket, client_address = self.socket.accept()
-            self.log_manager.add_log(f"Connection established with {client_address[0]}:{client_address[1]}")
-            client_thread = threading.Thread(
-                target=self.client_thread_handler,
-                args=(client_socket, client_address)
-            )
-            client_thread.start()
-            self.client_threads.append(client_thread)
-            self.client_sockets[client_address] = client_socket
\ No newline at end of file
+            accepted.inc()
+            self.log_manager.add_log("Connection established with %s:%s", client_address[0], client_address[1])
+            self.pool.submit(client_socket, client_address)
\ No newline at end of file
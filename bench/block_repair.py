@@ -0,0 +1,71 @@
+"""Measures what recovering from a corrupted byte costs a FILE download.
+
+A `LatencyProxy` with `--rtt-ms` of round trip time flips one byte in the
+middle of the file on its way to the client. The client detects the
+corrupted block as soon as it arrives and requests that block alone again,
+so the download should take one block and one round trip longer than a
+clean one, instead of twice as long as before. Run from the repository root:
+
+    python -m bench.block_repair --size-mb 64 --rtt-ms 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from app.client.client import Client
+from app.common.constants import FILE_BLOCK_SIZE
+from bench.latency_proxy import LatencyProxy
+from bench.servers import start_tcp_server
+
+FILE_NAME = "bench_repair.bin"
+
+
+def download(port: int, rtt: float, bulk: bool, corrupt_at: int | None) -> float:
+    proxy = LatencyProxy(("127.0.0.1", port), rtt, corrupt_at)
+    client = Client(server_ip="127.0.0.1", server_port=proxy.port, client_port=0, bulk=bulk, interactive=False)
+    client.connect()
+    start = time.perf_counter()
+    if not client.fetch_file(FILE_NAME):
+        raise RuntimeError("Transfer failed.")
+    elapsed = time.perf_counter() - start
+    client.handle_exit()
+    proxy.close()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=64)
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0, 10])
+    parser.add_argument("--mode", choices=("bulk", "stream"), default="bulk")
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    source = f"app/server/{FILE_NAME}"
+    with open(source, "wb") as file:
+        file.write(os.urandom(size))
+    bulk = args.mode == "bulk"
+
+    output = sys.stdout
+    print(f"{'rtt (ms)':>8} {'download':>10} {'seconds':>9} {'MiB/s':>9}", file=output)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            port = start_tcp_server()
+            # Fills the server's digest index, so no run pays for hashing the file.
+            download(port, 0, bulk, None)
+            for rtt in args.rtt_ms:
+                for label, corrupt_at in (("clean", None), ("corrupted", size // 2)):
+                    elapsed = download(port, rtt / 1000, bulk, corrupt_at)
+                    print(f"{rtt:>8g} {label:>10} {elapsed:>9.3f} {size / elapsed / 2**20:>9.2f}", file=output)
+        print(f"Block size: {FILE_BLOCK_SIZE // 1024} KiB", file=output)
+    finally:
+        for path in (source, f"app/client/{FILE_NAME}"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Measures chat broadcast throughput as the number of members in the room grows.
+
+For each room size, `size - 1` framed listeners join the chat, then one
+sender pushes `--messages` messages back-to-back. The result is the time until
+every listener has received every message. Run from the repository root:
+
+    python -m bench.chat_fanout --sizes 2 8 32 128 --messages 2000
+"""
+import argparse
+import selectors
+import socket
+import time
+
+from app.common.framing import FrameReader, FrameType, encode_frame
+from bench.servers import start_tcp_server_process
+
+MARKER = b"]: bench "
+
+
+def join_chat(port: int, room: str = "") -> tuple[socket.socket, FrameReader]:
+    _socket = socket.create_connection(("127.0.0.1", port))
+    reader = FrameReader(_socket)
+    _socket.sendall(encode_frame(FrameType.HELLO, b"{}"))
+    reader.read_frame()
+    _socket.sendall(encode_frame(FrameType.CHAT, room.encode("utf-8")))
+    reader.read_frame()
+    return _socket, reader
+
+
+def run_room(port: int, size: int, messages: int, timeout: float, room: str = "") -> float:
+    listeners = [join_chat(port, room) for _ in range(size - 1)]
+    sender, _ = join_chat(port, room)
+    selector = selectors.DefaultSelector()
+    received = {}
+    for _socket, reader in listeners:
+        selector.register(_socket, selectors.EVENT_READ, reader)
+        received[reader] = 0
+
+    payload = b"".join(encode_frame(FrameType.MESSAGE, b"bench %d" % index) for index in range(messages))
+    start = time.perf_counter()
+    sender.sendall(payload)
+    pending = len(listeners)
+    while pending and time.perf_counter() - start < timeout:
+        for key, _ in selector.select(timeout=1):
+            reader = key.data
+            reader.fill()
+            for frame in reader.frames():
+                if MARKER in frame.payload:
+                    received[reader] += 1
+                    if received[reader] == messages:
+                        pending -= 1
+    elapsed = time.perf_counter() - start
+    for _socket, _ in listeners + [(sender, None)]:
+        _socket.close()
+    if pending:
+        raise TimeoutError(f"{pending} listeners did not receive every message.")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2, 8, 32, 128])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    process, port = start_tcp_server_process(args.engine)
+    print(f"{'members':>8} {'msgs/s':>10} {'deliveries/s':>13}")
+    try:
+        for size in args.sizes:
+            elapsed = run_room(port, size, args.messages, args.timeout)
+            print(f"{size:>8} {args.messages / elapsed:>10.0f} {args.messages * (size - 1) / elapsed:>13.0f}")
+            time.sleep(0.5)
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Shows that chat broadcast cost depends on the room size, not on how many users are connected.
+
+Fills `--background-rooms` rooms with `--room-size` idle members each, then
+measures broadcast throughput in one extra room of the same size. Run from
+the repository root:
+
+    python -m bench.chat_rooms --room-size 8 --background-rooms 0 16 64 256
+"""
+import argparse
+import time
+
+from bench.chat_fanout import join_chat, run_room
+from bench.servers import start_tcp_server_process
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--room-size", type=int, default=8)
+    parser.add_argument("--background-rooms", type=int, nargs="+", default=[0, 16, 64, 256])
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="asyncio")
+    parser.add_argument("--timeout", type=float, default=120)
+    args = parser.parse_args()
+
+    print(f"{'users':>7} {'rooms':>6} {'msgs/s':>10} {'us/msg/member':>14}")
+    for rooms in args.background_rooms:
+        process, port = start_tcp_server_process(args.engine)
+        background = []
+        try:
+            for room in range(rooms):
+                background += [join_chat(port, f"room{room}")[0] for _ in range(args.room_size)]
+            time.sleep(0.5)
+            elapsed = run_room(port, args.room_size, args.messages, args.timeout, "measured")
+            users = len(background) + args.room_size
+            per_delivery = elapsed / (args.messages * (args.room_size - 1)) * 1e6
+            print(f"{users:>7} {rooms + 1:>6} {args.messages / elapsed:>10.0f} {per_delivery:>14.2f}")
+        finally:
+            for _socket in background:
+                _socket.close()
+            process.terminate()
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
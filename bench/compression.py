@@ -0,0 +1,85 @@
+"""Compares FILE downloads without compression and with each codec over links of several speeds.
+
+The text of `app/http/book.txt` shows the gain on compressible data and
+`app/http/assets/joker.jpg` that already compressed data is sent as is.
+Links are emulated by `LatencyProxy`; a speed of 0 leaves loopback unlimited.
+For each download, "wire KiB" is the file data the server sent, read from
+its `tcp_file_bytes_sent_total` metric, "MiB/s" the uncompressed size over
+the download time, and the CPU columns the time the server process spent
+(compressing) and the client spent receiving (decompressing). Run from the
+repository root:
+
+    python -m bench.compression --mbps 2 10 100 0 --rtt-ms 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import sys
+import time
+
+from app.client.client import Client
+from bench.latency_proxy import LatencyProxy
+from bench.servers import process_cpu_seconds, start_tcp_server_process
+
+FILES = {"bench_book.txt": "app/http/book.txt", "bench_joker.jpg": "app/http/assets/joker.jpg"}
+CODECS = (None, "zlib", "lzma")
+
+
+def download(port: int, file_name: str, compression: str | None, server_pid: int) -> tuple[float, int, float, float]:
+    """Returns the seconds a download took, the file bytes the server sent and the server and client CPU seconds."""
+    client = Client(server_ip="127.0.0.1", server_port=port, client_port=0, compression=compression, interactive=False)
+    client.connect()
+    sent = client.fetch_stats()["tcp_file_bytes_sent_total"]
+    server_cpu = process_cpu_seconds(server_pid)
+    client_cpu = time.thread_time()
+    start = time.perf_counter()
+    if not client.fetch_file(file_name):
+        raise RuntimeError("Transfer failed.")
+    elapsed = time.perf_counter() - start
+    client_cpu = time.thread_time() - client_cpu
+    server_cpu = process_cpu_seconds(server_pid) - server_cpu
+    sent = client.fetch_stats()["tcp_file_bytes_sent_total"] - sent
+    client.handle_exit()
+    return elapsed, sent, server_cpu, client_cpu
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mbps", type=float, nargs="+", default=[2, 10, 100, 0],
+                        help="link speeds in Mbit/s, 0 for unlimited")
+    parser.add_argument("--rtt-ms", type=float, default=10)
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded")
+    args = parser.parse_args()
+
+    for file_name, path in FILES.items():
+        shutil.copy(path, f"app/server/{file_name}")
+    output = sys.stdout
+    print(f"{'Mbit/s':>7} {'file':>16} {'codec':>5} {'wire KiB':>9} {'seconds':>8} {'MiB/s':>8} "
+          f"{'server CPU s':>12} {'client CPU s':>12}", file=output)
+    process = None
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            process, port = start_tcp_server_process(args.engine)
+            for mbps in args.mbps:
+                proxy = LatencyProxy(("127.0.0.1", port), args.rtt_ms / 1000, bandwidth=mbps * 1e6 / 8 or None)
+                for file_name in FILES:
+                    size = os.path.getsize(f"app/server/{file_name}")
+                    for codec in CODECS:
+                        elapsed, sent, server_cpu, client_cpu = download(proxy.port, file_name, codec, process.pid)
+                        print(f"{f'{mbps:g}' if mbps else 'inf':>7} {file_name:>16} {codec or '-':>5} {sent / 1024:>9.0f} {elapsed:>8.3f} "
+                              f"{size / elapsed / 2**20:>8.2f} {server_cpu:>12.3f} {client_cpu:>12.3f}", file=output)
+                proxy.close()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        for file_name in FILES:
+            for directory in ("server", "client"):
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(f"app/{directory}/{file_name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Measures per-connection memory and CPU of the threaded and asyncio server engines.
+
+Opens `--connections` idle framed connections plus `--chatters` legacy chat
+connections against each engine, then samples the server's RSS, thread count
+and CPU usage over an idle window. Run from the repository root:
+
+    python -m bench.connections --connections 1000 --chatters 4
+"""
+import argparse
+import socket
+import time
+
+from app.common.framing import FrameReader, FrameType, encode_frame
+from bench.servers import process_cpu_seconds, process_rss_bytes, process_thread_count, start_tcp_server_process
+
+
+def open_idle_connection(port: int) -> socket.socket:
+    _socket = socket.create_connection(("127.0.0.1", port))
+    _socket.sendall(encode_frame(FrameType.HELLO, b"{}"))
+    FrameReader(_socket).read_frame()
+    return _socket
+
+
+def open_chat_connection(port: int) -> socket.socket:
+    _socket = socket.create_connection(("127.0.0.1", port))
+    _socket.sendall(b"CHAT")
+    _socket.recv(1024)
+    return _socket
+
+
+def measure(engine: str, connections: int, chatters: int, window: float) -> dict:
+    process, port = start_tcp_server_process(engine)
+    sockets = []
+    try:
+        time.sleep(0.5)
+        base_rss = process_rss_bytes(process.pid)
+        sockets += [open_idle_connection(port) for _ in range(connections)]
+        sockets += [open_chat_connection(port) for _ in range(chatters)]
+        time.sleep(1)
+        rss = process_rss_bytes(process.pid)
+        cpu = process_cpu_seconds(process.pid)
+        time.sleep(window)
+        cpu = process_cpu_seconds(process.pid) - cpu
+        return {
+            "engine": engine,
+            "threads": process_thread_count(process.pid),
+            "rss_per_connection": (rss - base_rss) / max(1, connections + chatters),
+            "cpu_percent": 100 * cpu / window,
+        }
+    finally:
+        for _socket in sockets:
+            _socket.close()
+        process.terminate()
+        process.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--chatters", type=int, default=4)
+    parser.add_argument("--window", type=float, default=3.0)
+    args = parser.parse_args()
+
+    print(f"{'engine':>9} {'threads':>8} {'KiB/conn':>9} {'idle cpu %':>11}")
+    for engine in ("threaded", "asyncio"):
+        result = measure(engine, args.connections, args.chatters, args.window)
+        print(
+            f"{result['engine']:>9} {result['threads']:>8} "
+            f"{result['rss_per_connection'] / 1024:>9.1f} {result['cpu_percent']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
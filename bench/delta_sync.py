@@ -0,0 +1,91 @@
+"""Compares full and delta downloads of a file after typical changes to it.
+
+The client starts with the original file; the server holds a changed
+version of it. The bytes of file data the server sent, read from its
+`tcp_file_bytes_sent_total` metric, are the literal bytes of the delta, and
+the whole file for a full download. Run from the repository root:
+
+    python -m bench.delta_sync --size-mb 64 --rtt-ms 10
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from app.client.client import Client
+from bench.latency_proxy import LatencyProxy
+from bench.servers import start_tcp_server
+
+FILE_NAME = "bench_delta.bin"
+
+
+def change(original: bytes, scenario: str) -> bytes:
+    middle = len(original) // 2
+    if scenario == "unchanged":
+        return original
+    if scenario == "append 1%":
+        return original + os.urandom(len(original) // 100)
+    if scenario == "edit 16 B":
+        return original[:middle] + os.urandom(16) + original[middle + 16:]
+    if scenario == "insert 100 B":
+        return original[:middle] + os.urandom(100) + original[middle:]
+    if scenario == "delete 1%":
+        return original[:middle] + original[middle + len(original) // 100:]
+    return os.urandom(len(original))
+
+
+SCENARIOS = ("unchanged", "append 1%", "edit 16 B", "insert 100 B", "delete 1%", "rewritten")
+
+
+def download(port: int, delta: bool) -> tuple[float, int]:
+    """Returns the seconds a download took and the file bytes the server sent for it."""
+    client = Client(server_ip="127.0.0.1", server_port=port, client_port=0, delta=delta, interactive=False)
+    client.connect()
+    sent = client.fetch_stats()["tcp_file_bytes_sent_total"]
+    start = time.perf_counter()
+    if not client.fetch_file(FILE_NAME):
+        raise RuntimeError("Transfer failed.")
+    elapsed = time.perf_counter() - start
+    sent = client.fetch_stats()["tcp_file_bytes_sent_total"] - sent
+    client.handle_exit()
+    return elapsed, sent
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=64)
+    parser.add_argument("--rtt-ms", type=float, default=10)
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded")
+    args = parser.parse_args()
+
+    original = os.urandom(int(args.size_mb * 1024 * 1024))
+    source = f"app/server/{FILE_NAME}"
+    destination = f"app/client/{FILE_NAME}"
+    output = sys.stdout
+    print(f"{'change':>13} {'full MiB':>9} {'delta MiB':>10} {'full s':>8} {'delta s':>8}", file=output)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            port = start_tcp_server(args.engine)
+            proxy = LatencyProxy(("127.0.0.1", port), args.rtt_ms / 1000)
+            for scenario in SCENARIOS:
+                with open(source, "wb") as file:
+                    file.write(change(original, scenario))
+                results = []
+                for delta in (False, True):
+                    with open(destination, "wb") as file:
+                        file.write(original)
+                    results.append(download(proxy.port, delta))
+                (full_seconds, full_bytes), (delta_seconds, delta_bytes) = results
+                print(f"{scenario:>13} {full_bytes / 2**20:>9.2f} {delta_bytes / 2**20:>10.3f} "
+                      f"{full_seconds:>8.3f} {delta_seconds:>8.3f}", file=output)
+            proxy.close()
+    finally:
+        for path in (source, destination):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
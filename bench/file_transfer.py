@@ -0,0 +1,70 @@
+"""Compares FILE transfer throughput of the stop-and-wait, windowed, framed and bulk protocols.
+
+Run from the repository root:
+
+    python -m bench.file_transfer --size-mb 2 --rtt-ms 0 2 10 20
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from app.client.client import Client
+from bench.latency_proxy import LatencyProxy
+from bench.servers import start_tcp_server
+
+FILE_NAME = "bench_transfer.bin"
+
+
+MODES = {
+    "stop-wait": {"framed": False, "bulk": False, "windowed": False},
+    "windowed": {"framed": False, "bulk": False, "windowed": True},
+    "framed": {"framed": True, "bulk": False, "windowed": True},
+    "bulk": {"framed": True, "bulk": True, "windowed": True},
+}
+
+
+def transfer(port: int, framed: bool, bulk: bool, windowed: bool) -> float:
+    client = Client(server_ip="127.0.0.1", server_port=port, client_port=0, framed=framed, bulk=bulk, interactive=False)
+    client.connect()
+    start = time.perf_counter()
+    if not client.fetch_file(FILE_NAME, windowed=windowed):
+        raise RuntimeError("Transfer failed.")
+    elapsed = time.perf_counter() - start
+    client.handle_exit()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=2)
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[0, 2, 10, 20])
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded")
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    source = f"app/server/{FILE_NAME}"
+    with open(source, "wb") as file:
+        file.write(os.urandom(size))
+
+    output = sys.stdout
+    print(f"{'rtt (ms)':>8} {'mode':>10} {'seconds':>9} {'MiB/s':>9}", file=output)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            port = start_tcp_server(args.engine)
+            for rtt in args.rtt_ms:
+                proxy = LatencyProxy(("127.0.0.1", port), rtt / 1000)
+                for mode, options in MODES.items():
+                    elapsed = transfer(proxy.port, **options)
+                    print(f"{rtt:>8g} {mode:>10} {elapsed:>9.3f} {size / elapsed / 2**20:>9.2f}", file=output)
+                proxy.close()
+    finally:
+        for path in (source, f"app/client/{FILE_NAME}"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Compares per-chunk FileManager.write_to_file calls with a single FileWriter per download.
+
+Counts file opens (through an audit hook) and write syscalls (from
+/proc/self/io) while writing the same chunks both ways. Run from the
+repository root:
+
+    python -m bench.file_writer --size-mb 64
+"""
+import argparse
+import os
+import sys
+import time
+
+from app.common.constants import CHUNK_SIZE
+from app.common.file_manager import FileManager
+
+FILE_NAME = "bench_writer.bin"
+opens = 0
+
+
+def count_opens(event: str, _) -> None:
+    global opens
+    if event == "open":
+        opens += 1
+
+
+def write_syscalls() -> int:
+    with open("/proc/self/io") as file:
+        for line in file:
+            if line.startswith("syscw:"):
+                return int(line.split()[1])
+    return 0
+
+
+def per_chunk(file_manager: FileManager, chunk: bytes, count: int) -> None:
+    file_manager.write_to_file("", FILE_NAME, True)
+    for _ in range(count):
+        file_manager.write_to_file(chunk, FILE_NAME, False)
+
+
+def single_writer(file_manager: FileManager, chunk: bytes, count: int) -> None:
+    with file_manager.open_writer(FILE_NAME, len(chunk) * count) as writer:
+        for _ in range(count):
+            writer.write(chunk)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=64)
+    args = parser.parse_args()
+
+    global opens
+    sys.addaudithook(count_opens)
+    file_manager = FileManager("client")
+    chunk = os.urandom(CHUNK_SIZE)
+    count = int(args.size_mb * 1024 * 1024) // CHUNK_SIZE
+
+    print(f"{'method':>13} {'opens':>8} {'write calls':>12} {'MiB/s':>9}")
+    try:
+        for name, method in (("write_to_file", per_chunk), ("FileWriter", single_writer)):
+            writes = write_syscalls()
+            opens = 0
+            start = time.perf_counter()
+            method(file_manager, chunk, count)
+            elapsed = time.perf_counter() - start
+            file_opens = opens
+            writes = write_syscalls() - writes
+            print(f"{name:>13} {file_opens:>8} {writes:>12} {count * CHUNK_SIZE / elapsed / 2**20:>9.1f}")
+    finally:
+        if file_manager.check_file_exists(FILE_NAME):
+            os.remove(f"{file_manager.base_directory}/{FILE_NAME}")
+
+
+if __name__ == "__main__":
+    main()
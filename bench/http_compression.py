@@ -0,0 +1,71 @@
+"""Measures bytes on the wire and server CPU per request with HTTP compression on and off.
+
+Copies `app/http/book.txt` under `app/http/public`, then fetches it and a small
+HTML page `--requests` times over one keep-alive connection with
+`Accept-Encoding: gzip`, against `app.http.main` started with and without
+`--no-compression`. Run from the repository root:
+
+    python -m bench.http_compression --requests 2000
+"""
+import argparse
+import os
+import shutil
+import socket
+
+from bench.http_keepalive import ResponseReader
+from bench.servers import process_cpu_seconds, start_http_server_process
+
+BOOK = "bench-book.txt"
+PATHS = (f"/public/{BOOK}", "/public/helloworld.html")
+
+
+def measure(compression: bool, path: str, requests: int) -> dict:
+    options = ["--log-level", "WARN", "--max-requests", str(requests + 1)]
+    if not compression:
+        options.append("--no-compression")
+    process, port = start_http_server_process(*options)
+    request = f"GET {path} HTTP/1.1\r\nAccept-Encoding: gzip\r\n\r\n".encode("latin-1")
+    try:
+        with socket.create_connection(("127.0.0.1", port)) as _socket:
+            reader = ResponseReader(_socket)
+            # The first request builds the compressed variant; it is not counted.
+            _socket.sendall(request)
+            reader.read_response()
+            reader.received = 0
+            cpu = process_cpu_seconds(process.pid)
+            for _ in range(requests):
+                _socket.sendall(request)
+                reader.read_response()
+            cpu = process_cpu_seconds(process.pid) - cpu
+    finally:
+        process.terminate()
+        process.wait()
+    return {
+        "path": path,
+        "compression": compression,
+        "bytes_per_request": reader.received / requests,
+        "server_cpu_us_per_request": 1e6 * cpu / requests,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    shutil.copyfile("app/http/book.txt", f"app/http/public/{BOOK}")
+    try:
+        print(f"{'path':>24} {'gzip':>5} {'bytes/req':>10} {'cpu us/req':>11}")
+        for path in PATHS:
+            for compression in (False, True):
+                result = measure(compression, path, args.requests)
+                print(
+                    f"{result['path']:>24} {'on' if compression else 'off':>5} "
+                    f"{result['bytes_per_request']:>10.0f} {result['server_cpu_us_per_request']:>11.1f}"
+                )
+    finally:
+        os.remove(f"app/http/public/{BOOK}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Compares HTTP request throughput and latency with and without connection reuse.
+
+Each of `--clients` threads sends `--requests` GET requests for `--path`
+against `app.http.main` running in a child process, either opening a new
+connection per request ("close"), reusing one connection ("keep-alive"), or
+reusing it with `--depth` requests in flight ("pipelined"). Run from the
+repository root:
+
+    python -m bench.http_keepalive --clients 8 --requests 2000
+"""
+import argparse
+import socket
+import statistics
+import threading
+import time
+
+from bench.servers import process_cpu_seconds, start_http_server_process
+
+MODES = ("close", "keep-alive", "pipelined")
+
+
+class ResponseReader:
+    """Reads Content-Length delimited HTTP responses from a blocking socket."""
+    def __init__(self, _socket: socket.socket) -> None:
+        self.socket = _socket
+        self.buffer = bytearray()
+        self.received = 0
+
+    def read_response(self) -> int:
+        """Reads one response and returns its status code."""
+        while (end := self.buffer.find(b"\r\n\r\n")) == -1:
+            self.fill()
+        head = self.buffer[:end].decode("latin-1").split("\r\n")
+        length = 0
+        for line in head[1:]:
+            name, _, value = line.partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        while len(self.buffer) < end + 4 + length:
+            self.fill()
+        del self.buffer[:end + 4 + length]
+        return int(head[0].split(" ")[1])
+
+    def fill(self) -> None:
+        data = self.socket.recv(65536)
+        if not data:
+            raise ConnectionError("Connection closed by server.")
+        self.received += len(data)
+        self.buffer += data
+
+
+def run_client(port: int, path: str, mode: str, requests: int, depth: int, latencies: list[float]) -> None:
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode("latin-1")
+    if mode == "close":
+        request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n".encode("latin-1")
+        for _ in range(requests):
+            start = time.perf_counter()
+            with socket.create_connection(("127.0.0.1", port)) as _socket:
+                _socket.sendall(request)
+                ResponseReader(_socket).read_response()
+            latencies.append(time.perf_counter() - start)
+        return
+    _socket = socket.create_connection(("127.0.0.1", port))
+    _socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    reader = ResponseReader(_socket)
+    batch = depth if mode == "pipelined" else 1
+    try:
+        for _ in range(0, requests, batch):
+            start = time.perf_counter()
+            _socket.sendall(request * batch)
+            for _ in range(batch):
+                reader.read_response()
+                latencies.append(time.perf_counter() - start)
+    finally:
+        _socket.close()
+
+
+def measure(mode: str, clients: int, requests: int, path: str, depth: int) -> dict:
+    # Every request of a client must fit on one connection.
+    process, port = start_http_server_process("--max-requests", str(requests + depth), "--log-level", "WARN")
+    try:
+        latencies: list[float] = []
+        threads = [
+            threading.Thread(target=run_client, args=(port, path, mode, requests, depth, latencies))
+            for _ in range(clients)
+        ]
+        cpu = process_cpu_seconds(process.pid)
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        cpu = process_cpu_seconds(process.pid) - cpu
+    finally:
+        process.terminate()
+        process.wait()
+    latencies.sort()
+    return {
+        "mode": mode,
+        "requests_per_second": len(latencies) / elapsed,
+        "p50_ms": 1000 * statistics.median(latencies),
+        "p99_ms": 1000 * latencies[int(len(latencies) * 0.99) - 1],
+        "server_cpu_us_per_request": 1e6 * cpu / len(latencies),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=2000, help="requests per client")
+    parser.add_argument("--path", default="/public/helloworld.html")
+    parser.add_argument("--depth", type=int, default=8, help="requests in flight in pipelined mode")
+    parser.add_argument("--mode", choices=MODES, action="append", help="modes to run (default: all)")
+    args = parser.parse_args()
+
+    print(f"{'mode':>10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'cpu us/req':>11}")
+    for mode in args.mode or MODES:
+        result = measure(mode, args.clients, args.requests, args.path, args.depth)
+        print(
+            f"{result['mode']:>10} {result['requests_per_second']:>9.0f} {result['p50_ms']:>8.2f} "
+            f"{result['p99_ms']:>8.2f} {result['server_cpu_us_per_request']:>11.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Measures HTTP latency and rejections when more clients connect than the server admits.
+
+Runs `--clients` threads, each opening a new connection per GET request for
+`--duration` seconds, against `app.http.main` limited to `--threads` worker
+threads and `--queue-size` waiting connections. Reports how many requests
+were served and rejected with 503, and the latency of both. Run from the
+repository root:
+
+    python -m bench.http_overload --clients 64 --threads 8 --queue-size 8
+"""
+import argparse
+import socket
+import statistics
+import threading
+import time
+
+from bench.http_keepalive import ResponseReader
+from bench.servers import start_http_server_process
+
+
+def run_client(port: int, path: str, duration: float, results: dict[int, list[float]]) -> None:
+    request = f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode("latin-1")
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        try:
+            with socket.create_connection(("127.0.0.1", port)) as _socket:
+                _socket.sendall(request)
+                status = ResponseReader(_socket).read_response()
+        except OSError:
+            status = 0
+        results.setdefault(status, []).append(time.perf_counter() - start)
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--path", default="/assets/joker.jpg")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    process, port = start_http_server_process(
+        "--threads", str(args.threads), "--queue-size", str(args.queue_size), "--log-level", "ERROR"
+    )
+    results: dict[int, list[float]] = {}
+    try:
+        threads = [
+            threading.Thread(target=run_client, args=(port, args.path, args.duration, results))
+            for _ in range(args.clients)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        process.terminate()
+        process.wait()
+
+    print(f"{'status':>7} {'count':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8}")
+    for status, latencies in sorted(results.items()):
+        print(
+            f"{status or 'error':>7} {len(latencies):>7} {len(latencies) / args.duration:>8.0f} "
+            f"{1000 * statistics.median(latencies):>8.2f} {1000 * percentile(latencies, 0.99):>8.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Measures HTTP requests/sec as the number of pre-forked server workers grows.
+
+Starts `app.http.main --workers N` for each N in `--workers` and drives it
+with `--clients` load generator processes (threads would be bound by the
+client's own GIL) sending keep-alive GET requests for `--path` for
+`--duration` seconds. Run from the repository root:
+
+    python -m bench.http_prefork --workers 1 2 4 --clients 8
+"""
+import argparse
+import multiprocessing
+import os
+import socket
+import time
+
+from bench.http_keepalive import ResponseReader
+from bench.servers import start_http_server_process
+
+
+def run_client(port: int, path: str, duration: float) -> int:
+    request = f"GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n\r\n".encode("latin-1")
+    served = 0
+    deadline = time.monotonic() + duration
+    while time.monotonic() < deadline:
+        # Workers close a connection after --max-requests requests.
+        with socket.create_connection(("127.0.0.1", port)) as _socket:
+            _socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            reader = ResponseReader(_socket)
+            for _ in range(1000):
+                _socket.sendall(request)
+                reader.read_response()
+                served += 1
+                if time.monotonic() >= deadline:
+                    break
+    return served
+
+
+def measure(workers: int, clients: int, path: str, duration: float) -> float:
+    process, port = start_http_server_process(
+        "--workers", str(workers), "--max-requests", "1000", "--warm-cache", "--log-level", "WARN"
+    )
+    try:
+        # Let every worker bind before the load starts.
+        time.sleep(1.0)
+        with multiprocessing.Pool(clients) as pool:
+            served = pool.starmap(run_client, [(port, path, duration)] * clients)
+    finally:
+        process.terminate()
+        process.wait()
+    return sum(served) / duration
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--path", default="/public/helloworld.html")
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'workers':>8} {'req/s':>9} {'speedup':>8}")
+    baseline = None
+    for workers in args.workers:
+        rate = measure(workers, args.clients, args.path, args.duration)
+        baseline = baseline or rate
+        print(f"{workers:>8} {rate:>9.0f} {rate / baseline:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
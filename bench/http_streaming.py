@@ -0,0 +1,70 @@
+"""Measures server memory while many clients download a large static file over HTTP.
+
+Generates a `--size-mb` file under `app/http/public`, has `--clients` threads
+download it concurrently from `app.http.main` running in a child process, and
+reports throughput and the server's peak RSS above its idle RSS. Run from the
+repository root:
+
+    python -m bench.http_streaming --size-mb 64 --clients 16
+"""
+import argparse
+import os
+import socket
+import threading
+import time
+
+from bench.servers import process_peak_rss_bytes, process_rss_bytes, start_http_server_process
+
+FILE_NAME = "bench-streaming.bin"
+
+
+def download(port: int, path: str, size: int) -> None:
+    with socket.create_connection(("127.0.0.1", port)) as _socket:
+        _socket.sendall(f"GET {path} HTTP/1.1\r\nConnection: close\r\n\r\n".encode("latin-1"))
+        received = 0
+        buffer = bytearray(1024 * 1024)
+        while count := _socket.recv_into(buffer):
+            received += count
+    if received < size:
+        raise ConnectionError(f"Received {received} bytes, expected at least {size}.")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=int, default=64)
+    parser.add_argument("--clients", type=int, default=16)
+    args = parser.parse_args()
+
+    size = args.size_mb * 1024 * 1024
+    file_path = f"app/http/public/{FILE_NAME}"
+    with open(file_path, "wb") as file:
+        file.write(os.urandom(size))
+    process, port = start_http_server_process("--log-level", "WARN")
+    try:
+        time.sleep(0.5)
+        idle_rss = process_rss_bytes(process.pid)
+        threads = [
+            threading.Thread(target=download, args=(port, f"/public/{FILE_NAME}", size))
+            for _ in range(args.clients)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        peak_rss = process_peak_rss_bytes(process.pid)
+    finally:
+        process.terminate()
+        process.wait()
+        os.remove(file_path)
+
+    print(f"{'clients':>8} {'MiB':>6} {'MiB/s':>9} {'peak RSS growth MiB':>20}")
+    print(
+        f"{args.clients:>8} {args.size_mb:>6} {args.clients * args.size_mb / elapsed:>9.1f} "
+        f"{(peak_rss - idle_rss) / 2**20:>20.1f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import heapq
+import socket
+import threading
+import time
+
+
+class LatencyProxy:
+    """TCP proxy that delays every forwarded segment by a fixed one-way latency.
+
+    Listens on an ephemeral loopback port and forwards each accepted connection
+    to `target`. Data read in either direction is held for `rtt / 2` seconds
+    before being written out, which emulates a link with the given round trip
+    time.
+
+    With `bandwidth`, in bytes per second, each direction also emulates a
+    link of that speed: data is released no earlier than the link would have
+    finished transmitting it, behind whatever was read before it. The proxy
+    buffers without limit, so senders are not slowed down, only receivers.
+
+    With `corrupt_at`, the byte at that position of what the first
+    connection receives from `target` is flipped, to emulate corruption in
+    transit.
+
+    Attributes:
+        port (int): Port the proxy is listening on.
+    """
+    def __init__(self, target: tuple[str, int], rtt: float, corrupt_at: int | None = None,
+                 bandwidth: float | None = None) -> None:
+        self.target = target
+        self.delay = rtt / 2
+        self.corrupt_at = corrupt_at
+        self.bandwidth = bandwidth
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.socket.bind(("127.0.0.1", 0))
+        self.socket.listen()
+        self.port: int = self.socket.getsockname()[1]
+        self.running = True
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self) -> None:
+        while self.running:
+            try:
+                downstream, _ = self.socket.accept()
+            except OSError:
+                break
+            upstream = socket.create_connection(self.target)
+            for _socket in (downstream, upstream):
+                _socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.pipe(downstream, upstream)
+            self.pipe(upstream, downstream, self.corrupt_at)
+            self.corrupt_at = None
+
+    def pipe(self, source: socket.socket, destination: socket.socket, corrupt_at: int | None = None) -> None:
+        queue: list[tuple[float, int, bytes]] = []
+        condition = threading.Condition()
+
+        def reader() -> None:
+            sequence = 0
+            position = 0
+            link_free = 0.0
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                if corrupt_at is not None and position <= corrupt_at < position + len(data):
+                    data = bytearray(data)
+                    data[corrupt_at - position] ^= 0xFF
+                    data = bytes(data)
+                position += len(data)
+                sent = time.monotonic()
+                if self.bandwidth:
+                    # Data goes on the wire once everything read before it has been transmitted.
+                    link_free = sent = max(sent, link_free) + len(data) / self.bandwidth
+                with condition:
+                    heapq.heappush(queue, (sent + self.delay, sequence, data))
+                    sequence += 1
+                    condition.notify()
+                if not data:
+                    break
+
+        def writer() -> None:
+            while True:
+                with condition:
+                    while not queue:
+                        condition.wait()
+                    deadline, _, data = queue[0]
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0:
+                        condition.wait(remaining)
+                        continue
+                    heapq.heappop(queue)
+                try:
+                    if not data:
+                        destination.shutdown(socket.SHUT_WR)
+                        break
+                    destination.sendall(data)
+                except OSError:
+                    break
+
+        threading.Thread(target=reader, daemon=True).start()
+        threading.Thread(target=writer, daemon=True).start()
+
+    def close(self) -> None:
+        self.running = False
+        self.socket.close()
@@ -0,0 +1,78 @@
+"""Compares single-stream, parallel-range and resumed FILE downloads over an emulated link.
+
+Every download goes through a `LatencyProxy` adding `--rtt-ms` of round trip
+time on loopback. "parallel" splits the file into `--streams` byte ranges
+fetched over as many connections; "resume" starts from a local copy holding
+the first half of the file, as left by an interrupted download. Run from the
+repository root:
+
+    python -m bench.parallel_download --size-mb 8 --rtt-ms 10 50 --streams 2 4 8
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from app.client.client import Client
+from bench.latency_proxy import LatencyProxy
+from bench.servers import start_tcp_server
+
+FILE_NAME = "bench_parallel.bin"
+
+
+def download(port: int, bulk: bool, streams: int = 1, resume: bool = False) -> float:
+    client = Client(server_ip="127.0.0.1", server_port=port, client_port=0, bulk=bulk,
+                    resume=resume, streams=streams, interactive=False)
+    client.connect()
+    start = time.perf_counter()
+    if not client.fetch_file(FILE_NAME):
+        raise RuntimeError("Transfer failed.")
+    elapsed = time.perf_counter() - start
+    client.handle_exit()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=8)
+    parser.add_argument("--rtt-ms", type=float, nargs="+", default=[10, 50])
+    parser.add_argument("--streams", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--mode", choices=("bulk", "stream"), default="stream",
+                        help="bulk: sendfile body; stream: windowed DATA frames")
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded")
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    source = f"app/server/{FILE_NAME}"
+    destination = f"app/client/{FILE_NAME}"
+    with open(source, "wb") as file:
+        file.write(os.urandom(size))
+    bulk = args.mode == "bulk"
+
+    output = sys.stdout
+    print(f"{'rtt (ms)':>8} {'download':>12} {'seconds':>9} {'MiB/s':>9}", file=output)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            port = start_tcp_server(args.engine)
+            for rtt in args.rtt_ms:
+                proxy = LatencyProxy(("127.0.0.1", port), rtt / 1000)
+                runs = [("single", {})]
+                runs += [(f"parallel x{streams}", {"streams": streams}) for streams in args.streams]
+                runs += [("resume 50%", {"resume": True})]
+                for label, options in runs:
+                    if options.get("resume"):
+                        with open(source, "rb") as file, open(destination, "wb") as partial:
+                            partial.write(file.read(size // 2))
+                    elapsed = download(proxy.port, bulk, **options)
+                    print(f"{rtt:>8g} {label:>12} {elapsed:>9.3f} {size / elapsed / 2**20:>9.2f}", file=output)
+                proxy.close()
+    finally:
+        for path in (source, destination):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
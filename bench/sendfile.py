@@ -0,0 +1,65 @@
+"""Compares CPU cost and throughput of framed DATA streaming and sendfile() bulk FILE transfers.
+
+Run from the repository root:
+
+    python -m bench.sendfile --size-mb 256 --runs 3
+"""
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+from app.client.client import Client
+from bench.servers import process_cpu_seconds, start_tcp_server_process
+
+FILE_NAME = "bench_sendfile.bin"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=256)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    size = int(args.size_mb * 1024 * 1024)
+    source = f"app/server/{FILE_NAME}"
+    with open(source, "wb") as file:
+        for _ in range(0, size, 2**20):
+            file.write(os.urandom(min(2**20, size - file.tell())))
+
+    output = sys.stdout
+    print(f"{'mode':>7} {'MiB/s':>9} {'server cpu s/GiB':>17} {'client cpu s/GiB':>17}", file=output)
+    process, port = start_tcp_server_process()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            for mode, bulk in (("stream", False), ("bulk", True)):
+                client = Client(server_ip="127.0.0.1", server_port=port, client_port=0, bulk=bulk, interactive=False)
+                client.connect()
+                elapsed = server_cpu = client_cpu = 0.0
+                for _ in range(args.runs):
+                    server_start = process_cpu_seconds(process.pid)
+                    client_start = time.process_time()
+                    start = time.perf_counter()
+                    if not client.fetch_file(FILE_NAME):
+                        raise RuntimeError("Transfer failed.")
+                    elapsed += time.perf_counter() - start
+                    client_cpu += time.process_time() - client_start
+                    server_cpu += process_cpu_seconds(process.pid) - server_start
+                client.handle_exit()
+                gigabytes = size * args.runs / 2**30
+                print(
+                    f"{mode:>7} {size * args.runs / elapsed / 2**20:>9.1f} "
+                    f"{server_cpu / gigabytes:>17.2f} {client_cpu / gigabytes:>17.2f}",
+                    file=output,
+                )
+    finally:
+        process.terminate()
+        for path in (source, f"app/client/{FILE_NAME}"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as _socket:
+        _socket.bind(("127.0.0.1", 0))
+        return _socket.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise TimeoutError(f"Nothing listening on port {port}.")
+
+
+def start_tcp_server(engine: str = "threaded") -> int:
+    """Starts a TCP server engine (see `app.server.main`) on a daemon thread and returns its port.
+
+    Must be called from the repository root, since `FileManager` resolves its
+    base directory from the current working directory.
+    """
+    from app.server.main import ENGINES
+
+    port = free_port()
+    threading.Thread(target=ENGINES[engine], args=(port, {"echo": False}), daemon=True).start()
+    wait_for_port(port)
+    return port
+
+
+def start_http_server(max_requests: int = 100) -> int:
+    """Starts `app.http.server.Server` on a daemon thread and returns its port.
+
+    Like `start_tcp_server`, must be called from the repository root.
+    """
+    from app.common.log_manager import LEVELS
+    from app.http.server import Server
+
+    port = free_port()
+    log_options = {"echo": False, "level": LEVELS["WARN"]}
+    threading.Thread(target=Server, args=(port, log_options), kwargs={"max_requests": max_requests}, daemon=True).start()
+    wait_for_port(port)
+    return port
+
+
+def start_tcp_server_process(engine: str = "threaded") -> tuple[subprocess.Popen, int]:
+    """Starts `app.server.main` in a child process and returns it with its port.
+
+    Running the server out of process lets benchmarks attribute CPU time and
+    memory to the server alone (see `process_cpu_seconds` and `process_rss_bytes`).
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.server.main", "--engine", engine, "--port", str(port), "--quiet"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_for_port(port)
+    return process, port
+
+
+def start_http_server_process(*options: str) -> tuple[subprocess.Popen, int]:
+    """Starts `app.http.main` in a child process and returns it with its port.
+
+    `options` are extra command line arguments, e.g. `"--max-requests", "1000"`.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "app.http.main", "--port", str(port), "--quiet", *options],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_for_port(port)
+    return process, port
+
+
+def process_cpu_seconds(pid: int) -> float:
+    """Returns the user plus system CPU time consumed so far by a Linux process."""
+    with open(f"/proc/{pid}/stat") as file:
+        fields = file.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def process_rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def process_peak_rss_bytes(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+def process_thread_count(pid: int) -> int:
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("Threads:"):
+                return int(line.split()[1])
+    return 0
@@ -0,0 +1,422 @@
+"""Runs reproducible FILE, chat and HTTP workloads and reports them as JSON.
+
+Every workload runs against a fresh server, started in a child process
+(`--server process`, the default) so that CPU time and memory are the
+server's alone, or on a thread of this process (`--server thread`), where
+they include the load generator. `--rtt-ms` puts a `LatencyProxy` in front
+of the server. Each result holds the throughput, p50 and p99 latency, and
+the CPU time and resident memory of the server process.
+
+- files: `--concurrency` clients each download their own copy of a
+  generated file `--downloads` times, for every size of `--file-sizes`.
+- chat: `--senders` members each send `--messages` messages as fast as they
+  can to a room `--listeners` more members listen to. Latency is measured
+  per delivery; messages the room dropped under backpressure are counted.
+- http: `--http-clients` clients each send `--http-requests` GET requests
+  for files of `assets/` and `public/` picked at random, over keep-alive
+  connections and over a connection per request.
+
+Clients pick their files with a generator seeded by `--seed`, so two runs
+issue the same requests. With `--baseline`, results are compared to those
+of an earlier run, and the exit status is 1 if a throughput dropped or a
+p99 latency grew by more than `--tolerance`. Run from the repository root:
+
+    python -m bench.suite --file-sizes 64K 8M 256M --output before.json
+    python -m bench.suite --file-sizes 64K 8M 256M --baseline before.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import selectors
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from app.client.client import Client
+from app.common.framing import FrameType, encode_frame
+from bench.chat_fanout import MARKER, join_chat
+from bench.http_keepalive import ResponseReader
+from bench.latency_proxy import LatencyProxy
+from bench.servers import (process_cpu_seconds, process_peak_rss_bytes, process_rss_bytes, start_http_server,
+                           start_http_server_process, start_tcp_server, start_tcp_server_process)
+
+WORKLOADS = ("files", "chat", "http")
+FILE_PREFIX = "bench_suite_"
+HTTP_DIRECTORIES = ("assets", "public")
+# Requests served per HTTP connection, high enough to never close one.
+HTTP_MAX_REQUESTS = 1_000_000
+SIZE_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+# Seconds without a chat delivery after which the messages still missing are counted as dropped.
+CHAT_IDLE_TIMEOUT = 2.0
+
+
+class BenchServer:
+    """A fresh server under test.
+
+    Attributes:
+        port (int): Port clients connect to, the proxy's when there is one.
+        pid (int): Process the server's CPU time and memory are read from.
+    """
+    def __init__(self, kind: str, mode: str, engine: str, rtt: float) -> None:
+        self.process: subprocess.Popen | None = None
+        if kind == "http" and mode == "process":
+            self.process, port = start_http_server_process("--max-requests", str(HTTP_MAX_REQUESTS), "--log-level", "WARN")
+        elif kind == "http":
+            port = start_http_server(HTTP_MAX_REQUESTS)
+        elif mode == "process":
+            self.process, port = start_tcp_server_process(engine)
+        else:
+            port = start_tcp_server(engine)
+        self.pid: int = self.process.pid if self.process else os.getpid()
+        self.proxy = LatencyProxy(("127.0.0.1", port), rtt) if rtt else None
+        self.port: int = self.proxy.port if self.proxy else port
+
+    def close(self) -> None:
+        # Servers started on a thread have no way to stop and run until exit.
+        if self.proxy:
+            self.proxy.close()
+        if self.process:
+            self.process.terminate()
+            self.process.wait()
+
+
+def parse_size(text: str) -> int:
+    """Parses sizes such as "512", "64K", "1.5M" or "1G" into bytes."""
+    unit = SIZE_UNITS.get(text[-1:].upper())
+    if unit is None:
+        return int(text)
+    return int(float(text[:-1]) * unit)
+
+
+def format_size(size: int) -> str:
+    for unit, scale in reversed(SIZE_UNITS.items()):
+        if size >= scale and size % scale == 0:
+            return f"{size // scale}{unit}"
+    return str(size)
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_threads(target, arguments: list[tuple]) -> None:
+    """Runs `target` on a thread per tuple of `arguments` and raises the first exception any of them raised."""
+    errors: list[BaseException] = []
+
+    def run(*args) -> None:
+        try:
+            target(*args)
+        except BaseException as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=args) for args in arguments]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def measure(name: str, server: BenchServer, workload, *args) -> dict:
+    """Runs `workload(server.port, *args)` and adds the server's resource usage to the result it returns.
+
+    Workloads return their duration, operation count, latencies and, for
+    those moving files, the bytes transferred.
+    """
+    cpu = process_cpu_seconds(server.pid)
+    run = workload(server.port, *args)
+    cpu = process_cpu_seconds(server.pid) - cpu
+    seconds, operations, latencies = run.pop("seconds"), run.pop("operations"), run.pop("latencies")
+    result = {
+        "name": name,
+        "seconds": seconds,
+        "operations": operations,
+        "operations_per_second": operations / seconds,
+        "p50_ms": 1000 * percentile(latencies, 0.5),
+        "p99_ms": 1000 * percentile(latencies, 0.99),
+        "server_cpu_seconds": cpu,
+        "server_cpu_us_per_operation": 1e6 * cpu / operations if operations else 0.0,
+        "server_rss_bytes": process_rss_bytes(server.pid),
+        "server_peak_rss_bytes": process_peak_rss_bytes(server.pid),
+    }
+    if "bytes" in run:
+        result["mib_per_second"] = run["bytes"] / seconds / 2**20
+    result.update(run)
+    return result
+
+
+def create_files(size: int, count: int) -> list[str]:
+    """Writes a file of `size` random bytes and returns the names of `count` links to it, one per client.
+
+    Clients save downloads under the requested name, so concurrent clients
+    need names of their own; links share the data without using more disk.
+    """
+    source = f"app/server/{FILE_PREFIX}{format_size(size)}.bin"
+    with open(source, "wb") as file:
+        remaining = size
+        while remaining:
+            chunk = min(remaining, SIZE_UNITS["M"])
+            file.write(os.urandom(chunk))
+            remaining -= chunk
+    names = [f"{FILE_PREFIX}{format_size(size)}_{index}.bin" for index in range(count)]
+    for name in names:
+        os.link(source, f"app/server/{name}")
+    return names
+
+
+def remove_files() -> None:
+    for directory in ("app/server", "app/client"):
+        for name in os.listdir(directory):
+            if name.startswith(FILE_PREFIX):
+                os.remove(f"{directory}/{name}")
+
+
+def run_downloads(port: int, names: list[str], downloads: int, bulk: bool) -> dict:
+    latencies: list[float] = []
+    transferred: list[int] = []
+
+    def download(name: str) -> None:
+        client = Client(server_ip="127.0.0.1", server_port=port, client_port=0, bulk=bulk, interactive=False)
+        client.connect()
+        try:
+            for _ in range(downloads):
+                start = time.perf_counter()
+                if not client.fetch_file(name):
+                    raise RuntimeError(f"Download of {name} failed.")
+                latencies.append(time.perf_counter() - start)
+                transferred.append(os.path.getsize(f"app/client/{name}"))
+        finally:
+            client.handle_exit()
+
+    start = time.perf_counter()
+    run_threads(download, [(name,) for name in names])
+    return {
+        "seconds": time.perf_counter() - start,
+        "operations": len(latencies),
+        "latencies": latencies,
+        "bytes": sum(transferred),
+    }
+
+
+def run_chat(port: int, senders: int, listeners: int, messages: int) -> dict:
+    listening = [join_chat(port, "suite") for _ in range(listeners)]
+    sending = [join_chat(port, "suite") for _ in range(senders)]
+    selector = selectors.DefaultSelector()
+    # Senders receive each other's messages too, and are drained so that
+    # their full buffers cannot stall the room.
+    for _socket, reader in listening:
+        selector.register(_socket, selectors.EVENT_READ, (reader, True))
+    for _socket, reader in sending:
+        selector.register(_socket, selectors.EVENT_READ, (reader, False))
+
+    def send(_socket: socket.socket) -> None:
+        for _ in range(messages):
+            _socket.sendall(encode_frame(FrameType.MESSAGE, b"bench %.9f" % time.perf_counter()))
+
+    expected = senders * messages * listeners
+    latencies: list[float] = []
+    threads = [threading.Thread(target=send, args=(_socket,)) for _socket, _ in sending]
+    start = last = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while len(latencies) < expected and time.perf_counter() - last < CHAT_IDLE_TIMEOUT:
+        for key, _ in selector.select(timeout=0.1):
+            reader, listener = key.data
+            reader.fill()
+            now = time.perf_counter()
+            for frame in reader.frames():
+                if listener and MARKER in frame.payload:
+                    latencies.append(now - float(frame.payload.split(MARKER, 1)[1]))
+                    last = now
+    for thread in threads:
+        thread.join()
+    for _socket, _ in listening + sending:
+        _socket.close()
+    return {
+        "seconds": last - start,
+        "operations": len(latencies),
+        "latencies": latencies,
+        "dropped": expected - len(latencies),
+    }
+
+
+def http_paths() -> list[str]:
+    return [
+        f"/{directory}/{name}"
+        for directory in HTTP_DIRECTORIES
+        for name in sorted(os.listdir(f"app/http/{directory}"))
+    ]
+
+
+def run_http(port: int, clients: int, requests: int, keep_alive: bool, seed: int) -> dict:
+    paths = http_paths()
+    latencies: list[float] = []
+    transferred: list[int] = []
+    connection = "" if keep_alive else "Connection: close\r\n"
+
+    def client(index: int) -> None:
+        generator = random.Random(seed + index)
+        _socket = reader = None
+        try:
+            for _ in range(requests):
+                request = f"GET {generator.choice(paths)} HTTP/1.1\r\nHost: 127.0.0.1\r\n{connection}\r\n"
+                start = time.perf_counter()
+                if _socket is None:
+                    _socket = socket.create_connection(("127.0.0.1", port))
+                    _socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    reader = ResponseReader(_socket)
+                _socket.sendall(request.encode("latin-1"))
+                status = reader.read_response()
+                latencies.append(time.perf_counter() - start)
+                if status != 200:
+                    raise RuntimeError(f"Server answered {status}.")
+                if not keep_alive:
+                    transferred.append(reader.received)
+                    _socket.close()
+                    _socket = None
+        finally:
+            if _socket is not None:
+                transferred.append(reader.received)
+                _socket.close()
+
+    start = time.perf_counter()
+    run_threads(client, [(index,) for index in range(clients)])
+    return {
+        "seconds": time.perf_counter() - start,
+        "operations": len(latencies),
+        "latencies": latencies,
+        "bytes": sum(transferred),
+    }
+
+
+def files_results(args):
+    for size in args.file_sizes:
+        try:
+            names = create_files(size, args.concurrency)
+            server = BenchServer("tcp", args.server, args.engine, args.rtt_ms / 1000)
+            try:
+                # Fills the server's digest index, so no measured download pays for hashing the file.
+                run_downloads(server.port, names, 1, args.mode == "bulk")
+                yield measure(f"files/{format_size(size)}/x{args.concurrency}", server, run_downloads,
+                              names, args.downloads, args.mode == "bulk")
+            finally:
+                server.close()
+        finally:
+            remove_files()
+
+
+def chat_results(args):
+    server = BenchServer("tcp", args.server, args.engine, args.rtt_ms / 1000)
+    try:
+        yield measure(f"chat/{args.senders}x{args.listeners}", server, run_chat,
+                      args.senders, args.listeners, args.messages)
+    finally:
+        server.close()
+
+
+def http_results(args):
+    for keep_alive in (True, False):
+        server = BenchServer("http", args.server, args.engine, args.rtt_ms / 1000)
+        try:
+            yield measure(f"http/{'keep-alive' if keep_alive else 'close'}", server, run_http,
+                          args.http_clients, args.http_requests, keep_alive, args.seed)
+        finally:
+            server.close()
+
+
+RESULTS = {
+    "files": files_results,
+    "chat": chat_results,
+    "http": http_results,
+}
+
+
+def environment() -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": f"{platform.python_implementation()} {platform.python_version()}",
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(results: list[dict], baseline: dict, tolerance: float, output) -> list[str]:
+    """Prints the change of every result against `baseline` and returns the names of those that regressed."""
+    previous = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    print(f"{'workload':<24} {'throughput':>11} {'p99':>9}", file=output)
+    for result in results:
+        old = previous.get(result["name"])
+        if old is None:
+            continue
+        throughput = result["operations_per_second"] / old["operations_per_second"] - 1
+        p99 = result["p99_ms"] / old["p99_ms"] - 1 if old["p99_ms"] else 0.0
+        regressed = throughput < -tolerance or p99 > tolerance
+        print(f"{result['name']:<24} {throughput:>+11.1%} {p99:>+9.1%}{'  REGRESSION' if regressed else ''}", file=output)
+        if regressed:
+            regressions.append(result["name"])
+    return regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workload", choices=WORKLOADS, nargs="+", default=list(WORKLOADS))
+    parser.add_argument("--server", choices=("process", "thread"), default="process",
+                        help="run servers in a child process or on a thread of the benchmark")
+    parser.add_argument("--engine", choices=("threaded", "asyncio"), default="threaded", help="TCP server engine")
+    parser.add_argument("--rtt-ms", type=float, default=0, help="round trip time added by a latency proxy")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--file-sizes", type=parse_size, nargs="+", default=[64 * 1024, 8 * 1024 ** 2],
+                        help="sizes of the downloaded files, e.g. 4K 1M 1G")
+    parser.add_argument("--concurrency", type=int, default=4, help="clients downloading at once")
+    parser.add_argument("--downloads", type=int, default=8, help="downloads per client")
+    parser.add_argument("--mode", choices=("bulk", "stream"), default="bulk", help="FILE transfer mode")
+    parser.add_argument("--senders", type=int, default=2)
+    parser.add_argument("--listeners", type=int, default=16)
+    parser.add_argument("--messages", type=int, default=1000, help="chat messages per sender")
+    parser.add_argument("--http-clients", type=int, default=8)
+    parser.add_argument("--http-requests", type=int, default=500, help="requests per HTTP client")
+    parser.add_argument("--output", help="write the report to this file instead of stdout")
+    parser.add_argument("--baseline", help="report of an earlier run to compare the results with")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="relative throughput drop or p99 increase counted as a regression")
+    args = parser.parse_args()
+
+    output = sys.stdout
+    report = {"environment": environment(), "config": vars(args), "results": []}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for workload in args.workload:
+            for result in RESULTS[workload](args):
+                report["results"].append(result)
+                print(f"{result['name']:<24} {result['operations_per_second']:>10.1f} ops/s  "
+                      f"p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms", file=sys.stderr)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, output, indent=2)
+        print(file=output)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        return 1 if compare(report["results"], baseline, args.tolerance, sys.stderr) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())